@@ -10,6 +10,7 @@ from app.crud.llm_model import crud_llm_model
 from app.models.admin import Admin
 from app.schemas.llm_model import LLMModel, LLMModelCreate, LLMModelUpdate
 from app.schemas.response import response_success
+from app.utils.llm.cache import llm_response_cache
 from app.utils.logger import logger_instance
 from app.models.log import LogType
 
@@ -134,4 +135,11 @@ def delete_model(
         )
     
     model = crud_llm_model.remove(db, id=model_id)
-    return response_success(message="删除成功") 
\ No newline at end of file
+    return response_success(message="删除成功") 
+
+@router.get("/cache/stats", summary="获取LLM响应缓存统计")
+def get_cache_stats(
+    current_admin: Admin = Depends(get_current_admin)
+) -> dict:
+    """获取LLM响应缓存的命中统计，用于调整缓存配置"""
+    return response_success(data=llm_response_cache.stats())
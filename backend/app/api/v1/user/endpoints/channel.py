@@ -14,6 +14,7 @@ from app.schemas.response import response_success
 from app.utils.logger import logger_instance
 from app.models.log import LogType
 from app.utils.llm import LLMClient
+from app.utils.llm.router import llm_channel_router
 
 router = APIRouter()
 
@@ -60,6 +61,20 @@ def get_channels(
     )
     return response_success(data=channels)
 
+@router.get("/health", summary="获取LLM渠道实时状态")
+async def get_channels_health(
+    *,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> dict:
+    """获取用户渠道按实际调用统计的延迟EWMA、错误率和熔断状态"""
+    channels = crud_llm_channel.get_by_user(db, user_id=current_user.id, limit=1000)
+    health = await llm_channel_router.get_health([channel.id for channel in channels])
+    return response_success(data=[
+        {"channel_id": channel.id, "channel_name": channel.channel_name, **health[channel.id].to_dict()}
+        for channel in channels
+    ])
+
 @router.get("/{channel_id}", summary="获取LLM渠道详情")
 def get_channel(
     channel_id: int,
@@ -168,11 +183,15 @@ async def test_channel(
         # 获取第一个响应并计算时间
         first_token = None
         response_time = 0
-        async for chunk in stream:
-            # 计算响应时间（毫秒）
-            response_time = int((time.perf_counter() - start_time) * 1000)
-            first_token = chunk
-            break
+        try:
+            async for chunk in stream:
+                # 计算响应时间（毫秒）
+                response_time = int((time.perf_counter() - start_time) * 1000)
+                first_token = chunk
+                break
+        finally:
+            # 拿到首个响应后立即结束流式生成，释放工作线程和连接
+            await stream.aclose()
 
        
         
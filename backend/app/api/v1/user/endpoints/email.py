@@ -1,5 +1,8 @@
-from typing import List, Any, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Any, Optional, Tuple
+from email import message_from_bytes
+from urllib.parse import quote
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime
 
@@ -18,9 +21,13 @@ from app.crud.email_provider import crud_email_provider
 from app.db.session import get_db
 from app.core.tasks.email_sync import create_sync_task
 from app.schemas.email import Email, EmailUpdate
-from app.crud.email import crud_email
+from app.crud.email import crud_email, crud_email_attachment, crud_email_raw_content
+from app.crud.email_thread import crud_email_thread
+from app.utils.blob_store import get_blob_store
+from app.utils.email.parser import extract_attachment
 from app.models.email_outbox import EmailOutbox
 from app.schemas.email import Email as EmailSchema
+from app.schemas.email import EmailThread as EmailThreadSchema
 
 router = APIRouter()
 
@@ -260,6 +267,80 @@ def get_emails(
         "pages": (total + limit - 1) // limit
     })
 
+def _parse_thread_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析会话列表游标 "<last_activity ISO格式>|<id>"，格式错误时返回400"""
+    try:
+        last_activity, thread_id = cursor.rsplit("|", 1)
+        return datetime.fromisoformat(last_activity), int(thread_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/accounts/{account_id}/threads", response_model=ResponseModel[dict])
+def get_email_threads(
+    *,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    account_id: int,
+    limit: int = 50,
+    cursor: Optional[str] = None
+):
+    """获取会话列表，按最后活动时间倒序
+
+    使用键集分页：cursor 传上一页返回的 next_cursor，为空时从最新的会话开始。
+    """
+    account = crud_email_account.get(db, id=account_id)
+    if not account or account.user_id != current_user.id:
+        raise HTTPException(
+            status_code=404,
+            detail="Email account not found"
+        )
+    
+    limit = max(1, min(limit, 200))
+    threads = crud_email_thread.get_multi_by_account(
+        db,
+        account_id=account_id,
+        limit=limit + 1,
+        before=_parse_thread_cursor(cursor) if cursor else None
+    )
+    next_cursor = None
+    if len(threads) > limit:
+        threads = threads[:limit]
+        next_cursor = f"{threads[-1].last_activity.isoformat()}|{threads[-1].id}"
+    
+    return response_success(data={
+        "items": [EmailThreadSchema.model_validate(thread) for thread in threads],
+        "next_cursor": next_cursor
+    })
+
+@router.get("/accounts/{account_id}/threads/{thread_id}", response_model=ResponseModel[dict])
+def get_email_thread(
+    *,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    account_id: int,
+    thread_id: int
+):
+    """获取会话详情及其中的邮件（按时间正序）"""
+    account = crud_email_account.get(db, id=account_id)
+    if not account or account.user_id != current_user.id:
+        raise HTTPException(
+            status_code=404,
+            detail="Email account not found"
+        )
+    
+    thread = crud_email_thread.get_by_account(db, account_id=account_id, thread_id=thread_id)
+    if not thread:
+        raise HTTPException(
+            status_code=404,
+            detail="Thread not found"
+        )
+    
+    emails = crud_email_thread.get_emails(db, thread_id=thread_id)
+    return response_success(data={
+        **EmailThreadSchema.model_validate(thread).model_dump(),
+        "emails": [EmailSchema.model_validate(email) for email in emails]
+    })
+
 @router.get("/accounts/{account_id}/emails/{email_id}", response_model=ResponseModel[dict])
 def get_email(
     *,
@@ -480,4 +561,154 @@ def move_email(
     
     # 移动到指定文件夹
     email = crud_email.move_to_folder(db, email_id=email_id, folder=folder)
-    return ResponseModel(data=email) 
\ No newline at end of file
+    return ResponseModel(data=email)
+
+
+@router.get("/accounts/{account_id}/emails/{email_id}/source", summary="查看邮件原文")
+def get_email_source(
+    *,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    account_id: int,
+    email_id: int
+):
+    """获取邮件的RFC822原文"""
+    # 检查账户是否存在且属于当前用户
+    account = crud_email_account.get(db, id=account_id)
+    if not account or account.user_id != current_user.id:
+        raise HTTPException(
+            status_code=404,
+            detail="Email account not found"
+        )
+    
+    # 获取邮件
+    email = crud_email.get(db, id=email_id)
+    if not email or email.account_id != account_id:
+        raise HTTPException(
+            status_code=404,
+            detail="Email not found"
+        )
+    
+    raw_message = crud_email_raw_content.get_raw(db, email_id=email_id)
+    if raw_message is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Email source not available"
+        )
+    # 原文是未解码的RFC822字节，编码由各MIME部分自行声明，不能标记为UTF-8文本
+    return Response(content=raw_message, media_type="message/rfc822")
+
+
+def _parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """解析单段 Range 请求头，返回 (start, end)，不支持或未指定时返回None"""
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_str, _, end_str = range_header[6:].strip().partition("-")
+    try:
+        if start_str:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+        else:
+            # bytes=-N 表示最后N个字节
+            start = max(size - int(end_str), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, min(end, size - 1)
+
+
+def _ensure_attachment_blob(db: Session, email, attachment) -> Optional[str]:
+    """获取附件的存储键，旧附件未写入存储时从邮件原文中提取并补写"""
+    if attachment.sha256:
+        return attachment.sha256
+    raw_message = crud_email_raw_content.get_raw(db, email_id=email.id)
+    if not raw_message:
+        return None
+    msg = message_from_bytes(raw_message)
+    for part in msg.walk():
+        if part.get_content_maintype() == 'multipart':
+            continue
+        item = extract_attachment(part, get_blob_store())
+        if item and item["filename"] == attachment.filename and item["sha256"]:
+            attachment.sha256 = item["sha256"]
+            attachment.storage_path = item["storage_path"]
+            db.commit()
+            return attachment.sha256
+    return None
+
+
+@router.get("/accounts/{account_id}/emails/{email_id}/attachments/{attachment_id}", summary="下载邮件附件")
+def download_attachment(
+    *,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    account_id: int,
+    email_id: int,
+    attachment_id: int
+):
+    """下载邮件附件，支持 Range 分段请求"""
+    # 检查账户是否存在且属于当前用户
+    account = crud_email_account.get(db, id=account_id)
+    if not account or account.user_id != current_user.id:
+        raise HTTPException(
+            status_code=404,
+            detail="Email account not found"
+        )
+    
+    # 获取邮件
+    email = crud_email.get(db, id=email_id)
+    if not email or email.account_id != account_id:
+        raise HTTPException(
+            status_code=404,
+            detail="Email not found"
+        )
+    
+    attachment = crud_email_attachment.get(db, id=attachment_id)
+    if not attachment or attachment.email_id != email_id:
+        raise HTTPException(
+            status_code=404,
+            detail="Attachment not found"
+        )
+    
+    key = _ensure_attachment_blob(db, email, attachment)
+    if not key:
+        raise HTTPException(
+            status_code=404,
+            detail="Attachment content not available"
+        )
+    
+    blob_store = get_blob_store()
+    size = blob_store.size(key)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{key}"',
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(attachment.filename)}"
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    
+    byte_range = _parse_range(request.headers.get("range"), size)
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(
+            blob_store.iter_range(key),
+            media_type=attachment.content_type,
+            headers=headers
+        )
+    
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        blob_store.iter_range(key, start, end),
+        status_code=206,
+        media_type=attachment.content_type,
+        headers=headers
+    )
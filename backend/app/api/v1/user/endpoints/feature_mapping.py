@@ -10,8 +10,9 @@ from app.api.v1.deps.auth import get_current_user
 from app.db.session import get_db
 from app.models.user import User
 from app.models.llm_feature import LLMFeature, FeatureType
+from app.models.llm_channel import LLMChannel
 from app.crud.llm_feature_mapping import crud_feature_mapping
-from app.schemas.response import response_success
+from app.schemas.response import response_success, serialize_model
 from app.schemas.llm_feature_mapping import (
     LLMFeatureMappingCreate,
     LLMFeatureMappingUpdate,
@@ -25,6 +26,12 @@ class MessageRequest(BaseModel):
     """消息请求模型"""
     message: str
 
+def _serialize_mapping(mapping) -> dict:
+    """序列化功能映射，附带渠道池"""
+    data = serialize_model(mapping)
+    data["pool"] = [{"channel_id": item.channel_id, "weight": item.weight} for item in mapping.pool]
+    return data
+
 @router.get("/features", response_model=dict)
 async def get_features(
     db: Session = Depends(get_db),
@@ -44,7 +51,7 @@ async def get_user_mappings(
         db=db,
         user_id=current_user.id
     )
-    return response_success(data=mappings)
+    return response_success(data=[_serialize_mapping(mapping) for mapping in mappings])
 
 @router.post("/mappings/save", response_model=dict)
 async def save_mapping(
@@ -54,6 +61,19 @@ async def save_mapping(
     mapping_in: LLMFeatureMappingCreate
 ):
     """保存功能映射(新增或更新)"""
+    if mapping_in.pool:
+        channel_ids = [item.channel_id for item in mapping_in.pool]
+        if len(set(channel_ids)) != len(channel_ids):
+            raise HTTPException(status_code=400, detail="渠道池中存在重复的渠道")
+        owned = db.query(LLMChannel.id).filter(
+            LLMChannel.id.in_(channel_ids),
+            LLMChannel.user_id == current_user.id
+        ).count()
+        if owned != len(channel_ids):
+            raise HTTPException(status_code=400, detail="渠道池中存在不属于当前用户的渠道")
+        # 渠道池的第一个渠道作为主渠道
+        mapping_in.channel_id = channel_ids[0]
+    
     # 检查是否已存在相同功能类型的映射
     existing = crud_feature_mapping.get_by_feature_type(
         db=db,
@@ -62,14 +82,14 @@ async def save_mapping(
     )
     
     if existing:
-        # 如果存在则更新
+        # 如果存在则更新，缓存、token上限和路由策略只在请求中传入时修改
+        optional_fields = {"cache_enabled", "max_input_tokens", "routing_strategy"}
         mapping = crud_feature_mapping.update(
             db=db,
             db_obj=existing,
-            obj_in=LLMFeatureMappingUpdate(
-                channel_id=mapping_in.channel_id,
-                prompt_template=mapping_in.prompt_template
-            )
+            obj_in=LLMFeatureMappingUpdate(**mapping_in.model_dump(
+                include={"channel_id", "prompt_template"} | (optional_fields & mapping_in.model_fields_set)
+            ))
         )
     else:
         # 如果不存在则创建
@@ -78,8 +98,11 @@ async def save_mapping(
             obj_in=mapping_in,
             user_id=current_user.id
         )
+    # 未传 pool 时保留原有渠道池
+    if "pool" in mapping_in.model_fields_set:
+        mapping = crud_feature_mapping.set_pool(db=db, mapping=mapping, items=mapping_in.pool)
     
-    return response_success(data=mapping) 
+    return response_success(data=_serialize_mapping(mapping))
 
 
 # 功能映射接口
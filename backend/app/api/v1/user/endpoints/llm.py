@@ -2,11 +2,14 @@
 用户端LLM模型接口
 """
 from typing import List
-from fastapi import APIRouter, Depends
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 
-from app.api.v1.deps.auth import get_db
+from app.api.v1.deps.auth import get_db, get_current_user
 from app.crud.llm_model import crud_llm_model
+from app.crud.llm_usage import crud_llm_usage
+from app.models.user import User
 from app.schemas.response import response_success
 from app.models.llm_model import ModelStatus
 from app.schemas.llm_model import LLMModel
@@ -40,4 +43,24 @@ def get_available_models(
         for model in models
     ]
     
-    return response_success(data=models_list) 
\ No newline at end of file
+    return response_success(data=models_list)
+
+@router.get("/usage", summary="获取LLM调用用量统计", response_model=dict)
+def get_usage(
+    days: int = Query(30, ge=1, le=365, description="统计最近的天数"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+) -> dict:
+    """
+    按功能类型和模型汇总当前用户最近 days 天的调用次数和token用量
+
+    返回:
+    - calls: 调用次数，其中 cached_calls 次命中响应缓存（不消耗token），truncated_calls 次输入被截断
+    - prompt_tokens / completion_tokens / total_tokens: 输入、输出和总token数
+    """
+    summary = crud_llm_usage.get_summary(
+        db,
+        user_id=current_user.id,
+        start_time=datetime.utcnow() - timedelta(days=days)
+    )
+    return response_success(data=summary)
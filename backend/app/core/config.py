@@ -60,6 +60,9 @@ class Settings(BaseSettings):
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
     REDIS_PASSWORD: Optional[str] = None
+    REDIS_ENABLED: bool = True  # 是否使用Redis共享限流等状态，关闭或不可用时回退到进程内实现
+    REDIS_SOCKET_TIMEOUT: float = 0.5  # 连接和读写超时（秒）
+    REDIS_RETRY_INTERVAL: int = 30  # 连接失败后重新尝试连接的间隔（秒），期间使用进程内实现
 
     # 国际化配置
     TIMEZONE: str = "Asia/Shanghai"
@@ -73,6 +76,103 @@ class Settings(BaseSettings):
     TASK_SCHEDULER_TASK_TIMEOUT: int = 3600  # 任务超时时间（秒）
     TASK_SCHEDULER_RETRY_DELAY: int = 300  # 重试延迟（秒）
 
+    # 邮件同步配置
+    EMAIL_SYNC_CONCURRENCY: int = 50  # 批量同步时单个事件循环内并发同步的账户数，0表示每个账户由调度器单独执行
+    EMAIL_SYNC_DISPATCH_WINDOW: int = 600  # 批量同步任务领取新账户的时长（秒），到期后交给下一个批量同步任务
+    EMAIL_SYNC_BATCH_SIZE: int = 200  # 每批批量写入的邮件数
+    EMAIL_SYNC_FOLDER_RETRIES: int = 2  # 单个文件夹同步失败后从检查点重试的次数
+    EMAIL_SYNC_RETRY_DELAY: int = 5  # 首次重试前的等待秒数，之后按次数翻倍
+    EMAIL_THREAD_SUBJECT_MATCH_DAYS: int = 30  # 没有引用头的回复按主题归并会话的时间窗口（天），0表示不按主题归并
+    EMAIL_SIMHASH_ENABLED: bool = True  # 打标签前是否查找同一发件人已打标签的近似重复邮件并复用其标签
+    EMAIL_SIMHASH_MAX_DISTANCE: int = 6  # 判定为近似重复的最大汉明距离（64位指纹，不相关邮件约为32）
+    EMAIL_SIMHASH_MIN_TOKENS: int = 10  # 主题和正文的词元数少于该值时不计算指纹
+    EMAIL_SIMHASH_MAX_CANDIDATES: int = 200  # 每次比较同一发件人最近的已打标签邮件数
+    EMAIL_LLM_TEXT_MAX_CHARS: int = 20000  # 同步时生成的LLM正文（去除HTML、引用和签名后）保存的最大字符数
+    EMAIL_TAG_BATCH_SIZE: int = 10  # 一次模型调用分类的邮件数上限，1表示逐封分类
+    EMAIL_TAG_BATCH_EMAIL_MAX_TOKENS: int = 500  # 批量分类时单封邮件截断的token数，一批的总量受功能映射的输入预算限制
+    EMAIL_PARSE_POOL_ENABLED: bool = True  # 首次全量同步时是否使用进程池并行解析邮件
+    EMAIL_PARSE_POOL_SIZE: int = 0  # 解析进程数，0表示使用CPU核数
+    EMAIL_PARSE_POOL_CHUNK_SIZE: int = 50  # 每个解析子任务包含的邮件数
+    EMAIL_PARSE_POOL_MIN_MESSAGES: int = 500  # 待同步邮件数达到该值才启用进程池
+    EMAIL_PARSE_PIPELINE_DEPTH: int = 2  # 获取与写库之间最多同时解析中的批次数
+    EMAIL_RAW_COMPRESSION: str = "zstd"  # 邮件原文压缩算法：zstd / gzip / none，未安装zstandard时使用gzip
+    EMAIL_RAW_COMPRESSION_LEVEL: int = 3  # 压缩级别
+
+    # IMAP客户端配置
+    IMAP_TIMEOUT: int = 60  # 读写超时（秒）
+    IMAP_READ_LIMIT: int = 16 * 1024 * 1024  # 单行响应的最大长度（字节）
+    IMAP_FETCH_BATCH_SIZE: int = 50  # 每条 UID FETCH 命令包含的邮件数
+    IMAP_PIPELINE_DEPTH: int = 4  # 同时在途的 FETCH 命令数
+    IMAP_MAX_CONNECTIONS: int = 200  # 进程内最大IMAP连接数
+    IMAP_MAX_CONNECTIONS_PER_HOST: int = 10  # 每个IMAP服务器的最大连接数
+
+    # IMAP提供商预算配置（所有worker共享，预算本身在 email_providers 表中按提供商配置）
+    IMAP_BUDGET_LEASE_TTL: int = 300  # 连接名额租约的有效期（秒），进程崩溃后过期自动释放
+    IMAP_BUDGET_POLL_INTERVAL: float = 0.5  # 名额不足时重新检查的间隔（秒）
+    IMAP_THROTTLE_MIN_FACTOR: float = 0.1  # 服务器限流时预算最多收缩到的比例
+    IMAP_THROTTLE_RECOVERY_SECONDS: int = 300  # 限流收缩后预算每经过该秒数恢复一倍，直到恢复原值
+    IMAP_THROTTLE_RETRY_DELAY: int = 60  # 文件夹同步因限流失败后至少等待的秒数再重试
+
+    # IMAP IDLE 实时推送配置
+    IMAP_IDLE_ENABLED: bool = False  # 是否随调度器启动IDLE监听服务
+    IMAP_IDLE_MAX_CONNECTIONS: int = 100  # IDLE长连接总数上限，超出的账户继续使用轮询
+    IMAP_IDLE_TIMEOUT: int = 1500  # 单次IDLE最长等待时间（秒），超时后重新进入IDLE
+    IMAP_IDLE_REFRESH_INTERVAL: int = 60  # 重新加载开启IDLE账户列表的间隔（秒）
+    IMAP_IDLE_MAX_FAILURES: int = 5  # 连续失败次数上限，超过后回退为轮询
+    IMAP_IDLE_BACKOFF_BASE: int = 5  # 重连退避基础时间（秒）
+    IMAP_IDLE_BACKOFF_MAX: int = 300  # 重连退避最长时间（秒）
+
+    # LLM客户端配置
+    LLM_CLIENT_CACHE_SIZE: int = 32  # 缓存的提供者客户端数（按提供者、API密钥、代理地址区分），超出时按LRU淘汰
+    LLM_HTTP_MAX_CONNECTIONS: int = 20  # 每个客户端的最大HTTP连接数
+    LLM_HTTP_MAX_KEEPALIVE: int = 10  # 每个客户端保持的空闲连接数
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 60.0  # 空闲连接的保持时间（秒）
+    LLM_HTTP_TIMEOUT: float = 120.0  # 请求超时（秒），也是渠道未设置时 agenerate 单次调用的截止时间
+    LLM_CONNECT_TIMEOUT: float = 10.0  # 连接超时（秒），渠道未设置时使用
+    LLM_STREAM_MAX_WORKERS: int = 32  # 迭代流式响应的线程数，即同时进行的流式生成数上限
+
+    # LLM响应缓存配置（功能映射开启 cache_enabled 后生效）
+    LLM_CACHE_TTL: int = 7 * 24 * 3600  # 缓存有效期（秒）
+    LLM_CACHE_L1_SIZE: int = 1024  # 进程内缓存条目数
+    LLM_CACHE_L2_BACKEND: str = "redis"  # 持久缓存后端：redis / sqlite / none，Redis不可用时使用sqlite
+    LLM_CACHE_L2_MAX_ENTRIES: int = 100000  # 持久缓存最大条目数，超出时淘汰最早写入的条目
+    LLM_CACHE_SQLITE_PATH: str = "data/llm_cache.db"  # SQLite缓存文件，相对路径基于backend目录
+
+    # LLM渠道限流配置（按提供者和API密钥共享，渠道设置 max_concurrency / requests_per_minute / tokens_per_minute 后生效）
+    LLM_RATE_LIMIT_LEASE_TTL: int = 600  # 并发名额租约的有效期（秒），进程崩溃后过期自动释放
+    LLM_RATE_LIMIT_POLL_INTERVAL: float = 0.2  # 并发名额已满时重新检查的间隔（秒）
+    LLM_RATE_LIMIT_BURST_SECONDS: float = 5.0  # 令牌桶容量为该秒数内的配额，限制突发请求
+    LLM_RATE_LIMIT_MAX_RETRIES: int = 3  # 返回429时等待后重试的次数，仍失败时抛出异常由任务重试
+    LLM_RATE_LIMIT_DEFAULT_BACKOFF: float = 5.0  # 429响应没有 Retry-After 时暂停调用的秒数
+    LLM_RATE_LIMIT_MAX_BACKOFF: float = 120.0  # 单次暂停的最长秒数
+    LLM_THROTTLE_MIN_FACTOR: float = 0.1  # 返回429时配额最多收缩到的比例
+    LLM_THROTTLE_RECOVERY_SECONDS: int = 120  # 配额收缩后每经过该秒数恢复一倍，直到恢复原值
+
+    # LLM渠道路由配置（功能映射配置渠道池后按实际调用的延迟和错误率选择渠道，失败时切换到下一个渠道）
+    LLM_ROUTER_EWMA_ALPHA: float = 0.2  # 延迟和错误率EWMA的平滑系数，越大越偏向最近的调用
+    LLM_ROUTER_DEFAULT_LATENCY_MS: float = 3000.0  # 没有调用记录的渠道按该延迟参与排序
+    LLM_ROUTER_ERROR_PENALTY: float = 4.0  # latency策略的排序分数 = 延迟 × (1 + 该系数 × 错误率) / 权重
+    LLM_ROUTER_EXPLORE_RATIO: float = 0.05  # latency策略下随机优先其他健康渠道的比例，使其延迟统计保持更新
+    LLM_ROUTER_STATS_TTL: int = 86400  # 渠道统计在没有调用后保留的秒数
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 3  # 渠道连续失败该次数后熔断，熔断期间排在其他渠道之后
+    LLM_CIRCUIT_OPEN_SECONDS: int = 60  # 熔断持续秒数，之后放行一个探测请求，成功则恢复，失败则继续熔断
+
+    # LLM Token预算配置
+    LLM_TOKENIZER_ENABLED: bool = True  # 安装tiktoken时按分词器计数，关闭或不可用时按字符估算
+    LLM_MAX_INPUT_TOKENS: int = 6000  # 功能映射未设置 max_input_tokens 时单次调用的输入token上限（提示词+消息）
+    LLM_USAGE_LOG_ENABLED: bool = True  # 是否记录每次调用的token用量（llm_usage_logs）
+
+    # MinIO配置
+    MINIO_ENDPOINT: str = "localhost:9000"
+    MINIO_ACCESS_KEY: Optional[str] = None
+    MINIO_SECRET_KEY: Optional[str] = None
+    MINIO_SECURE: bool = False
+
+    # 附件存储配置
+    BLOB_STORE_BACKEND: str = "local"  # 附件存储后端：local / minio
+    BLOB_STORE_LOCAL_DIR: str = "data/blobs"  # 本地存储目录，相对路径基于backend目录
+    BLOB_STORE_MINIO_BUCKET: str = "attachments"  # MinIO存储桶
+
     class Config:
         case_sensitive = True
         env_file = ".env"
@@ -0,0 +1,53 @@
+"""
+Redis客户端模块
+
+用于在多个worker之间共享限流、配额等状态。Redis未启用、未安装或连接失败时 get_redis 返回 None，
+调用方回退到进程内实现；连接失败后 REDIS_RETRY_INTERVAL 秒内不再尝试，避免每次调用都等待超时。
+"""
+import logging
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - 可选依赖
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+_client: Optional["redis.Redis"] = None
+_failed_at = 0.0
+_lock = threading.Lock()
+
+
+def get_redis() -> Optional["redis.Redis"]:
+    """获取共享的Redis客户端（线程安全，可跨事件循环使用），不可用时返回None"""
+    global _client
+    if not settings.REDIS_ENABLED or redis is None:
+        return None
+    if _failed_at and time.monotonic() - _failed_at < settings.REDIS_RETRY_INTERVAL:
+        return None
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = redis.Redis(
+                    host=settings.REDIS_HOST,
+                    port=settings.REDIS_PORT,
+                    db=settings.REDIS_DB,
+                    password=settings.REDIS_PASSWORD,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    health_check_interval=30
+                )
+    return _client
+
+
+def report_redis_error(error: Exception) -> None:
+    """记录Redis调用失败，在重试间隔内回退到进程内实现"""
+    global _failed_at
+    if not _failed_at or time.monotonic() - _failed_at >= settings.REDIS_RETRY_INTERVAL:
+        logger.warning(f"Redis不可用，{settings.REDIS_RETRY_INTERVAL} 秒内使用进程内实现: {str(error)}")
+    _failed_at = time.monotonic()
@@ -3,4 +3,5 @@
 用于导入所有任务，确保任务被正确注册
 """
 
-from app.core.tasks.email_sync import *  # 导入邮件同步任务
\ No newline at end of file
+from app.core.tasks.email_sync import *  # 导入邮件同步任务
+from app.core.tasks.email_storage import *  # 导入邮件存储维护任务
@@ -0,0 +1,264 @@
+"""
+IMAP IDLE 实时推送监听服务
+
+为开启 use_idle 的账户各保持一条IDLE长连接，收到 EXISTS 通知后立即触发增量同步。
+轮询同步（sync_interval）始终保留，IDLE只是让新邮件更早进入同步流程：
+超出连接预算、服务器不支持IDLE或连续失败的账户会自动回退为仅轮询。
+IDLE连接与同步连接一样计入进程内连接数上限和提供商预算，每个服务器至少给同步留出一个连接。
+"""
+import asyncio
+import logging
+import random
+from threading import Thread
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.email_account import EmailAccount
+from app.models.log import LogType
+from app.crud.email_provider import crud_email_provider
+from app.utils.email.aioimap_client import AsyncIMAPClient
+from app.utils.email.connection_limiter import IMAPBudget
+from app.utils.logger import logger_instance
+from app.core.tasks.email_sync import create_sync_task
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_exists(notifications: List[bytes]) -> Optional[int]:
+    """从IDLE通知中解析最新的 EXISTS 数量"""
+    exists = None
+    for line in notifications:
+        parts = line.split()
+        if len(parts) == 3 and parts[2].upper() == b'EXISTS' and parts[1].isdigit():
+            exists = int(parts[1])
+    return exists
+
+
+class IMAPIdleWatcher:
+    """IMAP IDLE 监听服务"""
+
+    def __init__(
+        self,
+        max_connections: int = settings.IMAP_IDLE_MAX_CONNECTIONS,
+        idle_timeout: int = settings.IMAP_IDLE_TIMEOUT,
+        refresh_interval: int = settings.IMAP_IDLE_REFRESH_INTERVAL,
+        max_failures: int = settings.IMAP_IDLE_MAX_FAILURES,
+        backoff_base: int = settings.IMAP_IDLE_BACKOFF_BASE,
+        backoff_max: int = settings.IMAP_IDLE_BACKOFF_MAX
+    ):
+        self.max_connections = max_connections  # IDLE长连接总数上限
+        self.idle_timeout = idle_timeout  # 单次IDLE最长等待时间（秒）
+        self.refresh_interval = refresh_interval  # 账户列表刷新间隔（秒）
+        self.max_failures = max_failures  # 连续失败次数上限
+        self.backoff_base = backoff_base  # 重连退避基础时间（秒）
+        self.backoff_max = backoff_max  # 重连退避最长时间（秒）
+        self.running = False
+        self._thread: Optional[Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._main_task: Optional[asyncio.Task] = None
+        self._watchers: Dict[int, asyncio.Task] = {}
+        # 已回退为轮询的账户（服务器不支持IDLE或连续失败），在账户配置变化或服务重启前不再尝试
+        self._fallback_accounts: Dict[int, str] = {}
+
+    def start(self):
+        """在独立线程中启动监听服务"""
+        if self._thread is not None:
+            logger.warning("IDLE监听服务已经在运行")
+            return
+        self.running = True
+        self._thread = Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+        logger.info("IDLE监听服务已启动")
+
+    def stop(self):
+        """停止监听服务并关闭所有长连接"""
+        self.running = False
+        if self._loop is not None and self._main_task is not None:
+            self._loop.call_soon_threadsafe(self._main_task.cancel)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        logger.info("IDLE监听服务已停止")
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._main_task = self._loop.create_task(self.run())
+        try:
+            self._loop.run_until_complete(self._main_task)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            logger.exception("IDLE监听服务运行出错")
+        finally:
+            self._loop.close()
+            self._loop = None
+            self._main_task = None
+
+    async def run(self):
+        """主循环：定期加载开启IDLE的账户，按连接预算启动或停止监听"""
+        try:
+            while self.running:
+                try:
+                    await self._refresh_watchers()
+                except Exception as e:
+                    logger.exception(f"刷新IDLE账户列表失败: {e}")
+                await asyncio.sleep(self.refresh_interval)
+        finally:
+            for task in self._watchers.values():
+                task.cancel()
+            await asyncio.gather(*self._watchers.values(), return_exceptions=True)
+            self._watchers.clear()
+
+    def _load_accounts(self) -> Tuple[List[EmailAccount], Dict[str, IMAPBudget]]:
+        """加载开启IDLE的账户及其IMAP服务器对应的提供商预算"""
+        with SessionLocal() as db:
+            accounts = db.query(EmailAccount).filter(
+                EmailAccount.use_idle == True,
+                EmailAccount.is_active == True,
+                EmailAccount.deleted_at.is_(None)
+            ).order_by(EmailAccount.id).all()
+            budgets = {
+                host: IMAPBudget.from_provider(crud_email_provider.get_by_imap_host(db, imap_host=host))
+                for host in {account.imap_host for account in accounts}
+            }
+            return accounts, budgets
+
+    @staticmethod
+    def _max_idle_per_host(budget: IMAPBudget) -> int:
+        """每个服务器允许的IDLE连接数：进程内上限和提供商预算中较小者，减去留给同步的一个连接"""
+        limit = settings.IMAP_MAX_CONNECTIONS_PER_HOST
+        if budget.max_connections:
+            limit = min(limit, budget.max_connections)
+        return max(limit - 1, 0)
+
+    async def _refresh_watchers(self):
+        accounts, budgets = await asyncio.to_thread(self._load_accounts)
+        wanted = {account.id: account for account in accounts}
+
+        # 停止已关闭IDLE、已删除或配置已变更的账户
+        for account_id, task in list(self._watchers.items()):
+            account = wanted.get(account_id)
+            if account is None or task.done() or task.get_name() != self._watch_key(account):
+                task.cancel()
+                del self._watchers[account_id]
+        for account_id in list(self._fallback_accounts):
+            if account_id not in wanted:
+                del self._fallback_accounts[account_id]
+
+        per_host: Dict[str, int] = {}
+        for account_id in self._watchers:
+            host = wanted[account_id].imap_host
+            per_host[host] = per_host.get(host, 0) + 1
+
+        skipped = 0
+        for account in accounts:
+            if account.id in self._watchers or account.id in self._fallback_accounts:
+                continue
+            budget = budgets[account.imap_host]
+            if (
+                len(self._watchers) >= self.max_connections
+                or per_host.get(account.imap_host, 0) >= self._max_idle_per_host(budget)
+            ):
+                skipped += 1
+                continue
+            per_host[account.imap_host] = per_host.get(account.imap_host, 0) + 1
+            self._watchers[account.id] = asyncio.create_task(
+                self._watch_account(
+                    account_id=account.id,
+                    host=account.imap_host,
+                    port=account.imap_port,
+                    use_ssl=account.use_ssl,
+                    username=account.email_address,
+                    password=account.auth_token,
+                    budget=budget
+                ),
+                name=self._watch_key(account)
+            )
+
+        if skipped:
+            logger.warning(f"IDLE连接数已达上限，{skipped} 个账户继续使用轮询同步")
+
+    @staticmethod
+    def _watch_key(account: EmailAccount) -> str:
+        """监听任务名称，连接配置变化时据此重建连接"""
+        return f"idle:{account.id}:{account.imap_host}:{account.imap_port}:{account.email_address}:{hash(account.auth_token)}"
+
+    async def _watch_account(
+        self,
+        account_id: int,
+        host: str,
+        port: int,
+        use_ssl: bool,
+        username: str,
+        password: str,
+        budget: IMAPBudget
+    ):
+        """保持单个账户的IDLE连接，断线后按指数退避重连"""
+        failures = 0
+        reconnecting = False
+        while self.running:
+            try:
+                async with AsyncIMAPClient(host, port, use_ssl, budget=budget) as imap:
+                    await imap.connect(username, password)
+                    if not imap.has_capability("IDLE"):
+                        self._fallback(account_id, "服务器不支持IDLE")
+                        return
+                    exists = await imap.select_folder("INBOX")
+                    failures = 0
+                    if reconnecting:
+                        # 断线期间可能错过新邮件，重连后先触发一次同步
+                        await self._trigger_sync(account_id)
+                    reconnecting = True
+
+                    while self.running:
+                        notifications = await imap.idle(self.idle_timeout)
+                        new_exists = _parse_exists(notifications)
+                        if new_exists is None:
+                            continue
+                        if new_exists > exists:
+                            await self._trigger_sync(account_id)
+                        exists = new_exists
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                reconnecting = True
+                if failures >= self.max_failures:
+                    self._fallback(account_id, f"连续失败 {failures} 次: {str(e)}")
+                    return
+                delay = min(self.backoff_base * 2 ** (failures - 1), self.backoff_max)
+                delay += random.uniform(0, delay / 2)
+                logger.warning(f"账户 {account_id} IDLE连接断开，{delay:.0f} 秒后重连: {str(e)}")
+                await asyncio.sleep(delay)
+
+    async def _trigger_sync(self, account_id: int):
+        """触发增量同步：已排队的同步任务会被提前到当前时间执行"""
+        try:
+            await asyncio.to_thread(create_sync_task, account_id)
+        except Exception as e:
+            logger.error(f"账户 {account_id} 触发同步失败: {str(e)}")
+
+    def _fallback(self, account_id: int, reason: str):
+        """将账户回退为轮询同步"""
+        self._fallback_accounts[account_id] = reason
+        logger_instance.warning(
+            message=f"IDLE监听回退为轮询同步: {reason}",
+            module="tasks",
+            function="IMAPIdleWatcher",
+            type=LogType.SYSTEM,
+            details={"account_id": account_id}
+        )
+
+    def stats(self) -> Dict[str, int]:
+        """监听服务统计信息"""
+        return {
+            "watching": sum(1 for task in self._watchers.values() if not task.done()),
+            "fallback": len(self._fallback_accounts),
+            "max_connections": self.max_connections
+        }
+
+
+# 全局IDLE监听服务实例
+idle_watcher = IMAPIdleWatcher()
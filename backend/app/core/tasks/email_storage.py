@@ -0,0 +1,93 @@
+"""
+邮件存储维护任务模块
+"""
+import logging
+from typing import Any, Dict, List
+
+from app.core.tasks.registry import task_registry
+from app.crud.email import crud_email_raw_content
+from app.crud.email_thread import crud_email_thread
+from app.db.session import SessionLocal
+from app.models.log import LogType
+from app.utils.email.parser import parse_thread_headers
+from app.utils.logger import logger_instance
+
+logger = logging.getLogger(__name__)
+
+@task_registry.register(name="migrate_email_raw_content")
+def migrate_email_raw_content(batch_size: int = 200, max_batches: int = 0) -> Dict[str, Any]:
+    """将历史邮件的 emails.raw_content 迁移到压缩存储 email_raw_contents
+
+    每批一个事务，可重复执行；max_batches 为0时迁移到没有剩余数据为止。
+    """
+    migrated = batches = 0
+    with SessionLocal() as db:
+        while not max_batches or batches < max_batches:
+            count = crud_email_raw_content.migrate_legacy(db, batch_size=batch_size)
+            if not count:
+                break
+            migrated += count
+            batches += 1
+            logger.info(f"已迁移邮件原文 {migrated} 封")
+    
+    logger_instance.info(
+        message="邮件原文迁移完成",
+        module="tasks",
+        function="migrate_email_raw_content",
+        type=LogType.SYSTEM,
+        details={"migrated": migrated, "batches": batches}
+    )
+    return {
+        "status": "success",
+        "migrated": migrated,
+        "batches": batches
+    }
+
+@task_registry.register(name="build_email_threads")
+def build_email_threads(batch_size: int = 500, max_batches: int = 0) -> Dict[str, Any]:
+    """为尚未归入会话的邮件（历史数据或归并失败的邮件）按时间顺序补建会话
+
+    使用与同步写入相同的增量归并，每批一个事务；max_batches 为0时处理到没有剩余邮件为止。
+    """
+    threaded = batches = 0
+    with SessionLocal() as db:
+        while not max_batches or batches < max_batches:
+            emails = crud_email_thread.get_unthreaded(db, batch_size=batch_size)
+            if not emails:
+                break
+            by_account: Dict[int, List[Dict[str, Any]]] = {}
+            for email in emails:
+                if email.in_reply_to is None and email.references is None:
+                    # 历史邮件入库时未提取引用头，从原文补充
+                    raw = crud_email_raw_content.get_raw(db, email_id=email.id)
+                    if raw:
+                        email.in_reply_to, email.references = parse_thread_headers(raw)
+                by_account.setdefault(email.account_id, []).append({
+                    "id": email.id,
+                    "message_id": email.message_id,
+                    "in_reply_to": email.in_reply_to,
+                    "references": email.references,
+                    "subject": email.subject,
+                    "from_address": email.from_address,
+                    "to_address": email.to_address,
+                    "cc_address": email.cc_address,
+                    "date": email.date
+                })
+            for account_id, items in by_account.items():
+                crud_email_thread.add_emails(db, account_id=account_id, emails=items)
+            threaded += len(emails)
+            batches += 1
+            logger.info(f"已归并邮件会话 {threaded} 封")
+    
+    logger_instance.info(
+        message="邮件会话补建完成",
+        module="tasks",
+        function="build_email_threads",
+        type=LogType.SYSTEM,
+        details={"threaded": threaded, "batches": batches}
+    )
+    return {
+        "status": "success",
+        "threaded": threaded,
+        "batches": batches
+    }
@@ -2,31 +2,332 @@
 邮件同步任务模块
 """
 from datetime import datetime, timedelta
+import asyncio
 import logging
-from typing import Dict, Any
+from collections import deque
+from typing import Deque, Dict, Any, List, Optional, Tuple
 
-from sqlalchemy import text
+from sqlalchemy import and_, or_, text, update
 from app.core.tasks.registry import task_registry
 from app.utils.logger import logger_instance
 from app.models.log import LogType
 from app.models.task import Task, TaskStatus, TaskPriority
 from app.models.email_account import EmailAccount
-from app.models.email import Email, EmailAttachment
-from app.crud.email import crud_email, crud_email_sync_log
-from app.schemas.email import EmailCreate, EmailSyncLogCreate, EmailSyncLogUpdate
+from app.crud.email import crud_email, crud_email_attachment, crud_email_sync_log, crud_email_folder_state
+from app.crud.email_provider import crud_email_provider
+from app.crud.email_thread import crud_email_thread
+from app.schemas.email import EmailSyncLogCreate, EmailSyncLogUpdate, EmailFolderStateUpdate
 from app.db.session import SessionLocal
-from app.utils.email.imap_client import IMAPClient
-from app.utils.email.parser import (
-    parse_email_date,
-    parse_email_address,
-    get_email_body,
-    get_attachment_info,
-    parse_email_addresses,
-    decode_mime_words
-)
-from app.core.tasks.email_tag import create_tag_task
+from app.core.config import settings
+from app.utils.email.aioimap_client import AsyncIMAPClient, IMAPThrottledError
+from app.utils.email.connection_limiter import IMAPBudget
+from app.utils.email.parse_pool import parse_email_batch
+from app.core.tasks.email_tag import create_tag_tasks
 
 logger = logging.getLogger(__name__)
+
+def _flush_email_batch(db, account_id: int, rows: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """在一个事务中写入一批邮件：已存在的批量更新，新邮件批量插入，返回(新增数, 更新数)
+
+    rows 来自同一个文件夹。任一步骤失败时整批回滚，逐封重试不会重复执行已生效的更新。
+    """
+    # 按文件夹匹配已有邮件，同一封邮件在其他文件夹中的行不受影响，每个文件夹各自维护UID和状态
+    existing = crud_email.get_ids_by_message_ids(
+        db,
+        account_id=account_id,
+        folder=rows[0]["folder"],
+        message_ids=[row["message_id"] for row in rows]
+    )
+    # 只有被同步标记为服务器已删除的邮件在本文件夹重新出现时才恢复，用户删除的邮件保持删除状态
+    server_deleted = crud_email.get_server_deleted_ids(db, email_ids=list(existing.values()))
+    updates = []
+    for row in rows:
+        email_id = existing.get(row["message_id"])
+        if email_id is None:
+            continue
+        item = {
+            "id": email_id,
+            "subject": row["subject"],
+            "content": row["content"],
+            "llm_text": row["llm_text"],
+            "content_type": row["content_type"],
+            "folder": row["folder"],
+            "uid": row["uid"],
+            "is_read": row["is_read"],
+            "is_flagged": row["is_flagged"]
+        }
+        if email_id in server_deleted:
+            item.update(is_deleted=False, deleted_at=None)
+        updates.append(item)
+    creates = [row for row in rows if row["message_id"] not in existing]
+    
+    try:
+        crud_email.bulk_update(db, emails=updates, commit=False)
+        # 已存在的邮件补充旧附件记录的存储键
+        crud_email_attachment.fill_missing_storage(
+            db,
+            attachments={
+                existing[row["message_id"]]: row["attachments"]
+                for row in rows if row["message_id"] in existing and row["attachments"]
+            },
+            commit=False
+        )
+        new_ids = crud_email.bulk_create_with_attachments(db, emails=creates, commit=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    try:
+        crud_email_thread.add_emails(
+            db,
+            account_id=account_id,
+            emails=[{**row, "id": email_id} for row, email_id in zip(creates, new_ids)]
+        )
+    except Exception as e:
+        # 会话归并失败不影响邮件写入，未归并的邮件由 build_email_threads 任务补齐
+        logger.error(f"邮件会话归并失败: {str(e)}")
+    
+    # 创建标签同步任务
+    create_tag_tasks([item["id"] for item in updates] + new_ids)
+    return len(new_ids), len(updates)
+
+def _save_email_batch(db, account_id: int, rows: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """批量写入邮件，批量失败时逐封重试以隔离异常邮件"""
+    try:
+        return _flush_email_batch(db, account_id, rows)
+    except Exception as e:
+        logger.error(f"批量写入邮件失败，逐封重试: {str(e)}")
+    
+    new_emails = updated_emails = 0
+    for row in rows:
+        try:
+            created, updated = _flush_email_batch(db, account_id, [row])
+            new_emails += created
+            updated_emails += updated
+        except Exception as e:
+            logger.error(f"处理邮件失败: {str(e)}")
+    return new_emails, updated_emails
+
+def _get_sync_folders(account: EmailAccount) -> List[str]:
+    """账户需要同步的文件夹列表（去重保序），未配置时仅同步INBOX"""
+    folders = [folder for folder in (account.sync_folders or []) if folder]
+    return list(dict.fromkeys(folders)) or ["INBOX"]
+
+async def _sync_folder_changes(
+    imap: AsyncIMAPClient,
+    db,
+    account_id: int,
+    folder: str,
+    last_uid: int,
+    modseq: Optional[int]
+) -> Tuple[int, int]:
+    """同步已有邮件（UID <= last_uid）的已读/星标状态和删除，返回(更新数, 删除数)
+
+    - 支持QRESYNC：一条 UID FETCH (CHANGEDSINCE modseq VANISHED) 同时取回变化的标志和已删除的UID
+    - 仅支持CONDSTORE：CHANGEDSINCE 获取变化的标志，删除通过UID集合比对
+    - 都不支持：通过 UID SEARCH 获取全部/未读/星标UID集合，与本地比对
+    """
+    uid_range = f"1:{last_uid}"
+    server_modseq = imap.selected.get("highestmodseq")
+    vanished: Optional[List[int]] = None
+    
+    if modseq and server_modseq and not imap.selected.get("nomodseq"):
+        if server_modseq == modseq:
+            # 自上次同步以来文件夹没有任何变化
+            return 0, 0
+        qresync = "QRESYNC" in imap.enabled
+        changed, vanished_uids = await imap.fetch_flags(uid_range, changed_since=modseq, vanished=qresync)
+        server_flags = {
+            uid: ("\\Seen" in flags, "\\Flagged" in flags)
+            for uid, flags in changed.items()
+        }
+        if qresync:
+            vanished = vanished_uids
+            known = await asyncio.to_thread(
+                crud_email.get_folder_flags, db,
+                account_id=account_id, folder=folder, uids=list(server_flags) + vanished
+            )
+        else:
+            known = await asyncio.to_thread(
+                crud_email.get_folder_flags, db,
+                account_id=account_id, folder=folder, max_uid=last_uid
+            )
+    else:
+        unseen = set(map(int, await imap.search_emails(['UID', uid_range, 'UNSEEN'])))
+        flagged = set(map(int, await imap.search_emails(['UID', uid_range, 'FLAGGED'])))
+        server_flags = None
+        known = await asyncio.to_thread(
+            crud_email.get_folder_flags, db,
+            account_id=account_id, folder=folder, max_uid=last_uid
+        )
+    
+    if vanished is None:
+        existing = set(map(int, await imap.search_emails(['UID', uid_range])))
+        vanished = [uid for uid in known if uid not in existing]
+        if server_flags is None:
+            server_flags = {uid: (uid not in unseen, uid in flagged) for uid in existing}
+    
+    updates = [
+        {"id": known[uid][0], "is_read": is_read, "is_flagged": is_flagged}
+        for uid, (is_read, is_flagged) in server_flags.items()
+        if uid in known and known[uid][1:] != (is_read, is_flagged)
+    ]
+    await asyncio.to_thread(crud_email.bulk_update, db, emails=updates)
+    deleted = await asyncio.to_thread(
+        crud_email.mark_deleted_by_ids, db,
+        email_ids=[known[uid][0] for uid in vanished if uid in known]
+    )
+    return len(updates), deleted
+
+def _new_folder_progress(folder: str) -> Dict[str, Any]:
+    """单个文件夹一次同步的累计统计"""
+    return {
+        "folder": folder,
+        "total_emails": 0,
+        "new_emails": 0,
+        "updated_emails": 0,
+        "deleted_emails": 0
+    }
+
+async def _sync_folder(
+    account_id: int,
+    folder: str,
+    connection: Dict[str, Any],
+    sync_id: int,
+    progress: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """使用独立的IMAP连接和数据库会话同步单个文件夹
+
+    先同步已有邮件的标志和删除，再按文件夹记录的 UIDVALIDITY 和 last_uid 增量获取新邮件，
+    统计数据原子累加到同一条同步日志中。每批邮件提交后保存检查点（已提交的最大UID），
+    失败重试或进程崩溃后从检查点继续。
+
+    progress 为同一次同步中该文件夹的累计统计，重试时传入同一个字典以免重复计数。
+    数据库操作都在工作线程中执行，不阻塞同一事件循环中其他文件夹和账户的同步。
+    """
+    if progress is None:
+        progress = _new_folder_progress(folder)
+    with SessionLocal() as db:
+        state = await asyncio.to_thread(
+            crud_email_folder_state.get_or_create, db, account_id=account_id, folder=folder
+        )
+        # 检查点提交后ORM对象会过期，先取出需要的字段，避免在事件循环中触发延迟加载
+        state_id, saved_uidvalidity, saved_modseq = state.id, state.uidvalidity, state.highestmodseq
+        saved_last_uid = state.last_uid or 0
+        async with AsyncIMAPClient(
+            connection["host"],
+            connection["port"],
+            connection["use_ssl"],
+            budget=connection.get("budget")
+        ) as imap:
+            await imap.connect(connection["username"], connection["password"])
+            if imap.has_capability("QRESYNC"):
+                try:
+                    await imap.enable("QRESYNC")
+                except Exception as e:
+                    logger.warning(f"启用QRESYNC失败: {str(e)}")
+            await imap.select_folder(folder, condstore=True)
+            uidvalidity = imap.selected.get("uidvalidity")
+            
+            last_uid = saved_last_uid
+            if saved_uidvalidity and uidvalidity and saved_uidvalidity != uidvalidity:
+                # UIDVALIDITY 变化说明服务器重建了该文件夹的UID，原有进度失效，需重新全量比对
+                logger.warning(f"账户 {account_id} 文件夹 {folder} UIDVALIDITY 已变化，重新全量同步")
+                last_uid = 0
+                await asyncio.to_thread(
+                    crud_email_folder_state.save_checkpoint,
+                    db, state_id=state_id, uidvalidity=uidvalidity, last_uid=0
+                )
+            
+            if last_uid:
+                updated, deleted = await _sync_folder_changes(
+                    imap, db, account_id, folder, last_uid, saved_modseq
+                )
+                progress["updated_emails"] += updated
+                progress["deleted_emails"] += deleted
+                await asyncio.to_thread(
+                    crud_email_sync_log.increment_sync_stats,
+                    db,
+                    sync_id=sync_id,
+                    updated_emails=updated,
+                    deleted_emails=deleted
+                )
+            
+            uids = await imap.search_new_uids(last_uid)
+            if not progress["total_emails"]:
+                # 重试时剩余的邮件已计入首次统计
+                progress["total_emails"] = len(uids)
+                await asyncio.to_thread(
+                    crud_email_sync_log.increment_sync_stats, db, sync_id=sync_id, total_emails=len(uids)
+                )
+            elif uids:
+                logger.info(f"账户 {account_id} 文件夹 {folder} 从检查点 UID {last_uid} 继续同步，剩余 {len(uids)} 封")
+            
+            # 首次同步且邮件量较大时使用进程池并行解析，增量同步的小批量在线程中解析即可
+            use_pool = (
+                settings.EMAIL_PARSE_POOL_ENABLED
+                and last_uid == 0
+                and len(uids) >= settings.EMAIL_PARSE_POOL_MIN_MESSAGES
+            )
+            
+            async def save(parsing: "asyncio.Future[List[Dict[str, Any]]]", batch_last_uid: int) -> None:
+                rows = await parsing
+                if rows:
+                    created, updated = await asyncio.to_thread(_save_email_batch, db, account_id, rows)
+                    progress["new_emails"] += created
+                    progress["updated_emails"] += updated
+                    await asyncio.to_thread(
+                        crud_email_sync_log.increment_sync_stats,
+                        db,
+                        sync_id=sync_id,
+                        new_emails=created,
+                        updated_emails=updated
+                    )
+                await asyncio.to_thread(
+                    crud_email_folder_state.save_checkpoint,
+                    db, state_id=state_id, uidvalidity=uidvalidity, last_uid=batch_last_uid
+                )
+            
+            # 流水线：获取下一批的同时解析前几批，写库和检查点严格按获取顺序进行（同一批次内按message_id去重）
+            batch_size = settings.EMAIL_SYNC_BATCH_SIZE
+            pipeline_depth = max(settings.EMAIL_PARSE_PIPELINE_DEPTH, 0)
+            pending: Deque[Tuple[asyncio.Future, int]] = deque()
+            try:
+                for i in range(0, len(uids), batch_size):
+                    chunk = uids[i:i + batch_size]
+                    try:
+                        messages = await imap.fetch_raw_messages([str(uid).encode() for uid in chunk])
+                    except Exception:
+                        # 获取失败时先写入已获取的批次，让检查点尽量前进后再重试
+                        while pending:
+                            await save(*pending.popleft())
+                        raise
+                    pending.append((
+                        asyncio.ensure_future(parse_email_batch(account_id, folder, messages, use_pool=use_pool)),
+                        max(chunk)
+                    ))
+                    while len(pending) > pipeline_depth:
+                        await save(*pending.popleft())
+                while pending:
+                    await save(*pending.popleft())
+            finally:
+                for parsing, _ in pending:
+                    parsing.cancel()
+            
+            await asyncio.to_thread(
+                crud_email_folder_state.update,
+                db,
+                db_obj=state,
+                obj_in=EmailFolderStateUpdate(
+                    uidvalidity=uidvalidity,
+                    last_uid=max(uids[-1], last_uid) if uids else last_uid,
+                    highestmodseq=imap.selected.get("highestmodseq"),
+                    last_sync_time=datetime.now()
+                )
+            )
+    
+    return progress
+
 def create_sync_task(account_id: int) -> Task:
     try:
         # 使用SessionLocal上下文管理器进行数据库会话管理
@@ -123,7 +424,11 @@ def create_sync_task(account_id: int) -> Task:
         )
         raise
 
-@task_registry.register(name="sync_email_account")
+@task_registry.register(
+    name="sync_email_account",
+    # 开启批量同步时由 sync_email_accounts 在同一事件循环内领取执行
+    batched_by="sync_email_accounts" if settings.EMAIL_SYNC_CONCURRENCY > 0 else None
+)
 async def sync_email_account(account_id: int) -> Dict[str, Any]:
     """执行邮件同步任务"""
     try:
@@ -157,177 +462,129 @@ async def sync_email_account(account_id: int) -> Dict[str, Any]:
             )
             
             try:
-                # 使用IMAP客户端
-                with IMAPClient(account.imap_host, account.imap_port, account.use_ssl) as imap:
-                    imap.connect(account.email_address, account.auth_token)
-                    imap.select_folder("INBOX")
-                    
-                    # 获取邮件列表
-                    emails = imap.get_emails_since(account.last_sync_time)
-                    
-                    total_emails = len(emails)
-                    new_emails = 0
-                    updated_emails = 0
-                    
-                    # 更新同步日志
-                    crud_email_sync_log.update(
-                        db,
-                        db_obj=sync_log,
-                        obj_in=EmailSyncLogUpdate(
-                            total_emails=total_emails
-                        )
+                connection = {
+                    "host": account.imap_host,
+                    "port": account.imap_port,
+                    "use_ssl": account.use_ssl,
+                    "username": account.email_address,
+                    "password": account.auth_token,
+                    # 按IMAP服务器匹配提供商的连接数和获取速率预算，所有worker共享
+                    "budget": IMAPBudget.from_provider(
+                        crud_email_provider.get_by_imap_host(db, imap_host=account.imap_host)
                     )
-                    
-                    # 处理每封邮件
-                    for email_body, msg in emails:
+                }
+                folders = _get_sync_folders(account)
+                # 每个文件夹使用独立连接，并行数不超过账户配置的连接数
+                semaphore = asyncio.Semaphore(max(1, min(account.sync_concurrency or 1, len(folders))))
+                
+                async def run_folder(folder: str) -> Dict[str, Any]:
+                    # 失败后从该文件夹的检查点重试，退避间隔按次数翻倍
+                    progress = _new_folder_progress(folder)
+                    attempt = 0
+                    while True:
                         try:
-                            # 解析邮件基本信息
-                            message_id = msg.get('Message-ID', '')
-                            subject = decode_mime_words(msg.get('Subject', ''))
-                            from_name, from_address = parse_email_address(msg.get('From', ''))
-                            
-                            # 解析日期
-                            date_str = msg.get('Date')
-                            # 如果没获取到时间可能是自己发送给自己的邮件
-                            if not date_str:
-                                date_str = msg.get('Received')
-                            date = parse_email_date(date_str) if date_str else datetime.now()
-                            
-                            # 解析收件人信息
-                            to_list = parse_email_addresses(msg.get_all('To', []))
-                            cc_list = parse_email_addresses(msg.get_all('Cc', []) or [])
-                            bcc_list = parse_email_addresses(msg.get_all('Bcc', []) or [])
-                            # 获取邮件内容
-                            content, content_type = get_email_body(msg)
-                            # 检查是否已存在该邮件
-                            existing_email = crud_email.get_by_message_id(db, account_id=account_id, message_id=message_id)
-                            
-                            if existing_email:
-                                # 更新现有邮件
-                                crud_email.update(
-                                    db,
-                                    db_obj=existing_email,
-                                    obj_in={
-                                        "subject": decode_mime_words(subject),
-                                        "content": content,
-                                        "content_type": content_type
-                                    }
-                                )
-                                updated_emails += 1
-                                # 创建标签同步任务
-                                create_tag_task(existing_email.id);
-                            else:
-                                # 创建新邮件
-                                email_obj = crud_email.create(
-                                    db,
-                                    obj_in=EmailCreate(
-                                        account_id=account_id,
-                                        message_id=message_id,
-                                        subject=decode_mime_words(subject),
-                                        from_address=from_address,
-                                        from_name=from_name,
-                                        to_address=to_list,
-                                        cc_address=cc_list,
-                                        bcc_address=bcc_list,
-                                        date=date,
-                                        content_type=content_type,
-                                        content=content,
-                                        raw_content=email_body.decode(),
-                                        has_attachments=False,
-                                        size=len(email_body)
-                                    )
-                                )
-                                
-                                # 处理附件
-                                if msg.is_multipart():
-                                    for part in msg.walk():
-                                        if part.get_content_maintype() == 'multipart':
-                                            continue
-                                        if part.get_content_maintype() != 'text':
-                                            attachment = get_attachment_info(part, email_obj.id)
-                                            if attachment:
-                                                email_obj.has_attachments = True
-                                                db.add(EmailAttachment(**attachment.dict()))
-                                
-                                new_emails += 1
-                                # 创建标签同步任务
-                                create_tag_task(email_obj.id);
-                            
-                            # 定期提交事务和更新同步状态
-                            if (new_emails + updated_emails) % 10 == 0:
-                                db.commit()
-                                crud_email_sync_log.update_sync_stats(
-                                    db,
-                                    sync_id=sync_log.id,
-                                    new_emails=new_emails,
-                                    updated_emails=updated_emails
-                                )
-                            
-                            
+                            async with semaphore:
+                                return await _sync_folder(account_id, folder, connection, sync_log.id, progress)
                         except Exception as e:
-                            logger.error(f"处理邮件失败: {str(e)}")
-                            continue
-                    
-                    # 更新同步完成状态
-                    crud_email_sync_log.update(
-                        db,
-                        db_obj=sync_log,
-                        obj_in=EmailSyncLogUpdate(
-                            status="COMPLETED",
-                            end_time=datetime.now(),
-                            new_emails=new_emails,
-                            updated_emails=updated_emails
-                        )
-                    )
-                    # 更新账户同步状态
-                    account.last_sync_time = datetime.now()
-                    account.sync_status = "COMPLETED"
-                    account.total_emails = db.query(Email).filter(Email.account_id == account_id).count()
-                    account.unread_emails = db.query(Email).filter(
-                        Email.account_id == account_id,
-                        Email.is_read == False
-                    ).count()
-                    
-                    # 如果开启了自动同步，创建下一次的同步任务
-                    next_sync_time = datetime.now() + timedelta(minutes=account.sync_interval)
-                    next_task = Task(
-                        name=f"同步邮件账户 {account_id}",
-                        func_name="sync_email_account",
-                        args={"account_id": account_id},
-                        status=TaskStatus.PENDING,
-                        priority=TaskPriority.NORMAL.value,
-                        scheduled_at=next_sync_time,
-                        max_retries=3,
-                        timeout=3600
-                    )
-                    db.add(next_task)
-                    
-                    db.commit()
-                    
-                    logger_instance.info(
-                        message="邮件同步任务执行完成",
-                        module="tasks",
-                        function="sync_email_account",
-                        type=LogType.SYSTEM,
-                        details={
-                            "account_id": account_id,
-                            "total_emails": total_emails,
-                            "new_emails": new_emails,
-                            "updated_emails": updated_emails,
-                            "next_sync_time": next_sync_time.isoformat()
-                        }
+                            if attempt >= settings.EMAIL_SYNC_FOLDER_RETRIES:
+                                raise
+                            delay = settings.EMAIL_SYNC_RETRY_DELAY * (2 ** attempt)
+                            if isinstance(e, IMAPThrottledError):
+                                delay = max(delay, settings.IMAP_THROTTLE_RETRY_DELAY)
+                            attempt += 1
+                            logger.warning(
+                                f"账户 {account_id} 文件夹 {folder} 同步失败，{delay} 秒后从检查点重试"
+                                f"（第 {attempt} 次）: {str(e)}"
+                            )
+                            await asyncio.sleep(delay)
+                
+                results = await asyncio.gather(
+                    *(run_folder(folder) for folder in folders),
+                    return_exceptions=True
+                )
+                
+                failed_folders = {}
+                total_emails = new_emails = updated_emails = deleted_emails = 0
+                for folder, result in zip(folders, results):
+                    if isinstance(result, BaseException):
+                        failed_folders[folder] = str(result)
+                        logger.error(f"账户 {account_id} 文件夹 {folder} 同步失败: {str(result)}")
+                        continue
+                    total_emails += result["total_emails"]
+                    new_emails += result["new_emails"]
+                    updated_emails += result["updated_emails"]
+                    deleted_emails += result["deleted_emails"]
+                
+                if len(failed_folders) == len(folders):
+                    raise next(result for result in results if isinstance(result, BaseException))
+                
+                # 更新同步完成状态（部分文件夹失败时记录错误信息，下次同步从各自的UID进度继续）
+                error_message = None
+                if failed_folders:
+                    error_message = "; ".join(f"{folder}: {error}" for folder, error in failed_folders.items())[:500]
+                db.refresh(sync_log)
+                crud_email_sync_log.update(
+                    db,
+                    db_obj=sync_log,
+                    obj_in=EmailSyncLogUpdate(
+                        status="COMPLETED",
+                        end_time=datetime.now(),
+                        error_message=error_message
                     )
-                    
-                    return {
-                        "status": "success",
-                        "message": "邮件同步任务执行完成",
+                )
+                # 更新账户同步状态
+                account.last_sync_time = datetime.now()
+                account.sync_status = "COMPLETED"
+                account.total_emails, account.unread_emails = crud_email_folder_state.get_counts(
+                    db, account_id=account_id
+                )
+                
+                # 如果开启了自动同步，创建下一次的同步任务
+                next_sync_time = datetime.now() + timedelta(minutes=account.sync_interval)
+                next_task = Task(
+                    name=f"同步邮件账户 {account_id}",
+                    func_name="sync_email_account",
+                    args={"account_id": account_id},
+                    status=TaskStatus.PENDING,
+                    priority=TaskPriority.NORMAL.value,
+                    scheduled_at=next_sync_time,
+                    max_retries=3,
+                    timeout=3600
+                )
+                db.add(next_task)
+                
+                db.commit()
+                
+                logger_instance.info(
+                    message="邮件同步任务执行完成",
+                    module="tasks",
+                    function="sync_email_account",
+                    type=LogType.SYSTEM,
+                    details={
                         "account_id": account_id,
+                        "folders": folders,
+                        "failed_folders": failed_folders,
                         "total_emails": total_emails,
                         "new_emails": new_emails,
                         "updated_emails": updated_emails,
-                        "sync_time": datetime.now().isoformat(),
+                        "deleted_emails": deleted_emails,
                         "next_sync_time": next_sync_time.isoformat()
                     }
+                )
+                
+                return {
+                    "status": "success",
+                    "message": "邮件同步任务执行完成",
+                    "account_id": account_id,
+                    "folders": folders,
+                    "failed_folders": failed_folders,
+                    "total_emails": total_emails,
+                    "new_emails": new_emails,
+                    "updated_emails": updated_emails,
+                    "deleted_emails": deleted_emails,
+                    "sync_time": datetime.now().isoformat(),
+                    "next_sync_time": next_sync_time.isoformat()
+                }
                     
             except Exception as e:
                 # 更新同步失败状态
@@ -362,4 +619,162 @@ async def sync_email_account(account_id: int) -> Dict[str, Any]:
             error_stack=str(e),
             details={"account_id": account_id}
         )
-        raise
\ No newline at end of file
+        raise
+
+
+def _dispatcher_timeout() -> int:
+    """批量同步任务的超时时间：领取时长加上最后领取的账户同步完成所需的时间"""
+    return settings.EMAIL_SYNC_DISPATCH_WINDOW + settings.TASK_SCHEDULER_TASK_TIMEOUT
+
+
+def _schedule_dispatcher() -> None:
+    """创建立即执行的批量同步任务"""
+    with SessionLocal() as db:
+        db.add(Task(
+            name="批量同步邮件账户",
+            func_name="sync_email_accounts",
+            args={},
+            status=TaskStatus.PENDING,
+            priority=TaskPriority.NORMAL.value,
+            scheduled_at=datetime.now(),
+            max_retries=settings.TASK_SCHEDULER_MAX_RETRIES,
+            timeout=_dispatcher_timeout()
+        ))
+        db.commit()
+
+
+def ensure_sync_dispatcher() -> None:
+    """开启批量同步时确保存在待执行或执行中的 sync_email_accounts 任务（调度器启动时调用）"""
+    if settings.EMAIL_SYNC_CONCURRENCY <= 0:
+        return
+    with SessionLocal() as db:
+        # 进程退出时遗留的执行中任务超过超时时间后不再计入
+        stale_before = datetime.now() - timedelta(seconds=_dispatcher_timeout())
+        exists = db.query(Task.id).filter(
+            Task.func_name == "sync_email_accounts",
+            Task.deleted_at.is_(None),
+            or_(
+                Task.status == TaskStatus.PENDING,
+                and_(Task.status == TaskStatus.RUNNING, Task.started_at >= stale_before)
+            )
+        ).first()
+    if not exists:
+        _schedule_dispatcher()
+
+
+def _claim_sync_tasks(limit: int) -> List[Tuple[int, int, int]]:
+    """领取到期的账户同步任务，返回 [(任务ID, 账户ID, 超时秒数)]
+
+    按条件更新 PENDING -> RUNNING 领取，其他批量同步任务已领取的任务会被跳过。
+    """
+    claimed = []
+    with SessionLocal() as db:
+        tasks = (
+            db.query(Task.id, Task.args, Task.timeout)
+            .filter(
+                Task.func_name == "sync_email_account",
+                Task.status == TaskStatus.PENDING,
+                Task.scheduled_at <= datetime.now(),
+                Task.deleted_at.is_(None)
+            )
+            .order_by(Task.priority.desc(), Task.scheduled_at.asc())
+            .limit(limit)
+            .all()
+        )
+        for task_id, args, timeout in tasks:
+            result = db.execute(
+                update(Task)
+                .where(Task.id == task_id, Task.status == TaskStatus.PENDING)
+                .values(status=TaskStatus.RUNNING, started_at=datetime.now())
+            )
+            if result.rowcount:
+                claimed.append((task_id, (args or {})["account_id"], timeout or settings.TASK_SCHEDULER_TASK_TIMEOUT))
+        db.commit()
+    return claimed
+
+
+def _finish_sync_task(task_id: int, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+    """记录领取的账户同步任务的结果，失败时与调度器相同地延迟重试或标记失败"""
+    with SessionLocal() as db:
+        task = db.get(Task, task_id)
+        if not task:
+            return
+        if error is None:
+            task.status = TaskStatus.COMPLETED
+            task.completed_at = datetime.now()
+            task.result = {"result": result}
+        else:
+            task.retry_count += 1
+            if task.retry_count >= settings.TASK_SCHEDULER_MAX_RETRIES:
+                task.status = TaskStatus.FAILED
+            else:
+                task.status = TaskStatus.PENDING
+                task.scheduled_at = datetime.now() + timedelta(seconds=settings.TASK_SCHEDULER_RETRY_DELAY)
+            task.error = error[:500]
+        db.commit()
+
+
+@task_registry.register(name="sync_email_accounts")
+async def sync_email_accounts() -> Dict[str, Any]:
+    """批量同步：在同一事件循环内并发执行到期的 sync_email_account 任务
+
+    在 EMAIL_SYNC_DISPATCH_WINDOW 秒内持续领取到期的账户同步任务，同时执行的账户数不超过
+    EMAIL_SYNC_CONCURRENCY，IMAP连接数另受全局、每个服务器和提供商预算的约束。
+    到期后先创建下一个批量同步任务接手新到期的账户，再等待已领取的账户同步完成。
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.EMAIL_SYNC_DISPATCH_WINDOW
+    running: Dict[asyncio.Future, int] = {}
+    succeeded: List[int] = []
+    failed: List[int] = []
+    handed_over = False
+
+    async def run(task_id: int, account_id: int, timeout: int) -> None:
+        try:
+            result = await asyncio.wait_for(sync_email_account(account_id), timeout=timeout)
+        except asyncio.CancelledError:
+            # 批量任务被取消（如超时）时记为一次失败，由后续批量同步任务重试
+            _finish_sync_task(task_id, error="批量同步任务已取消")
+            raise
+        except Exception as e:
+            failed.append(account_id)
+            message = f"任务执行超时（{timeout}秒）" if isinstance(e, asyncio.TimeoutError) else str(e)
+            await asyncio.to_thread(_finish_sync_task, task_id, error=message)
+            return
+        succeeded.append(account_id)
+        await asyncio.to_thread(_finish_sync_task, task_id, result=result)
+
+    try:
+        while True:
+            if loop.time() >= deadline:
+                if not handed_over:
+                    await asyncio.to_thread(_schedule_dispatcher)
+                    handed_over = True
+                if not running:
+                    break
+            elif len(running) < settings.EMAIL_SYNC_CONCURRENCY:
+                for task_id, account_id, timeout in await asyncio.to_thread(
+                    _claim_sync_tasks, settings.EMAIL_SYNC_CONCURRENCY - len(running)
+                ):
+                    running[asyncio.ensure_future(run(task_id, account_id, timeout))] = account_id
+            if running:
+                done, _ = await asyncio.wait(
+                    running, timeout=settings.TASK_SCHEDULER_POLL_INTERVAL, return_when=asyncio.FIRST_COMPLETED
+                )
+                for future in done:
+                    running.pop(future)
+            else:
+                await asyncio.sleep(min(settings.TASK_SCHEDULER_POLL_INTERVAL, max(deadline - loop.time(), 0)))
+    finally:
+        if running:
+            for future in running:
+                future.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+        if not handed_over:
+            _schedule_dispatcher()
+
+    return {
+        "status": "success" if not failed else "partial",
+        "total_accounts": len(succeeded) + len(failed),
+        "failed_accounts": failed
+    }
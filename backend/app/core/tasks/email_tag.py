@@ -1,19 +1,36 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Set, Tuple
 from datetime import datetime, timedelta
+import json
 import logging
+import re
 
+from sqlalchemy.orm import undefer
+
+from app.core.config import settings
 from app.core.tasks.registry import task_registry
-from app.models.llm_channel import LLMChannel
+from app.models.email_account import EmailAccount
 from app.crud.email_tag import crud_email_tag
+from app.crud.email_fingerprint import crud_email_fingerprint
 from app.models.llm_feature import FeatureType
 from app.crud.llm_feature_mapping import crud_feature_mapping
 from app.models.task import Task, TaskStatus, TaskPriority
 from app.db.session import SessionLocal
 from app.models.email import Email
 
-from app.utils.llm.client import LLMClient
+from app.utils.email.normalizer import get_llm_text
+from app.utils.llm.router import agenerate_routed
+from app.utils.llm.token_counter import count_tokens, fit_to_budget, truncate_to_tokens
 from app.core.tasks.tag_operation import create_tag_operation_task
 
+logger = logging.getLogger(__name__)
+
+# 批量分类时附加在提示词后的输出格式要求
+BATCH_INSTRUCTION = """
+
+接下来的消息包含多封邮件，每封邮件以“[编号]”开头。请分别为每封邮件选择一个标签，
+只输出一个JSON对象，键为邮件编号，值为标签ID，不要输出其他内容，例如：{"1": 3, "2": 5}"""
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+
 def create_tag_task(email_id: int) -> Task:
     """创建标签同步任务"""
     # pass
@@ -34,6 +51,79 @@ def create_tag_task(email_id: int) -> Task:
         db.add(task)
         db.commit()
 
+def create_tag_tasks(email_ids: List[int]) -> None:
+    """批量创建标签同步任务（单个事务）
+
+    EMAIL_TAG_BATCH_SIZE 大于1时每 EMAIL_TAG_BATCH_SIZE 封邮件创建一个批量分类任务。
+    """
+    if not email_ids:
+        return
+    with SessionLocal() as db:
+        now = datetime.now()
+        batch_size = settings.EMAIL_TAG_BATCH_SIZE
+        if batch_size > 1:
+            chunks = [email_ids[i:i + batch_size] for i in range(0, len(email_ids), batch_size)]
+            db.add_all([
+                Task(
+                    name=f"批量同步邮件标签 {chunk[0]}-{chunk[-1]}",
+                    func_name="sync_email_tags_batch",
+                    args={"email_ids": chunk},
+                    status=TaskStatus.PENDING,
+                    priority=TaskPriority.NORMAL.value,
+                    scheduled_at=now,
+                )
+                for chunk in chunks
+            ])
+            db.commit()
+            return
+        db.add_all([
+            Task(
+                name=f"同步邮件标签 {email_id}",
+                func_name="sync_email_tag",
+                args={"email_id": email_id},
+                status=TaskStatus.PENDING,
+                priority=TaskPriority.NORMAL.value,
+                scheduled_at=now,
+            )
+            for email_id in email_ids
+        ])
+        db.commit()
+
+def _reuse_duplicate_tag(db, email: Email) -> Optional[Dict[str, Any]]:
+    """查找近似重复邮件并复用其标签，没有找到时返回None"""
+    try:
+        simhash = crud_email_fingerprint.ensure(db, email=email)
+        if simhash is None:
+            return None
+        account_ids = [
+            account_id for (account_id,) in
+            db.query(EmailAccount.id).filter(EmailAccount.user_id == email.account.user_id).all()
+        ]
+        match = crud_email_fingerprint.find_tagged_duplicate(
+            db,
+            account_ids=account_ids,
+            sender=email.from_address,
+            simhash=simhash,
+            exclude_email_id=email.id
+        )
+    except Exception as e:
+        # 查找失败时仍由模型分类
+        logger.error(f"查找近似重复邮件失败: {str(e)}")
+        return None
+    if not match:
+        return None
+    tag_id, source_email_id, distance = match
+    crud_email_tag.add_email_tag(
+        db=db,
+        email_id=email.id,
+        tag_id=tag_id,
+        source="simhash",
+        source_email_id=source_email_id
+    )
+    logger.info(f"邮件 {email.id} 复用近似重复邮件 {source_email_id} 的标签 {tag_id}，汉明距离 {distance}")
+    create_tag_operation_task(email_id=email.id)
+    return {"status": "success", "message": "标签同步成功", "source": "simhash", "source_email_id": source_email_id}
+
 @task_registry.register(name="sync_email_tag")
 async def sync_email_tag(email_id: int) -> Dict[str, Any]:
     # 根据邮件id获取邮件
@@ -41,6 +131,11 @@ async def sync_email_tag(email_id: int) -> Dict[str, Any]:
         email = db.query(Email).filter(Email.id == email_id).first()
         if not email:
             raise ValueError(f"邮件不存在: {email_id}")
+        # 同一发件人已打标签的近似重复邮件（模板邮件）直接复用其标签，不调用模型
+        if settings.EMAIL_SIMHASH_ENABLED:
+            result = _reuse_duplicate_tag(db, email)
+            if result:
+                return result
         # 获取用户标签列表和默认标签EmailTag.user_id == email.account.user_id,或者EmailTag.user_id == ""
         tags = crud_email_tag.get_all_available_tags(
             db=db,
@@ -52,21 +147,34 @@ async def sync_email_tag(email_id: int) -> Dict[str, Any]:
             user_id=email.account.user_id,
             feature_type=FeatureType.LABEL_CLASSIFICATION
         )
-        # 获取映射模型的具体模型
-        llm_model = db.query(LLMChannel).filter(LLMChannel.id == feature_mapping.channel_id).first()
-        if not llm_model:
+        # 获取映射的渠道池，输入预算按主渠道的模型计算
+        pool = crud_feature_mapping.get_channel_pool(feature_mapping)
+        if not pool:
             raise ValueError(f"模型不存在: {feature_mapping.channel_id}")
+        llm_model = pool[0][0]
         tag_str = "\n".join([f"{tag.id}:{tag.name}({tag.description})\n" for tag in tags])
 
         prompt = feature_mapping.prompt_template.replace("{{tag_list}}", tag_str)
-        # 调用llm模型
-        tag_id = LLMClient.generate(
-            prompt=prompt,
-            message="邮件内容："+email.content,
-            api_key=llm_model.api_key,
-            provider=llm_model.model_type,
+        # 超出功能映射的输入预算时截断邮件内容
+        message, truncated = fit_to_budget(
+            prompt,
+            "邮件内容："+get_llm_text(email),
+            feature_mapping.max_input_tokens,
             model=llm_model.model,
-            proxy_url=llm_model.proxy_url
+            provider=llm_model.model_type
+        )
+        # 调用llm模型
+        tag_id = await agenerate_routed(
+            pool,
+            prompt,
+            message,
+            strategy=feature_mapping.routing_strategy,
+            cache=feature_mapping.cache_enabled,
+            usage_context={
+                "user_id": email.account.user_id,
+                "feature_type": FeatureType.LABEL_CLASSIFICATION,
+                "truncated": truncated
+            }
         )
         # 先将tag_id转换成int
         tag_id = int(tag_id)
@@ -75,7 +183,7 @@ async def sync_email_tag(email_id: int) -> Dict[str, Any]:
             raise ValueError(f"标签同步失败: {tag_id}")
         
         # 添加标签
-        email_tag = crud_email_tag.add_email_tag(db=db, email_id=email_id, tag_id=tag_id)
+        email_tag = crud_email_tag.add_email_tag(db=db, email_id=email_id, tag_id=tag_id, source="llm")
         # 更新|添加标签 
         # 判断任务是否完成
         if email_tag:
@@ -83,4 +191,180 @@ async def sync_email_tag(email_id: int) -> Dict[str, Any]:
             create_tag_operation_task(email_id=email_id)
             return {"status": "success", "message": "标签同步成功"}
         else:
-            return {"status": "error", "message": "标签同步失败"}
\ No newline at end of file
+            return {"status": "error", "message": "标签同步失败"}
+
+
+def _build_batches(
+    emails: List[Email],
+    budget: int,
+    model: Optional[str],
+    provider: str
+) -> List[List[Tuple[Email, str, bool]]]:
+    """按封数和token预算把邮件分组
+
+    单封邮件截断到 EMAIL_TAG_BATCH_EMAIL_MAX_TOKENS（且不超过 budget），一批邮件的token数之和不超过 budget。
+    每封邮件返回 (邮件, 发送给模型的文本, 是否截断)。
+    """
+    batches: List[List[Tuple[Email, str, bool]]] = []
+    current: List[Tuple[Email, str, bool]] = []
+    size = 0
+    per_email = max(min(settings.EMAIL_TAG_BATCH_EMAIL_MAX_TOKENS, budget), 1)
+    for email in emails:
+        original = f"主题：{email.subject or ''}\n{get_llm_text(email)}"
+        text = truncate_to_tokens(original, per_email, model, provider)
+        tokens = count_tokens(text, model, provider)
+        if current and (len(current) >= settings.EMAIL_TAG_BATCH_SIZE or size + tokens > budget):
+            batches.append(current)
+            current, size = [], 0
+        current.append((email, text, text != original))
+        size += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _parse_batch_response(response: str, count: int, tag_ids: Set[int]) -> Dict[int, int]:
+    """解析批量分类的输出，返回 {批次内序号(从1开始): 标签ID}，无法解析或标签无效的邮件不包含在内"""
+    match = _JSON_OBJECT_RE.search(response or "")
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    result = {}
+    for key, value in data.items():
+        try:
+            index, tag_id = int(str(key).strip("[] ")), int(value)
+        except (TypeError, ValueError):
+            continue
+        if 1 <= index <= count and tag_id in tag_ids:
+            result[index] = tag_id
+    return result
+
+
+def _reschedule_tag_batch(email_ids: List[int], attempt: int) -> None:
+    """模型调用失败时延迟重新创建批量分类任务"""
+    with SessionLocal() as db:
+        db.add(Task(
+            name=f"批量同步邮件标签 {email_ids[0]}-{email_ids[-1]}",
+            func_name="sync_email_tags_batch",
+            args={"email_ids": email_ids, "attempt": attempt},
+            status=TaskStatus.PENDING,
+            priority=TaskPriority.NORMAL.value,
+            scheduled_at=datetime.now() + timedelta(seconds=settings.TASK_SCHEDULER_RETRY_DELAY),
+        ))
+        db.commit()
+
+
+@task_registry.register(name="sync_email_tags_batch")
+async def sync_email_tags_batch(email_ids: List[int], attempt: int = 0) -> Dict[str, Any]:
+    """批量分类邮件标签：同一用户的多封邮件合并为一次模型调用
+
+    近似重复邮件先复用已有标签；批量输出中缺失或无法解析的邮件逐封调用 sync_email_tag 重试。
+    模型调用失败时不逐封重试，该用户剩余的邮件延迟后作为新的批量任务重新调度，
+    attempt 为已重新调度的次数，达到 TASK_SCHEDULER_MAX_RETRIES 后记为失败。
+    用户未配置标签分类功能或没有可用渠道时，该用户的邮件记为失败，不影响批次中的其他用户。
+    """
+    tagged = reused = 0
+    retry_ids: List[int] = []
+    deferred_ids: List[int] = []
+    failed: List[int] = []
+    with SessionLocal() as db:
+        emails = (
+            db.query(Email)
+            .options(undefer(Email.llm_text))
+            .filter(Email.id.in_(email_ids))
+            .order_by(Email.id)
+            .all()
+        )
+        by_user: Dict[int, List[Email]] = {}
+        for email in emails:
+            if settings.EMAIL_SIMHASH_ENABLED and _reuse_duplicate_tag(db, email):
+                reused += 1
+                continue
+            by_user.setdefault(email.account.user_id, []).append(email)
+
+        for user_id, user_emails in by_user.items():
+            feature_mapping = crud_feature_mapping.get_by_feature_type(
+                db=db,
+                user_id=user_id,
+                feature_type=FeatureType.LABEL_CLASSIFICATION
+            )
+            pool = crud_feature_mapping.get_channel_pool(feature_mapping) if feature_mapping else []
+            if not pool:
+                # 配置问题重试也不会成功，只将该用户的邮件记为失败，不影响批次中其他用户
+                reason = "未配置标签分类功能" if not feature_mapping else f"模型不存在: {feature_mapping.channel_id}"
+                logger.error(f"用户 {user_id} {reason}，跳过 {len(user_emails)} 封邮件")
+                failed.extend(email.id for email in user_emails)
+                continue
+            llm_model = pool[0][0]
+            tags = crud_email_tag.get_all_available_tags(db=db, user_id=user_id)
+            tag_str = "\n".join([f"{tag.id}:{tag.name}({tag.description})\n" for tag in tags])
+            prompt = feature_mapping.prompt_template.replace("{{tag_list}}", tag_str) + BATCH_INSTRUCTION
+            budget = (feature_mapping.max_input_tokens or settings.LLM_MAX_INPUT_TOKENS) - count_tokens(
+                prompt, llm_model.model, llm_model.model_type
+            )
+
+            call_failed = False
+            for batch in _build_batches(user_emails, budget, llm_model.model, llm_model.model_type):
+                if call_failed:
+                    deferred_ids.extend(email.id for email, _, _ in batch)
+                    continue
+                message = "\n\n".join(f"[{index}] {text}" for index, (_, text, _) in enumerate(batch, 1))
+                try:
+                    response = await agenerate_routed(
+                        pool,
+                        prompt,
+                        message,
+                        strategy=feature_mapping.routing_strategy,
+                        cache=feature_mapping.cache_enabled,
+                        usage_context={
+                            "user_id": user_id,
+                            "feature_type": FeatureType.LABEL_CLASSIFICATION,
+                            "truncated": any(truncated for _, _, truncated in batch)
+                        }
+                    )
+                except Exception as e:
+                    # 调用失败（渠道不可用等）时逐封重试只会产生更多失败调用
+                    logger.error(f"批量分类邮件标签调用失败，延迟重新调度: {str(e)}")
+                    call_failed = True
+                    deferred_ids.extend(email.id for email, _, _ in batch)
+                    continue
+                assignments = _parse_batch_response(response, len(batch), {tag.id for tag in tags})
+
+                for index, (email, _, _) in enumerate(batch, 1):
+                    tag_id = assignments.get(index)
+                    if tag_id is None:
+                        retry_ids.append(email.id)
+                        continue
+                    crud_email_tag.add_email_tag(db=db, email_id=email.id, tag_id=tag_id, source="llm")
+                    create_tag_operation_task(email_id=email.id)
+                    tagged += 1
+
+    if deferred_ids:
+        if attempt + 1 < settings.TASK_SCHEDULER_MAX_RETRIES:
+            _reschedule_tag_batch(deferred_ids, attempt + 1)
+        else:
+            failed.extend(deferred_ids)
+            deferred_ids = []
+    for email_id in retry_ids:
+        try:
+            result = await sync_email_tag(email_id)
+            if result.get("status") == "success":
+                tagged += 1
+                continue
+        except Exception as e:
+            logger.error(f"邮件 {email_id} 标签同步失败: {str(e)}")
+        failed.append(email_id)
+
+    return {
+        "status": "success" if not failed and not deferred_ids else "partial",
+        "tagged": tagged,
+        "reused": reused,
+        "retried": len(retry_ids),
+        "rescheduled": len(deferred_ids),
+        "failed": failed
+    }
@@ -1,4 +1,4 @@
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional
 from functools import wraps
 import asyncio
 import logging
@@ -11,11 +11,12 @@ class TaskRegistry:
     def __init__(self):
         self._tasks: Dict[str, Callable] = {}
     
-    def register(self, name: str = None, interval_minutes: Optional[int] = None):
+    def register(self, name: str = None, interval_minutes: Optional[int] = None, batched_by: Optional[str] = None):
         """
         注册任务装饰器
         :param name: 任务名称
         :param interval_minutes: 任务执行间隔（分钟）
+        :param batched_by: 由该批量任务领取执行，调度器不再单独执行此任务
         """
         def decorator(func: Callable) -> Callable:
             task_name = name or func.__name__
@@ -36,7 +37,8 @@ class TaskRegistry:
             # 存储任务元数据
             wrapper._task_meta = {
                 'interval_minutes': interval_minutes,
-                'is_async': is_async
+                'is_async': is_async,
+                'batched_by': batched_by
             }
             
             self._tasks[task_name] = wrapper
@@ -51,6 +53,13 @@ class TaskRegistry:
         """列出所有已注册的任务"""
         return self._tasks
     
+    def batched_task_names(self) -> List[str]:
+        """列出由批量任务领取执行的任务"""
+        return [
+            name for name, func in self._tasks.items()
+            if getattr(func, '_task_meta', {}).get('batched_by')
+        ]
+
     def is_async_task(self, name: str) -> bool:
         """检查任务是否为异步"""
         func = self.get_task_func(name)
@@ -98,14 +98,17 @@ class TaskScheduler:
         self.stats.last_poll_time = datetime.now()
     
     def _get_pending_tasks(self, db: Session) -> list[Task]:
-        """获取待执行的任务"""
+        """获取待执行的任务（由批量任务领取执行的任务除外）"""
+        query = db.query(Task).filter(
+            Task.status == TaskStatus.PENDING,
+            Task.scheduled_at <= datetime.now(),
+            Task.deleted_at.is_(None)
+        )
+        batched = task_registry.batched_task_names()
+        if batched:
+            query = query.filter(Task.func_name.notin_(batched))
         return (
-            db.query(Task)
-            .filter(
-                Task.status == TaskStatus.PENDING,
-                Task.scheduled_at <= datetime.now(),
-                Task.deleted_at.is_(None)
-            )
+            query
             .order_by(Task.priority.desc(), Task.scheduled_at.asc())
             .limit(self.config.batch_size)
             .all()
@@ -155,10 +158,19 @@ class TaskScheduler:
                 return
             
             try:
-                # 更新任务状态为执行中
-                task.status = TaskStatus.RUNNING
-                task.started_at = datetime.now()
+                # 更新任务状态为执行中，任务已被其他线程或批量任务领取时跳过
+                claimed = db.query(Task).filter(
+                    Task.id == task_id,
+                    Task.status == TaskStatus.PENDING
+                ).update(
+                    {Task.status: TaskStatus.RUNNING, Task.started_at: datetime.now()},
+                    synchronize_session=False
+                )
                 db.commit()
+                if not claimed:
+                    logger.info(f"任务 {task_id} 已被领取，跳过")
+                    return
+                db.refresh(task)
                 
                 # 获取任务方法
                 method = task_registry.get_task_func(task.func_name)
@@ -175,7 +187,12 @@ class TaskScheduler:
                 try:
                     if is_async:
                         logger.info(f"开始执行异步任务 {task_id}")
-                        result = await method(**(task.args or {}))
+                        # 超时后取消任务协程，取消会传递到任务内等待中的调用（如 LLMClient.agenerate）
+                        timeout = task.timeout or self.config.task_timeout
+                        try:
+                            result = await asyncio.wait_for(method(**(task.args or {})), timeout=timeout)
+                        except asyncio.TimeoutError:
+                            raise TimeoutError(f"任务执行超时（{timeout}秒）")
                         logger.info(f"异步任务 {task_id} 执行完成")
                     else:
                         logger.info(f"开始执行同步任务 {task_id}")
@@ -9,7 +9,11 @@ from app.crud.email import crud_email
 from app.models.email_tag import EmailTag, EmailTagRelation
 from app.utils.email.tag_actions import TagAction
 from app.models.llm_feature_mapping import LLMFeatureMapping
-from app.utils.llm.client import LLMClient
+from app.models.llm_feature import FeatureType
+from app.utils.email.normalizer import get_llm_text
+from app.crud.llm_feature_mapping import crud_feature_mapping
+from app.utils.llm.router import agenerate_routed
+from app.utils.llm.token_counter import fit_to_budget
 from app.crud.email_outbox import email_outbox
 from app.models.email_outbox import EmailOutbox
 from app.schemas.email_outbox import EmailOutboxCreate
@@ -104,20 +108,35 @@ async def pre_reply(email_id: int,auto_reply: bool = False) -> Dict[str, Any]:
         ).first()
         
         if feature_mapping:
-            # 获取关联的渠道信息
-            channel = feature_mapping.channel
+            # 获取关联的渠道池，输入预算按主渠道的模型计算
+            pool = crud_feature_mapping.get_channel_pool(feature_mapping)
+            if not pool:
+                raise ValueError(f"模型不存在: {feature_mapping.channel_id}")
+            channel = pool[0][0]
             model_type = channel.model_type
             model = channel.model
             api_key = channel.api_key
             prompt = feature_mapping.prompt_template
-            # 调用llm，生成预回复邮件
-            llm_response = LLMClient.generate(
-                prompt=prompt,
-                message="邮件内容："+email.content,
-                api_key=api_key,
-                provider=model_type,
+            # 超出功能映射的输入预算时截断邮件内容
+            message, truncated = fit_to_budget(
+                prompt,
+                "邮件内容："+get_llm_text(email),
+                feature_mapping.max_input_tokens,
                 model=model,
-                proxy_url=channel.proxy_url
+                provider=model_type
+            )
+            # 调用llm，生成预回复邮件
+            llm_response = await agenerate_routed(
+                pool,
+                prompt,
+                message,
+                strategy=feature_mapping.routing_strategy,
+                cache=feature_mapping.cache_enabled,
+                usage_context={
+                    "user_id": user.id,
+                    "feature_type": FeatureType.EMAIL_REPLY,
+                    "truncated": truncated
+                }
             )
             print("=======================邮件回复==========================")
             print(model_type)
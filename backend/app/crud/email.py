@@ -1,14 +1,138 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Tuple, Union
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc
+from sqlalchemy import and_, or_, desc, func, insert, select, update
 
 from app.crud.base import CRUDBase
-from app.models.email import Email, EmailAttachment, EmailSyncLog
-from app.schemas.email import EmailCreate, EmailUpdate, EmailAttachmentCreate, EmailAttachmentUpdate, EmailSyncLogCreate, EmailSyncLogUpdate
+from app.models.email import Email, EmailAttachment, EmailSyncLog, EmailFolderState, EmailRawContent, EmailFingerprint
+from app.crud.email_fingerprint import crud_email_fingerprint
+from app.utils.compression import compress, decompress
+from app.schemas.email import (
+    EmailCreate, EmailUpdate, EmailAttachmentCreate, EmailAttachmentUpdate,
+    EmailSyncLogCreate, EmailSyncLogUpdate, EmailFolderStateCreate, EmailFolderStateUpdate
+)
+
+# 文件夹计数变化 {(account_id, folder): [总数变化, 未读数变化]}
+CounterDeltas = Dict[Tuple[int, str], List[int]]
+
+# 用户删除的邮件移入该文件夹并记录 deleted_at，在该文件夹中仍然列出和计数
+TRASH_FOLDER = "Trash"
+
+
+def _is_listed(folder: Optional[str], is_deleted: Optional[bool], deleted_at: Optional[datetime]) -> bool:
+    """邮件是否列出和计数：服务器上已删除（is_deleted）的不列出，用户删除的只在已删除文件夹中列出"""
+    return not is_deleted and (deleted_at is None or folder == TRASH_FOLDER)
+
+
+def _add_counter_delta(
+    deltas: CounterDeltas,
+    state: Optional[Tuple[int, str, bool]],
+    sign: int
+) -> None:
+    """累加一封邮件对所在文件夹计数的影响，state 为 (account_id, folder, is_read)，已删除邮件为None"""
+    if state is None:
+        return
+    account_id, folder, is_read = state
+    delta = deltas.setdefault((account_id, folder), [0, 0])
+    delta[0] += sign
+    if not is_read:
+        delta[1] += sign
+
 
 class CRUDEmail(CRUDBase[Email, EmailCreate, EmailUpdate]):
-    """邮件CRUD操作类"""
+    """邮件CRUD操作类
+
+    新增、删除、标记已读和移动文件夹时在同一事务内维护 email_folder_states 中的文件夹计数，
+    列表总数和未读数直接读取计数，不再对邮件表做COUNT。
+    """
+
+    @staticmethod
+    def _counter_state(email: Email) -> Optional[Tuple[int, str, bool]]:
+        """邮件参与计数的状态 (account_id, folder, is_read)，不列出的邮件不计数"""
+        if not _is_listed(email.folder, email.is_deleted, email.deleted_at):
+            return None
+        return email.account_id, email.folder, bool(email.is_read)
+
+    def _listed_filter(self):
+        """与 _is_listed 一致的查询条件"""
+        return and_(
+            self.model.is_deleted.isnot(True),
+            or_(self.model.deleted_at.is_(None), self.model.folder == TRASH_FOLDER)
+        )
+
+    def get(self, db: Session, id: Any) -> Optional[Email]:
+        """获取单封邮件，已删除文件夹中的邮件也可以查看"""
+        return db.execute(
+            select(self.model).where(self.model.id == id, self._listed_filter())
+        ).scalar_one_or_none()
+
+    def _commit_with_counters(
+        self,
+        db: Session,
+        before: Optional[Tuple[int, str, bool]],
+        after: Optional[Tuple[int, str, bool]]
+    ) -> None:
+        """提交邮件的修改，并在同一事务中更新前后所在文件夹的计数"""
+        deltas: CounterDeltas = {}
+        _add_counter_delta(deltas, before, -1)
+        _add_counter_delta(deltas, after, 1)
+        try:
+            crud_email_folder_state.apply_counter_deltas(db, deltas=deltas)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    def update(
+        self,
+        db: Session,
+        *,
+        db_obj: Email,
+        obj_in: Union[EmailUpdate, Dict[str, Any]]
+    ) -> Email:
+        """更新邮件，已读状态、文件夹或删除状态变化时同步更新文件夹计数"""
+        before = self._counter_state(db_obj)
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.dict(exclude_unset=True)
+        for field, value in update_data.items():
+            if field in self.model.__table__.columns:
+                setattr(db_obj, field, value)
+        db.add(db_obj)
+        self._commit_with_counters(db, before, self._counter_state(db_obj))
+        db.refresh(db_obj)
+        return db_obj
+
+    def remove(self, db: Session, *, id: int) -> Optional[Email]:
+        """硬删除邮件并扣减文件夹计数"""
+        email = db.get(self.model, id)
+        if email:
+            before = self._counter_state(email)
+            db.delete(email)
+            self._commit_with_counters(db, before, None)
+        return email
+
+    def soft_delete(self, db: Session, *, id: int) -> Optional[Email]:
+        """软删除邮件并更新文件夹计数"""
+        email = db.get(self.model, id)
+        if email:
+            before = self._counter_state(email)
+            email.deleted_at = datetime.now()
+            self._commit_with_counters(db, before, self._counter_state(email))
+            db.refresh(email)
+        return email
+
+    def restore(self, db: Session, *, id: int) -> Optional[Email]:
+        """恢复已删除的邮件并重新计入文件夹计数"""
+        email = db.get(self.model, id)
+        if email and email.deleted_at:
+            before = self._counter_state(email)
+            email.deleted_at = None
+            self._commit_with_counters(db, before, self._counter_state(email))
+            db.refresh(email)
+        return email
     
     def get_by_message_id(self, db: Session, *, account_id: int, message_id: str) -> Optional[Email]:
         """根据message_id获取邮件"""
@@ -19,6 +143,253 @@ class CRUDEmail(CRUDBase[Email, EmailCreate, EmailUpdate]):
             )
         ).first()
     
+    def get_ids_by_message_ids(
+        self,
+        db: Session,
+        *,
+        account_id: int,
+        folder: str,
+        message_ids: List[str]
+    ) -> Dict[str, int]:
+        """批量获取文件夹中指定message_id的邮件ID，返回 {message_id: id}
+
+        同一封邮件在不同文件夹中是不同的行（各自的UID和状态），因此按 (account_id, folder, message_id) 匹配。
+        """
+        if not message_ids:
+            return {}
+        rows = db.execute(
+            select(self.model.id, self.model.message_id)
+            .where(
+                self.model.account_id == account_id,
+                self.model.folder == folder,
+                self.model.message_id.in_(set(message_ids))
+            )
+            .order_by(self.model.id)
+        ).all()
+        return {row.message_id: row.id for row in rows}
+
+    def bulk_create_with_attachments(
+        self,
+        db: Session,
+        *,
+        emails: List[Dict[str, Any]],
+        commit: bool = True
+    ) -> List[int]:
+        """批量写入邮件及其附件（单个事务，多行INSERT）
+
+        用于同步等内部可信数据，直接使用字典而不经过Pydantic校验。
+        commit 为 False 时只写入当前事务，由调用方统一提交。
+
+        Args:
+            db: 数据库会话
+            emails: 邮件字段字典列表，可包含 attachments 键（附件字段字典列表，不含email_id）
+                raw_message 键（邮件原文bytes，压缩后写入 email_raw_contents）
+                和 simhash 键（内容指纹，写入 email_fingerprints），
+                同一批次内 (account_id, folder, message_id) 需唯一
+
+        Returns:
+            List[int]: 与输入顺序一致的邮件ID列表
+        """
+        if not emails:
+            return []
+
+        rows = []
+        attachments = []
+        raw_messages = []
+        simhashes = []
+        for item in emails:
+            row = dict(item)
+            attachments.append(row.pop("attachments", None) or [])
+            raw_messages.append(row.pop("raw_message", None))
+            simhashes.append(row.pop("simhash", None))
+            row["has_attachments"] = row.get("has_attachments") or bool(attachments[-1])
+            rows.append(row)
+
+        try:
+            if db.get_bind().dialect.insert_executemany_returning:
+                # 支持 RETURNING 的数据库直接按参数顺序取回ID
+                result = db.execute(
+                    insert(self.model).returning(self.model.id, sort_by_parameter_order=True),
+                    rows
+                )
+                email_ids = list(result.scalars().all())
+            else:
+                # MySQL 不支持 RETURNING：executemany 会被驱动改写为多行INSERT，之后按文件夹和message_id一次性取回ID
+                db.execute(insert(self.model), rows)
+                email_ids = []
+                id_maps: Dict[Tuple[int, str], Dict[str, int]] = {}
+                for row in rows:
+                    key = (row["account_id"], row.get("folder") or "INBOX")
+                    if key not in id_maps:
+                        id_maps[key] = self.get_ids_by_message_ids(
+                            db,
+                            account_id=key[0],
+                            folder=key[1],
+                            message_ids=[
+                                r["message_id"] for r in rows
+                                if (r["account_id"], r.get("folder") or "INBOX") == key
+                            ]
+                        )
+                    email_ids.append(id_maps[key][row["message_id"]])
+
+            attachment_rows = [
+                {**attachment, "email_id": email_id}
+                for email_id, items in zip(email_ids, attachments)
+                for attachment in items
+            ]
+            if attachment_rows:
+                db.execute(insert(EmailAttachment), attachment_rows)
+
+            raw_rows = [
+                crud_email_raw_content.build_row(email_id, raw_message)
+                for email_id, raw_message in zip(email_ids, raw_messages)
+                if raw_message
+            ]
+            if raw_rows:
+                db.execute(insert(EmailRawContent), raw_rows)
+
+            fingerprint_rows = [
+                crud_email_fingerprint.build_row(email_id, row["account_id"], row.get("from_address"), simhash)
+                for email_id, row, simhash in zip(email_ids, rows, simhashes)
+                if simhash is not None
+            ]
+            if fingerprint_rows:
+                db.execute(insert(EmailFingerprint), fingerprint_rows)
+
+            deltas: CounterDeltas = {}
+            for row in rows:
+                folder = row.get("folder") or "INBOX"
+                if _is_listed(folder, row.get("is_deleted"), row.get("deleted_at")):
+                    _add_counter_delta(deltas, (row["account_id"], folder, bool(row.get("is_read"))), 1)
+            crud_email_folder_state.apply_counter_deltas(db, deltas=deltas)
+
+            if commit:
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return email_ids
+
+    def _lock_counter_rows(self, db: Session, email_ids: List[int]) -> Dict[int, Any]:
+        """锁定并读取邮件当前参与计数的字段，返回 {id: row}"""
+        columns = (
+            self.model.id, self.model.account_id, self.model.folder,
+            self.model.is_read, self.model.is_deleted, self.model.deleted_at
+        )
+        rows = {}
+        for i in range(0, len(email_ids), 1000):
+            for row in db.execute(
+                select(*columns)
+                .where(self.model.id.in_(email_ids[i:i + 1000]))
+                .with_for_update()
+            ).all():
+                rows[row.id] = row
+        return rows
+
+    def bulk_update(self, db: Session, *, emails: List[Dict[str, Any]], commit: bool = True) -> None:
+        """按主键批量更新邮件，emails 中每项必须包含 id；commit 为 False 时由调用方统一提交"""
+        if not emails:
+            return
+        try:
+            current = self._lock_counter_rows(db, [item["id"] for item in emails])
+            deltas: CounterDeltas = {}
+            for item in emails:
+                row = current.get(item["id"])
+                if row is None:
+                    continue
+                folder = item.get("folder", row.folder)
+                _add_counter_delta(
+                    deltas,
+                    (row.account_id, row.folder, bool(row.is_read))
+                    if _is_listed(row.folder, row.is_deleted, row.deleted_at) else None,
+                    -1
+                )
+                _add_counter_delta(
+                    deltas,
+                    (item.get("account_id", row.account_id), folder, bool(item.get("is_read", row.is_read)))
+                    if _is_listed(
+                        folder,
+                        item.get("is_deleted", row.is_deleted),
+                        item.get("deleted_at", row.deleted_at)
+                    ) else None,
+                    1
+                )
+            db.execute(update(self.model), emails)
+            crud_email_folder_state.apply_counter_deltas(db, deltas=deltas)
+            if commit:
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    def get_folder_flags(
+        self,
+        db: Session,
+        *,
+        account_id: int,
+        folder: str,
+        uids: Optional[List[int]] = None,
+        max_uid: Optional[int] = None
+    ) -> Dict[int, Any]:
+        """获取文件夹中未删除邮件的标志，返回 {uid: (id, is_read, is_flagged)}
+
+        指定 uids 时只查询这些UID，否则查询 uid <= max_uid 的全部邮件。
+        """
+        columns = (self.model.id, self.model.uid, self.model.is_read, self.model.is_flagged)
+        conditions = [
+            self.model.account_id == account_id,
+            self.model.folder == folder,
+            self.model.deleted_at.is_(None)
+        ]
+        if uids is None:
+            rows = db.execute(
+                select(*columns).where(*conditions, self.model.uid <= max_uid)
+            ).all()
+        else:
+            rows = []
+            uid_list = list(uids)
+            for i in range(0, len(uid_list), 1000):
+                rows.extend(db.execute(
+                    select(*columns).where(*conditions, self.model.uid.in_(uid_list[i:i + 1000]))
+                ).all())
+        return {row.uid: (row.id, row.is_read, row.is_flagged) for row in rows}
+
+    def get_server_deleted_ids(self, db: Session, *, email_ids: List[int]) -> Set[int]:
+        """返回其中被同步标记为服务器已删除（is_deleted）的邮件ID"""
+        deleted = set()
+        for i in range(0, len(email_ids), 1000):
+            deleted.update(db.execute(
+                select(self.model.id).where(
+                    self.model.id.in_(email_ids[i:i + 1000]),
+                    self.model.is_deleted.is_(True)
+                )
+            ).scalars())
+        return deleted
+
+    def mark_deleted_by_ids(self, db: Session, *, email_ids: List[int]) -> int:
+        """将服务器上已删除的邮件标记为删除，返回标记数量"""
+        if not email_ids:
+            return 0
+        count = 0
+        try:
+            deltas: CounterDeltas = {}
+            for row in self._lock_counter_rows(db, email_ids).values():
+                if row.deleted_at is None and not row.is_deleted:
+                    _add_counter_delta(deltas, (row.account_id, row.folder, bool(row.is_read)), -1)
+            for i in range(0, len(email_ids), 1000):
+                result = db.execute(
+                    update(self.model)
+                    .where(self.model.id.in_(email_ids[i:i + 1000]), self.model.deleted_at.is_(None))
+                    .values(is_deleted=True, deleted_at=datetime.now())
+                )
+                count += result.rowcount
+            crud_email_folder_state.apply_counter_deltas(db, deltas=deltas)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return count
+
     def get_email_count(
         self,
         db: Session,
@@ -28,8 +399,16 @@ class CRUDEmail(CRUDBase[Email, EmailCreate, EmailUpdate]):
         is_read: Optional[bool] = None,
         is_flagged: Optional[bool] = None
     ) -> int:
-        """获取邮件总数"""
-        query = db.query(self.model).filter(self.model.account_id == account_id)
+        """获取邮件总数，未按星标筛选时直接读取文件夹计数"""
+        if is_flagged is None:
+            total, unread = crud_email_folder_state.get_counts(db, account_id=account_id, folder=folder)
+            if is_read is None:
+                return total
+            return total - unread if is_read else unread
+        query = db.query(self.model).filter(
+            self.model.account_id == account_id,
+            self._listed_filter()
+        )
         if folder:
             query = query.filter(self.model.folder == folder)
         if is_read is not None:
@@ -62,7 +441,10 @@ class CRUDEmail(CRUDBase[Email, EmailCreate, EmailUpdate]):
         )
         
         # 获取邮件列表
-        query = db.query(self.model).filter(self.model.account_id == account_id)
+        query = db.query(self.model).filter(
+            self.model.account_id == account_id,
+            self._listed_filter()
+        )
         if folder:
             query = query.filter(self.model.folder == folder)
         if is_read is not None:
@@ -81,22 +463,16 @@ class CRUDEmail(CRUDBase[Email, EmailCreate, EmailUpdate]):
     
     def get_unread_count(self, db: Session, *, account_id: int, folder: Optional[str] = None) -> int:
         """获取未读邮件数量"""
-        query = db.query(self.model).filter(
-            and_(
-                self.model.account_id == account_id,
-                self.model.is_read == False
-            )
-        )
-        if folder:
-            query = query.filter(self.model.folder == folder)
-        return query.count()
+        _, unread = crud_email_folder_state.get_counts(db, account_id=account_id, folder=folder)
+        return unread
     
     def mark_as_read(self, db: Session, *, email_id: int, is_read: bool = True) -> Optional[Email]:
         """标记邮件为已读/未读"""
         email = self.get(db, id=email_id)
         if email:
+            before = self._counter_state(email)
             email.is_read = is_read
-            db.commit()
+            self._commit_with_counters(db, before, self._counter_state(email))
             db.refresh(email)
         return email
     
@@ -113,8 +489,9 @@ class CRUDEmail(CRUDBase[Email, EmailCreate, EmailUpdate]):
         """移动邮件到指定文件夹"""
         email = self.get(db, id=email_id)
         if email:
+            before = self._counter_state(email)
             email.folder = folder
-            db.commit()
+            self._commit_with_counters(db, before, self._counter_state(email))
             db.refresh(email)
         return email
 
@@ -125,6 +502,103 @@ class CRUDEmailAttachment(CRUDBase[EmailAttachment, EmailAttachmentCreate, Email
         """获取邮件的所有附件"""
         return db.query(self.model).filter(self.model.email_id == email_id).all()
 
+    def fill_missing_storage(
+        self,
+        db: Session,
+        *,
+        attachments: Dict[int, List[Dict[str, Any]]],
+        commit: bool = True
+    ) -> None:
+        """为尚未写入存储的附件记录补充存储键
+
+        Args:
+            attachments: {email_id: 附件字段字典列表}，按邮件ID和文件名匹配已有记录
+            commit: 为 False 时只写入当前事务，由调用方统一提交
+        """
+        if not attachments:
+            return
+        rows = db.execute(
+            select(self.model.id, self.model.email_id, self.model.filename).where(
+                self.model.email_id.in_(list(attachments)),
+                self.model.sha256.is_(None)
+            )
+        ).all()
+        updates = []
+        for row in rows:
+            for item in attachments[row.email_id]:
+                if item["filename"] == row.filename and item.get("sha256"):
+                    updates.append({"id": row.id, "sha256": item["sha256"], "storage_path": item["storage_path"]})
+                    break
+        if not updates:
+            return
+        try:
+            db.execute(update(self.model), updates)
+            if commit:
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+class CRUDEmailRawContent:
+    """邮件原文CRUD操作类（原文只随邮件批量写入，不提供通用的增删改）"""
+
+    def __init__(self, model):
+        self.model = model
+
+    @staticmethod
+    def build_row(email_id: int, raw_message: bytes) -> Dict[str, Any]:
+        """压缩邮件原文，返回批量写入用的字段字典"""
+        codec, data = compress(raw_message)
+        return {
+            "email_id": email_id,
+            "codec": codec,
+            "size": len(raw_message),
+            "data": data
+        }
+
+    def get_raw(self, db: Session, *, email_id: int) -> Optional[bytes]:
+        """获取邮件原文，尚未迁移的历史数据从 emails.raw_content 读取"""
+        row = db.execute(
+            select(self.model.codec, self.model.data).where(self.model.email_id == email_id)
+        ).first()
+        if row:
+            return decompress(row.codec, row.data)
+        raw_content = db.execute(
+            select(Email.raw_content).where(Email.id == email_id)
+        ).scalar_one_or_none()
+        return raw_content.encode('utf-8', errors='surrogateescape') if raw_content else None
+
+    def migrate_legacy(self, db: Session, *, batch_size: int = 200) -> int:
+        """将一批 emails.raw_content 迁移为压缩存储并清空原字段，返回迁移数量"""
+        rows = db.execute(
+            select(Email.id, Email.raw_content)
+            .where(Email.raw_content.is_not(None))
+            .order_by(Email.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return 0
+        email_ids = [row.id for row in rows]
+        try:
+            migrated = set(db.execute(
+                select(self.model.email_id).where(self.model.email_id.in_(email_ids))
+            ).scalars().all())
+            raw_rows = [
+                self.build_row(row.id, row.raw_content.encode('utf-8', errors='surrogateescape'))
+                for row in rows if row.id not in migrated
+            ]
+            if raw_rows:
+                db.execute(insert(self.model), raw_rows)
+            db.execute(
+                update(Email).where(Email.id.in_(email_ids)).values(raw_content=None)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return len(rows)
+
 class CRUDEmailSyncLog(CRUDBase[EmailSyncLog, EmailSyncLogCreate, EmailSyncLogUpdate]):
     """邮件同步日志CRUD操作类"""
     
@@ -168,13 +642,130 @@ class CRUDEmailSyncLog(CRUDBase[EmailSyncLog, EmailSyncLogCreate, EmailSyncLogUp
             db.refresh(sync_log)
         return sync_log
 
+    def increment_sync_stats(
+        self,
+        db: Session,
+        *,
+        sync_id: int,
+        total_emails: int = 0,
+        new_emails: int = 0,
+        updated_emails: int = 0,
+        deleted_emails: int = 0
+    ) -> None:
+        """原子累加同步统计信息，供多个文件夹并行同步时合并进度"""
+        values = {
+            column: getattr(self.model, column) + delta
+            for column, delta in (
+                ("total_emails", total_emails),
+                ("new_emails", new_emails),
+                ("updated_emails", updated_emails),
+                ("deleted_emails", deleted_emails)
+            )
+            if delta
+        }
+        if not values:
+            return
+        try:
+            db.execute(update(self.model).where(self.model.id == sync_id).values(**values))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+class CRUDEmailFolderState(CRUDBase[EmailFolderState, EmailFolderStateCreate, EmailFolderStateUpdate]):
+    """邮件文件夹同步状态CRUD操作类"""
+
+    def get_by_folder(self, db: Session, *, account_id: int, folder: str) -> Optional[EmailFolderState]:
+        """获取账户指定文件夹的同步状态"""
+        return db.query(self.model).filter(
+            and_(
+                self.model.account_id == account_id,
+                self.model.folder == folder,
+                self.model.deleted_at.is_(None)
+            )
+        ).first()
+
+    def get_or_create(self, db: Session, *, account_id: int, folder: str) -> EmailFolderState:
+        """获取文件夹同步状态，不存在时创建"""
+        state = self.get_by_folder(db, account_id=account_id, folder=folder)
+        if state:
+            return state
+        return self.create(db, obj_in=EmailFolderStateCreate(account_id=account_id, folder=folder))
+
+    def save_checkpoint(
+        self,
+        db: Session,
+        *,
+        state_id: int,
+        uidvalidity: Optional[int],
+        last_uid: int
+    ) -> None:
+        """保存文件夹同步检查点（已提交的最大UID），每批邮件提交后调用"""
+        try:
+            db.execute(
+                update(self.model)
+                .where(self.model.id == state_id)
+                .values(uidvalidity=uidvalidity, last_uid=last_uid)
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    def apply_counter_deltas(self, db: Session, *, deltas: Dict[Tuple[int, str], List[int]]) -> None:
+        """在当前事务中累加文件夹的邮件计数，不提交事务
+
+        deltas 为 {(account_id, folder): [总数变化, 未读数变化]}，计数行不存在时创建。
+        按 (account_id, folder) 排序加锁，避免并发事务互相死锁。
+        """
+        for (account_id, folder), (total, unread) in sorted(deltas.items()):
+            if not total and not unread:
+                continue
+            stmt = (
+                update(self.model)
+                .where(self.model.account_id == account_id, self.model.folder == folder)
+                .values(
+                    total_count=self.model.total_count + total,
+                    unread_count=self.model.unread_count + unread
+                )
+            )
+            if db.execute(stmt).rowcount:
+                continue
+            try:
+                with db.begin_nested():
+                    db.execute(insert(self.model).values(
+                        account_id=account_id,
+                        folder=folder,
+                        last_uid=0,
+                        total_count=total,
+                        unread_count=unread
+                    ))
+            except IntegrityError:
+                # 其他事务已创建该计数行，改为累加
+                db.execute(stmt)
+
+    def get_counts(self, db: Session, *, account_id: int, folder: Optional[str] = None) -> Tuple[int, int]:
+        """读取账户（或指定文件夹）的邮件计数，返回 (总数, 未读数)"""
+        query = db.query(
+            func.coalesce(func.sum(self.model.total_count), 0),
+            func.coalesce(func.sum(self.model.unread_count), 0)
+        ).filter(self.model.account_id == account_id)
+        if folder:
+            query = query.filter(self.model.folder == folder)
+        total, unread = query.one()
+        return int(total), int(unread)
+
 # Export the CRUD instances
 crud_email = CRUDEmail(Email)
 crud_email_attachment = CRUDEmailAttachment(EmailAttachment)
+crud_email_raw_content = CRUDEmailRawContent(EmailRawContent)
 crud_email_sync_log = CRUDEmailSyncLog(EmailSyncLog)
+crud_email_folder_state = CRUDEmailFolderState(EmailFolderState)
 
 __all__ = [
     'crud_email',
     'crud_email_attachment', 
-    'crud_email_sync_log'
+    'crud_email_raw_content',
+    'crud_email_sync_log',
+    'crud_email_folder_state'
 ]
\ No newline at end of file
@@ -0,0 +1,103 @@
+"""
+邮件指纹的CRUD操作
+
+指纹随邮件批量写入（见 crud_email.bulk_create_with_attachments），历史邮件在打标签时补充。
+近似重复查询只比较同一发件人最近的已打标签邮件，模板邮件通常来自固定的发件地址，
+按发件人限定候选既避免了跨发件人的误判，也使每次查询只需比较少量指纹。
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.email import Email, EmailFingerprint
+from app.models.email_tag import EmailTagRelation
+from app.utils.email.fingerprint import compute_simhash, hamming_distance
+
+# 可作为复用依据的标签来源，复用得到的标签不再被复用，避免误差逐级传递
+REUSABLE_SOURCES = ("llm", "manual")
+
+
+class CRUDEmailFingerprint:
+    """邮件指纹CRUD操作类"""
+
+    def __init__(self, model):
+        self.model = model
+
+    @staticmethod
+    def normalize_sender(address: Optional[str]) -> str:
+        return (address or "").strip().lower()[:255]
+
+    @staticmethod
+    def build_row(email_id: int, account_id: int, sender: Optional[str], simhash: int) -> Dict[str, Any]:
+        """返回批量写入用的字段字典"""
+        return {
+            "email_id": email_id,
+            "account_id": account_id,
+            "sender": CRUDEmailFingerprint.normalize_sender(sender),
+            "simhash": simhash
+        }
+
+    def ensure(self, db: Session, *, email: Email) -> Optional[int]:
+        """返回邮件的指纹，历史邮件没有指纹时计算并写入；内容过短无法计算时返回None"""
+        simhash = db.execute(
+            select(self.model.simhash).where(self.model.email_id == email.id)
+        ).scalar_one_or_none()
+        if simhash is not None:
+            return simhash
+        simhash = compute_simhash(email.subject, email.content)
+        if simhash is None:
+            return None
+        db.add(self.model(**self.build_row(email.id, email.account_id, email.from_address, simhash)))
+        try:
+            db.commit()
+        except IntegrityError:
+            # 并发任务已写入
+            db.rollback()
+        return simhash
+
+    def find_tagged_duplicate(
+        self,
+        db: Session,
+        *,
+        account_ids: List[int],
+        sender: Optional[str],
+        simhash: int,
+        exclude_email_id: int
+    ) -> Optional[Tuple[int, int, int]]:
+        """在同一发件人最近的已打标签邮件中查找最相似的一封
+
+        Returns:
+            (标签ID, 参考邮件ID, 汉明距离)，没有距离在 EMAIL_SIMHASH_MAX_DISTANCE 以内的邮件时返回None
+        """
+        sender = self.normalize_sender(sender)
+        if not sender or not account_ids:
+            return None
+        rows = db.execute(
+            select(self.model.email_id, self.model.simhash, EmailTagRelation.tag_id)
+            .join(EmailTagRelation, EmailTagRelation.email_id == self.model.email_id)
+            .where(
+                self.model.account_id.in_(account_ids),
+                self.model.sender == sender,
+                self.model.email_id != exclude_email_id,
+                EmailTagRelation.deleted_at.is_(None),
+                or_(EmailTagRelation.source.is_(None), EmailTagRelation.source.in_(REUSABLE_SOURCES))
+            )
+            .order_by(self.model.email_id.desc())
+            .limit(settings.EMAIL_SIMHASH_MAX_CANDIDATES)
+        ).all()
+
+        best = None
+        for row in rows:
+            distance = hamming_distance(simhash, row.simhash)
+            if distance <= settings.EMAIL_SIMHASH_MAX_DISTANCE and (best is None or distance < best[2]):
+                best = (row.tag_id, row.email_id, distance)
+                if distance == 0:
+                    break
+        return best
+
+
+# 创建全局实例
+crud_email_fingerprint = CRUDEmailFingerprint(EmailFingerprint)
@@ -30,6 +30,18 @@ class CRUDEmailProvider(CRUDBase[EmailProvider, EmailProviderCreate, EmailProvid
             domain = '@' + domain
         return db.query(EmailProvider).filter(EmailProvider.domain_suffix == domain).first()
     
+    def get_by_imap_host(
+        self,
+        db: Session,
+        *,
+        imap_host: str
+    ) -> Optional[EmailProvider]:
+        """通过IMAP服务器地址获取启用的提供商"""
+        return db.query(EmailProvider).filter(
+            EmailProvider.imap_host == imap_host,
+            EmailProvider.is_active == True
+        ).order_by(EmailProvider.id.asc()).first()
+    
     def get_active_providers(
         self,
         db: Session,
@@ -157,10 +157,23 @@ class CRUDEmailTag(CRUDBase[EmailTag, EmailTagCreate, EmailTagUpdate]):
             for row in query.all()
         }
     
-    def add_email_tag(self,db: Session,*,email_id: int,tag_id: int) -> EmailTagRelation:
-        """为邮件添加标签"""
+    def add_email_tag(
+        self,
+        db: Session,
+        *,
+        email_id: int,
+        tag_id: int,
+        source: str = "manual",
+        source_email_id: Optional[int] = None
+    ) -> EmailTagRelation:
+        """为邮件添加标签，source 记录标签来源（manual / llm / simhash）"""
         self.remove_email_tag(db, email_id=email_id)
-        db_obj = EmailTagRelation(email_id=email_id,tag_id=tag_id)
+        db_obj = EmailTagRelation(
+            email_id=email_id,
+            tag_id=tag_id,
+            source=source,
+            source_email_id=source_email_id
+        )
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
@@ -0,0 +1,272 @@
+"""
+邮件会话的CRUD操作
+
+会话归并采用增量的 JWZ 算法：email_thread_refs 持久化 Message-ID 到会话的映射（id_table），
+新邮件只按自身和引用的 Message-ID 查询映射，命中多个会话时合并，不需要重新扫描邮箱。
+"""
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.email import Email, EmailThread, EmailThreadRef
+
+# 回复/转发前缀，如 "Re: "、"FW: "、"回复："、"Re[2]: "
+_REPLY_PREFIX_RE = re.compile(r'^\s*(?:(?:re|fw|fwd|aw|wg|sv|回复|答复|转发)\s*(?:\[\d+\])?\s*[:：]\s*)+', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+# 会话参与者数量上限
+MAX_PARTICIPANTS = 100
+# 写入冲突（并发同步同一账户的多个文件夹）时的重试次数
+MAX_RETRIES = 3
+
+
+def normalize_subject(subject: Optional[str]) -> Tuple[str, bool]:
+    """去掉回复/转发前缀并归一空白，返回 (主题键, 是否带回复前缀)"""
+    subject = subject or ""
+    stripped = _REPLY_PREFIX_RE.sub("", subject)
+    key = _SPACE_RE.sub(" ", stripped).strip().lower()[:191]
+    return key, stripped != subject
+
+
+def _own_message_id(email: Dict[str, Any]) -> str:
+    return (email.get("message_id") or "").strip()[:255]
+
+
+def _reference_chain(email: Dict[str, Any]) -> List[str]:
+    """邮件引用的祖先 Message-ID 列表，从最早的祖先到直接父邮件，不含自身"""
+    chain = list(email.get("references") or [])
+    if email.get("in_reply_to"):
+        chain.append(email["in_reply_to"])
+    own = _own_message_id(email)
+    seen: Set[str] = set()
+    result = []
+    for message_id in chain:
+        message_id = message_id.strip()[:255]
+        if message_id and message_id != own and message_id not in seen:
+            seen.add(message_id)
+            result.append(message_id)
+    return result
+
+
+def _participants(email: Dict[str, Any]) -> Set[str]:
+    addresses = [email.get("from_address")]
+    for key in ("to_address", "cc_address"):
+        addresses.extend(email.get(key) or [])
+    return {address.lower() for address in addresses if address}
+
+
+class CRUDEmailThread:
+    """邮件会话CRUD操作类"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def get_by_account(self, db: Session, *, account_id: int, thread_id: int) -> Optional[EmailThread]:
+        """获取账户下的会话"""
+        return db.query(self.model).filter(
+            and_(
+                self.model.id == thread_id,
+                self.model.account_id == account_id,
+                self.model.deleted_at.is_(None)
+            )
+        ).first()
+
+    def get_multi_by_account(
+        self,
+        db: Session,
+        *,
+        account_id: int,
+        limit: int = 50,
+        before: Optional[Tuple[datetime, int]] = None
+    ) -> List[EmailThread]:
+        """按最后活动时间倒序获取会话（键集分页）
+
+        before 为上一页最后一条的 (last_activity, id)，走 (account_id, last_activity, id) 索引，
+        翻页代价与页码无关。
+        """
+        query = db.query(self.model).filter(
+            self.model.account_id == account_id,
+            self.model.deleted_at.is_(None)
+        )
+        if before is not None:
+            last_activity, thread_id = before
+            query = query.filter(
+                or_(
+                    self.model.last_activity < last_activity,
+                    and_(self.model.last_activity == last_activity, self.model.id < thread_id)
+                )
+            )
+        return query.order_by(self.model.last_activity.desc(), self.model.id.desc()).limit(limit).all()
+
+    def get_emails(self, db: Session, *, thread_id: int) -> List[Email]:
+        """获取会话中未删除的邮件，按时间正序"""
+        return db.query(Email).filter(
+            Email.thread_id == thread_id,
+            Email.deleted_at.is_(None)
+        ).order_by(Email.date, Email.id).all()
+
+    def get_unthreaded(self, db: Session, *, batch_size: int = 500) -> List[Email]:
+        """获取尚未归入会话的邮件（历史数据或归并失败的邮件），按时间正序"""
+        return db.query(Email).filter(
+            Email.thread_id.is_(None),
+            Email.deleted_at.is_(None)
+        ).order_by(Email.date, Email.id).limit(batch_size).all()
+
+    def add_emails(self, db: Session, *, account_id: int, emails: List[Dict[str, Any]]) -> None:
+        """将新写入的邮件归入会话并提交
+
+        emails 每项需包含 id、message_id、in_reply_to、references、subject、
+        from_address、to_address、cc_address、date。
+        """
+        if not emails:
+            return
+        for attempt in range(MAX_RETRIES):
+            try:
+                self._add_emails(db, account_id, emails)
+                db.commit()
+                return
+            except IntegrityError:
+                # 并发同步的其他文件夹同时创建了相同的 Message-ID 映射，回滚后重新查询归并
+                db.rollback()
+                if attempt == MAX_RETRIES - 1:
+                    raise
+            except Exception:
+                db.rollback()
+                raise
+
+    def _load_refs(self, db: Session, account_id: int, message_ids: Iterable[str]) -> Dict[str, EmailThreadRef]:
+        message_ids = sorted(message_ids)
+        refs = {}
+        for i in range(0, len(message_ids), 1000):
+            for ref in db.execute(
+                select(EmailThreadRef)
+                .where(
+                    EmailThreadRef.account_id == account_id,
+                    EmailThreadRef.message_id.in_(message_ids[i:i + 1000])
+                )
+                .with_for_update()
+            ).scalars():
+                refs[ref.message_id] = ref
+        return refs
+
+    def _find_by_subject(self, db: Session, account_id: int, subject_key: str, since: datetime) -> Optional[EmailThread]:
+        return db.query(self.model).filter(
+            self.model.account_id == account_id,
+            self.model.subject_key == subject_key,
+            self.model.last_activity >= since,
+            self.model.deleted_at.is_(None)
+        ).order_by(self.model.last_activity.desc()).first()
+
+    def _merge(self, db: Session, threads: List[EmailThread], merged_into: Dict[int, int]) -> EmailThread:
+        """合并多个会话到最早创建的会话，返回合并后的会话"""
+        threads = sorted(threads, key=lambda thread: thread.id)
+        target = threads[0]
+        for source in threads[1:]:
+            target.message_count += source.message_count
+            target.participants = sorted(set(target.participants or []) | set(source.participants or []))[:MAX_PARTICIPANTS]
+            if source.last_activity and (not target.last_activity or source.last_activity > target.last_activity):
+                target.last_activity = source.last_activity
+                target.last_email_id = source.last_email_id
+            db.execute(
+                update(EmailThreadRef).where(EmailThreadRef.thread_id == source.id).values(thread_id=target.id)
+            )
+            db.execute(update(Email).where(Email.thread_id == source.id).values(thread_id=target.id))
+            merged_into[source.id] = target.id
+            db.delete(source)
+        return target
+
+    def _add_emails(self, db: Session, account_id: int, emails: List[Dict[str, Any]]) -> None:
+        # 按时间先后处理，先到的根邮件作为会话根
+        emails = sorted(emails, key=lambda email: (email.get("date") or datetime.min, email["id"]))
+        chains = {email["id"]: _reference_chain(email) for email in emails}
+        message_ids: Set[str] = set()
+        for email in emails:
+            message_ids.update(chains[email["id"]])
+            if _own_message_id(email):
+                message_ids.add(_own_message_id(email))
+        refs = self._load_refs(db, account_id, message_ids)
+
+        subject_days = settings.EMAIL_THREAD_SUBJECT_MATCH_DAYS
+        threads: Dict[int, EmailThread] = {}
+        merged_into: Dict[int, int] = {}
+        assigned: Dict[int, int] = {}
+        for email in emails:
+            own = _own_message_id(email)
+            chain = chains[email["id"]]
+            date = email.get("date") or datetime.now()
+            subject_key, is_reply = normalize_subject(email.get("subject"))
+
+            # 自身或任一祖先已有会话时归入该会话，命中多个会话说明它们属于同一棵树，合并
+            thread_ids = {refs[message_id].thread_id for message_id in chain + [own] if message_id in refs}
+            candidates = []
+            for thread_id in thread_ids:
+                if thread_id not in threads:
+                    threads[thread_id] = db.get(self.model, thread_id)
+                candidates.append(threads[thread_id])
+            thread = self._merge(db, candidates, merged_into) if candidates else None
+            for thread_id in thread_ids:
+                if thread and thread_id != thread.id:
+                    threads.pop(thread_id, None)
+
+            if thread is None and is_reply and subject_key and subject_days:
+                # 没有引用头的回复，按主题归并到近期的会话
+                thread = self._find_by_subject(db, account_id, subject_key, date - timedelta(days=subject_days))
+            if thread is None:
+                thread = self.model(
+                    account_id=account_id,
+                    root_message_id=chain[0] if chain else (own or None),
+                    subject=email.get("subject"),
+                    subject_key=subject_key,
+                    participants=[],
+                    message_count=0,
+                    last_activity=date
+                )
+                db.add(thread)
+                db.flush()
+            threads[thread.id] = thread
+
+            # 记录自身和祖先的 Message-ID 映射，祖先尚未收到时先占位
+            for message_id in chain:
+                if message_id not in refs:
+                    refs[message_id] = EmailThreadRef(account_id=account_id, message_id=message_id, thread_id=thread.id)
+                    db.add(refs[message_id])
+            if own:
+                ref = refs.get(own)
+                if ref is None:
+                    refs[own] = EmailThreadRef(
+                        account_id=account_id, message_id=own, thread_id=thread.id, email_id=email["id"]
+                    )
+                    db.add(refs[own])
+                elif ref.email_id is None:
+                    ref.email_id = email["id"]
+            if own and own == thread.root_message_id:
+                # 根邮件晚于回复到达时，以根邮件的主题作为会话主题
+                thread.subject = email.get("subject")
+                thread.subject_key = subject_key
+
+            thread.message_count += 1
+            thread.participants = sorted(set(thread.participants or []) | _participants(email))[:MAX_PARTICIPANTS]
+            if not thread.last_activity or date >= thread.last_activity:
+                thread.last_activity = date
+                thread.last_email_id = email["id"]
+            assigned[email["id"]] = thread.id
+            db.flush()
+
+        def resolve(thread_id: int) -> int:
+            while thread_id in merged_into:
+                thread_id = merged_into[thread_id]
+            return thread_id
+
+        db.execute(
+            update(Email),
+            [{"id": email_id, "thread_id": resolve(thread_id)} for email_id, thread_id in assigned.items()]
+        )
+
+
+# 创建全局实例
+crud_email_thread = CRUDEmailThread(EmailThread)
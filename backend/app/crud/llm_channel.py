@@ -24,7 +24,12 @@ class CRUDLLMChannel(CRUDBase[LLMChannel, LLMChannelCreate, LLMChannelUpdate]):
             model_type=obj_in.model_type,
             model=obj_in.model,
             api_key=obj_in.api_key,
-            proxy_url=obj_in.proxy_url
+            proxy_url=obj_in.proxy_url,
+            connect_timeout=obj_in.connect_timeout,
+            request_timeout=obj_in.request_timeout,
+            max_concurrency=obj_in.max_concurrency,
+            requests_per_minute=obj_in.requests_per_minute,
+            tokens_per_minute=obj_in.tokens_per_minute
         )
         db.add(db_obj)
         db.commit()
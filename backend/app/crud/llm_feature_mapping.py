@@ -1,12 +1,17 @@
 """
 LLM功能映射的CRUD操作
 """
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from sqlalchemy.orm import Session
 from app.crud.base import CRUDBase
-from app.models.llm_feature_mapping import LLMFeatureMapping
+from app.models.llm_channel import LLMChannel
+from app.models.llm_feature_mapping import LLMFeatureMapping, LLMFeatureMappingChannel
 from app.models.llm_feature import FeatureType
-from app.schemas.llm_feature_mapping import LLMFeatureMappingCreate, LLMFeatureMappingUpdate
+from app.schemas.llm_feature_mapping import (
+    LLMFeatureMappingChannelItem,
+    LLMFeatureMappingCreate,
+    LLMFeatureMappingUpdate,
+)
 
 class CRUDFeatureMapping(CRUDBase[LLMFeatureMapping, LLMFeatureMappingCreate, LLMFeatureMappingUpdate]):
     """功能映射CRUD操作类"""
@@ -47,11 +52,39 @@ class CRUDFeatureMapping(CRUDBase[LLMFeatureMapping, LLMFeatureMappingCreate, LL
         """创建用户的功能映射"""
         db_obj = LLMFeatureMapping(
             user_id=user_id,
-            **obj_in.dict()
+            **obj_in.dict(exclude={"pool"})
         )
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
         return db_obj
 
+    def set_pool(
+        self,
+        db: Session,
+        *,
+        mapping: LLMFeatureMapping,
+        items: Optional[List[LLMFeatureMappingChannelItem]]
+    ) -> LLMFeatureMapping:
+        """替换功能映射的渠道池，items 的顺序即优先顺序；为空时清空渠道池，只使用 channel_id"""
+        # 先删除旧成员，避免与新成员的 (mapping_id, channel_id) 唯一约束冲突
+        mapping.pool.clear()
+        db.flush()
+        mapping.pool = [
+            LLMFeatureMappingChannel(channel_id=item.channel_id, priority=index, weight=item.weight)
+            for index, item in enumerate(items or [])
+        ]
+        db.add(mapping)
+        db.commit()
+        db.refresh(mapping)
+        return mapping
+
+    @staticmethod
+    def get_channel_pool(mapping: LLMFeatureMapping) -> List[Tuple[LLMChannel, int]]:
+        """返回功能映射的 (渠道, 权重) 列表，按配置顺序；未配置渠道池时只有 channel_id 对应的渠道"""
+        pool = [(item.channel, item.weight or 1) for item in mapping.pool if item.channel is not None]
+        if pool:
+            return pool
+        return [(mapping.channel, 1)] if mapping.channel is not None else []
+
 crud_feature_mapping = CRUDFeatureMapping(LLMFeatureMapping) 
\ No newline at end of file
@@ -0,0 +1,70 @@
+"""
+LLM调用用量的CRUD操作
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.orm import Session
+
+from app.models.llm_usage import LLMUsageLog
+
+
+class CRUDLLMUsage:
+    """LLM调用用量CRUD操作类"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def record(self, db: Session, **fields: Any) -> LLMUsageLog:
+        """写入一条调用用量"""
+        log = self.model(**fields)
+        db.add(log)
+        db.commit()
+        return log
+
+    def get_summary(
+        self,
+        db: Session,
+        *,
+        user_id: int,
+        start_time: datetime,
+        end_time: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """按功能类型和模型汇总时间范围内的调用次数和token用量"""
+        stmt = (
+            select(
+                self.model.feature_type,
+                self.model.provider,
+                self.model.model,
+                func.count(self.model.id).label("calls"),
+                func.sum(cast(self.model.cached, Integer)).label("cached_calls"),
+                func.sum(cast(self.model.truncated, Integer)).label("truncated_calls"),
+                func.sum(self.model.prompt_tokens).label("prompt_tokens"),
+                func.sum(self.model.completion_tokens).label("completion_tokens")
+            )
+            .where(self.model.user_id == user_id, self.model.created_at >= start_time)
+            .group_by(self.model.feature_type, self.model.provider, self.model.model)
+        )
+        if end_time:
+            stmt = stmt.where(self.model.created_at < end_time)
+        summary = []
+        for row in db.execute(stmt).all():
+            prompt_tokens = int(row.prompt_tokens or 0)
+            completion_tokens = int(row.completion_tokens or 0)
+            summary.append({
+                "feature_type": row.feature_type,
+                "provider": row.provider,
+                "model": row.model,
+                "calls": row.calls,
+                "cached_calls": int(row.cached_calls or 0),
+                "truncated_calls": int(row.truncated_calls or 0),
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            })
+        return summary
+
+
+# 创建全局实例
+crud_llm_usage = CRUDLLMUsage(LLMUsageLog)
@@ -15,6 +15,10 @@ from app.models import (
     Email,
     EmailAttachment,
     EmailSyncLog,
+    EmailFolderState,
+    EmailRawContent,
+    EmailThread,
+    EmailThreadRef,
     EmailTag,
     EmailTagRelation,
     EmailOutbox
@@ -5,7 +5,8 @@ from typing import AsyncGenerator
 from sqlalchemy.orm import Session
 from app.models.llm_feature import FeatureType
 from app.crud.llm_feature_mapping import crud_feature_mapping
-from app.utils.llm.client import LLMClient
+from app.utils.llm.router import generate_stream_routed
+from app.utils.llm.token_counter import fit_to_budget
 from app.core.exceptions import FeatureNotConfiguredError
 
 class FeatureInterface:
@@ -43,17 +44,33 @@ class FeatureInterface:
             if not mapping:
                 raise FeatureNotConfiguredError(f"功能 {feature_type} 未配置")
                 
+            # 获取映射的渠道池
+            pool = crud_feature_mapping.get_channel_pool(mapping)
+            if not pool:
+                raise FeatureNotConfiguredError(f"功能 {feature_type} 的渠道不存在")
+            channel = pool[0][0]
             # 获取提示词模板
             prompt_template = mapping.prompt_template or mapping.feature.default_prompt
+            # 超出功能映射的输入预算时截断消息（按主渠道的模型计算）
+            message, truncated = fit_to_budget(
+                prompt_template,
+                message,
+                mapping.max_input_tokens,
+                model=channel.model,
+                provider=channel.model_type
+            )
             
-            # 使用LLM客户端生成流式响应
-            async for chunk in LLMClient.generate_stream(
-                prompt=prompt_template,
-                message=message,
-                api_key=mapping.channel.api_key,
-                provider=mapping.channel.model_type,
-                model=mapping.channel.model,
-                proxy_url=mapping.channel.proxy_url
+            # 在渠道池中生成流式响应，首个数据块之前失败时切换渠道
+            async for chunk in generate_stream_routed(
+                pool,
+                prompt_template,
+                message,
+                strategy=mapping.routing_strategy,
+                usage_context={
+                    "user_id": user_id,
+                    "feature_type": feature_type,
+                    "truncated": truncated
+                }
             ):
                 yield chunk  # 添加换行符以确保正确的流式输出
             # 更新使用统计
@@ -11,8 +11,11 @@ from app.models.email_provider import EmailProvider
 from app.models.email_account import EmailAccount
 from app.models.task import Task
 from app.models.llm_feature import LLMFeature
-from app.models.llm_feature_mapping import LLMFeatureMapping
-from app.models.email import Email, EmailAttachment, EmailSyncLog
+from app.models.llm_feature_mapping import LLMFeatureMapping, LLMFeatureMappingChannel
+from app.models.llm_usage import LLMUsageLog
+from app.models.email import (
+    Email, EmailAttachment, EmailSyncLog, EmailFolderState, EmailRawContent, EmailThread, EmailThreadRef, EmailFingerprint
+)
 from app.models.email_tag import EmailTag,EmailTagRelation
 from app.models.email_outbox import EmailOutbox
 
@@ -29,9 +32,16 @@ __all__ = [
     "Task",
     "LLMFeature",
     "LLMFeatureMapping",
+    "LLMFeatureMappingChannel",
+    "LLMUsageLog",
     "Email",
     "EmailAttachment",
     "EmailSyncLog",
+    "EmailFolderState",
+    "EmailRawContent",
+    "EmailThread",
+    "EmailThreadRef",
+    "EmailFingerprint",
     "EmailTag",
     "EmailTagRelation",
     "EmailOutbox"
@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import Integer, String, DateTime, Boolean, JSON, ForeignKey, Enum
+from sqlalchemy import Integer, BigInteger, String, DateTime, Boolean, JSON, ForeignKey, Enum, Index, UniqueConstraint, LargeBinary
+from sqlalchemy.dialects.mysql import LONGBLOB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base_model import BaseDBModel
@@ -9,6 +10,12 @@ from app.models.email_account import EmailAccount
 class Email(BaseDBModel):
     """邮件模型"""
     __tablename__ = "emails"
+    __table_args__ = (
+        Index("idx_emails_account_folder_uid", "account_id", "folder", "uid"),
+        Index("idx_emails_thread_date", "thread_id", "date"),
+        # 同一封邮件可以同时存在于多个文件夹（如INBOX和All Mail），每个文件夹各有一行
+        UniqueConstraint("account_id", "folder", "message_id", name="uk_emails_account_folder_message"),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     account_id: Mapped[int] = mapped_column(Integer, ForeignKey("email_accounts.id", ondelete="CASCADE"))
@@ -23,16 +30,21 @@ class Email(BaseDBModel):
     date: Mapped[datetime] = mapped_column(DateTime)
     content_type: Mapped[str] = mapped_column(String(50))
     content: Mapped[Optional[str]] = mapped_column(String)
-    raw_content: Mapped[Optional[str]] = mapped_column(String)
+    # 发送给模型的正文：HTML转纯文本并去除引用、签名和模板页脚，见 app/utils/email/normalizer.py
+    llm_text: Mapped[Optional[str]] = mapped_column(String, deferred=True)
+    # 已废弃：邮件原文改存 EmailRawContent，仅保留给历史数据迁移使用
+    raw_content: Mapped[Optional[str]] = mapped_column(String, deferred=True)
     has_attachments: Mapped[bool] = mapped_column(Boolean, default=False)
     size: Mapped[int] = mapped_column(Integer, default=0)
     is_read: Mapped[bool] = mapped_column(Boolean, default=False)
     is_flagged: Mapped[bool] = mapped_column(Boolean, default=False)
     is_deleted: Mapped[bool] = mapped_column(Boolean, default=False)
-    folder: Mapped[str] = mapped_column(String(50), default="INBOX")
+    folder: Mapped[str] = mapped_column(String(255), default="INBOX")
+    uid: Mapped[Optional[int]] = mapped_column(BigInteger)
     importance: Mapped[int] = mapped_column(Integer, default=0)
     in_reply_to: Mapped[Optional[str]] = mapped_column(String(255))
     references: Mapped[Optional[List[str]]] = mapped_column(JSON)
+    thread_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("email_threads.id", ondelete="SET NULL"))
     deleted_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
 
     # 关联关系
@@ -45,6 +57,13 @@ class Email(BaseDBModel):
         lazy="selectin"
     )
     replies: Mapped[List["EmailOutbox"]] = relationship("EmailOutbox", back_populates="reply_to_email")
+    raw_message: Mapped[Optional["EmailRawContent"]] = relationship(
+        "EmailRawContent",
+        back_populates="email",
+        cascade="all, delete-orphan",
+        uselist=False,
+        lazy="noload"
+    )
 
     def __repr__(self) -> str:
         return f"<Email {self.subject}>"
@@ -59,6 +78,7 @@ class EmailAttachment(BaseDBModel):
     content_type: Mapped[str] = mapped_column(String(100))
     size: Mapped[int] = mapped_column(Integer)
     storage_path: Mapped[str] = mapped_column(String(500))
+    sha256: Mapped[Optional[str]] = mapped_column(String(64), index=True)
     content_id: Mapped[Optional[str]] = mapped_column(String(255))
     is_inline: Mapped[bool] = mapped_column(Boolean, default=False)
     deleted_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
@@ -66,6 +86,20 @@ class EmailAttachment(BaseDBModel):
     # 关联关系
     email: Mapped[Email] = relationship("Email", back_populates="attachments")
 
+class EmailRawContent(BaseDBModel):
+    """邮件原文模型，压缩后单独存放，仅在查看原文或重新解析时加载"""
+    __tablename__ = "email_raw_contents"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    email_id: Mapped[int] = mapped_column(Integer, ForeignKey("emails.id", ondelete="CASCADE"), unique=True)
+    codec: Mapped[str] = mapped_column(String(10))
+    size: Mapped[int] = mapped_column(Integer, default=0)
+    data: Mapped[bytes] = mapped_column(LargeBinary().with_variant(LONGBLOB(), "mysql"))
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+    # 关联关系
+    email: Mapped[Email] = relationship("Email", back_populates="raw_message")
+
 class EmailSyncLog(BaseDBModel):
     """邮件同步日志模型"""
     __tablename__ = "email_sync_logs"
@@ -83,4 +117,78 @@ class EmailSyncLog(BaseDBModel):
     sync_type: Mapped[str] = mapped_column(Enum("FULL", "INCREMENT", name="sync_type"), default="INCREMENT")
 
     # 关联关系
-    account: Mapped[EmailAccount] = relationship("EmailAccount", back_populates="sync_logs")
\ No newline at end of file
+    account: Mapped[EmailAccount] = relationship("EmailAccount", back_populates="sync_logs")
+
+class EmailFolderState(BaseDBModel):
+    """邮件文件夹同步状态模型，记录每个文件夹的UID同步进度"""
+    __tablename__ = "email_folder_states"
+    __table_args__ = (
+        UniqueConstraint("account_id", "folder", name="uk_email_folder_states_account_folder"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    account_id: Mapped[int] = mapped_column(Integer, ForeignKey("email_accounts.id", ondelete="CASCADE"))
+    folder: Mapped[str] = mapped_column(String(255))
+    uidvalidity: Mapped[Optional[int]] = mapped_column(BigInteger)
+    last_uid: Mapped[int] = mapped_column(BigInteger, default=0)
+    highestmodseq: Mapped[Optional[int]] = mapped_column(BigInteger)
+    last_sync_time: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    # 文件夹内未删除邮件的计数，随邮件写入、删除、标记已读和移动在同一事务中维护
+    total_count: Mapped[int] = mapped_column(Integer, default=0)
+    unread_count: Mapped[int] = mapped_column(Integer, default=0)
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+    # 关联关系
+    account: Mapped[EmailAccount] = relationship("EmailAccount", back_populates="folder_states")
+
+class EmailThread(BaseDBModel):
+    """邮件会话模型，写入邮件时按 Message-ID / In-Reply-To / References 增量归并"""
+    __tablename__ = "email_threads"
+    __table_args__ = (
+        Index("idx_email_threads_account_activity", "account_id", "last_activity", "id"),
+        Index("idx_email_threads_account_subject", "account_id", "subject_key"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    account_id: Mapped[int] = mapped_column(Integer, ForeignKey("email_accounts.id", ondelete="CASCADE"))
+    root_message_id: Mapped[Optional[str]] = mapped_column(String(255))
+    subject: Mapped[Optional[str]] = mapped_column(String(500))
+    # 去掉 Re:/Fwd: 等前缀后的主题，用于没有引用头的回复按主题归并
+    subject_key: Mapped[Optional[str]] = mapped_column(String(191))
+    participants: Mapped[List[str]] = mapped_column(JSON)
+    message_count: Mapped[int] = mapped_column(Integer, default=0)
+    last_activity: Mapped[datetime] = mapped_column(DateTime)
+    last_email_id: Mapped[Optional[int]] = mapped_column(Integer)
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+class EmailThreadRef(BaseDBModel):
+    """Message-ID 到会话的映射（JWZ 算法的 id_table）
+
+    email_id 为空表示该 Message-ID 只被其他邮件引用、本身尚未收到，收到后补充 email_id。
+    """
+    __tablename__ = "email_thread_refs"
+    __table_args__ = (
+        UniqueConstraint("account_id", "message_id", name="uk_email_thread_refs_account_message"),
+        Index("idx_email_thread_refs_thread", "thread_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    account_id: Mapped[int] = mapped_column(Integer, ForeignKey("email_accounts.id", ondelete="CASCADE"))
+    message_id: Mapped[str] = mapped_column(String(255))
+    thread_id: Mapped[int] = mapped_column(Integer, ForeignKey("email_threads.id", ondelete="CASCADE"))
+    email_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("emails.id", ondelete="SET NULL"))
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+class EmailFingerprint(BaseDBModel):
+    """邮件内容指纹（SimHash），用于查找同一发件人模板相同的近似重复邮件"""
+    __tablename__ = "email_fingerprints"
+    __table_args__ = (
+        Index("idx_email_fingerprints_account_sender", "account_id", "sender", "email_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    email_id: Mapped[int] = mapped_column(Integer, ForeignKey("emails.id", ondelete="CASCADE"), unique=True)
+    account_id: Mapped[int] = mapped_column(Integer, ForeignKey("email_accounts.id", ondelete="CASCADE"))
+    sender: Mapped[str] = mapped_column(String(255))
+    simhash: Mapped[int] = mapped_column(BigInteger)
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
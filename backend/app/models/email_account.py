@@ -4,7 +4,7 @@
 from datetime import datetime
 from typing import List
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Boolean, Integer, ForeignKey, DateTime, Enum as SQLEnum
+from sqlalchemy import String, Boolean, Integer, ForeignKey, DateTime, JSON, Enum as SQLEnum
 from enum import Enum
 from app.models.base_model import BaseDBModel
 
@@ -137,6 +137,21 @@ class EmailAccount(BaseDBModel):
         default=30,
         comment="邮件保留天数"
     )
+    use_idle: Mapped[bool] = mapped_column(
+        Boolean,
+        default=False,
+        comment="是否启用IMAP IDLE实时推送"
+    )
+    sync_folders: Mapped[List[str]] = mapped_column(
+        JSON,
+        nullable=True,
+        comment="同步的文件夹列表，为空时仅同步INBOX"
+    )
+    sync_concurrency: Mapped[int] = mapped_column(
+        Integer,
+        default=3,
+        comment="文件夹并行同步的最大连接数"
+    )
     
     # 服务器测试相关字段
     smtp_last_test_time: Mapped[datetime] = mapped_column(
@@ -174,6 +189,7 @@ class EmailAccount(BaseDBModel):
     user = relationship("User", back_populates="email_accounts")
     emails: Mapped[List["Email"]] = relationship("Email", back_populates="account", cascade="all, delete-orphan")
     sync_logs: Mapped[List["EmailSyncLog"]] = relationship("EmailSyncLog", back_populates="account", cascade="all, delete-orphan")
+    folder_states: Mapped[List["EmailFolderState"]] = relationship("EmailFolderState", back_populates="account", cascade="all, delete-orphan")
     outbox_emails: Mapped[List["EmailOutbox"]] = relationship("EmailOutbox", back_populates="account", cascade="all, delete-orphan")
 
     def __repr__(self) -> str:
@@ -81,6 +81,16 @@ class EmailProvider(BaseDBModel):
         default=0,
         comment="排序顺序"
     )
+    imap_max_connections: Mapped[int] = mapped_column(
+        Integer,
+        nullable=True,
+        comment="所有worker到IMAP服务器的最大连接数，为空不限制"
+    )
+    imap_fetch_per_minute: Mapped[int] = mapped_column(
+        Integer,
+        nullable=True,
+        comment="所有worker每分钟从IMAP服务器获取的邮件数，为空不限制"
+    )
 
     def __repr__(self) -> str:
         return f"<EmailProvider {self.name}>" 
\ No newline at end of file
@@ -97,6 +97,17 @@ class EmailTagRelation(BaseDBModel):
         nullable=False,
         comment="标签ID"
     )
+    source: Mapped[Optional[str]] = mapped_column(
+        String(20),
+        nullable=True,
+        comment="标签来源：manual 手动 / llm 模型分类 / simhash 复用近似重复邮件的标签"
+    )
+    # 不设外键：email_tag_relations 是 emails 与 email_tags 多对多关联的中间表，第二个指向 emails 的外键会使关联关系无法推断
+    source_email_id: Mapped[Optional[int]] = mapped_column(
+        Integer,
+        nullable=True,
+        comment="复用标签时参考的邮件ID"
+    )
     deleted_at: Mapped[Optional[datetime]] = mapped_column(
         DateTime,
         nullable=True,
@@ -43,6 +43,32 @@ class LLMChannel(BaseDBModel):
         nullable=True,
         comment="代理地址(可选)"
     )
+    connect_timeout: float = Column(
+        Float,
+        nullable=True,
+        comment="连接超时(秒)，为空使用默认值"
+    )
+    request_timeout: float = Column(
+        Float,
+        nullable=True,
+        comment="单次调用超时(秒)，为空使用默认值"
+    )
+    # 限流配置，使用同一API密钥的渠道共享配额
+    max_concurrency: int = Column(
+        Integer,
+        nullable=True,
+        comment="最大并发请求数，为空不限制"
+    )
+    requests_per_minute: int = Column(
+        Integer,
+        nullable=True,
+        comment="每分钟请求数上限，为空不限制"
+    )
+    tokens_per_minute: int = Column(
+        Integer,
+        nullable=True,
+        comment="每分钟token数上限，为空不限制"
+    )
     
     # 响应时间相关字段
     last_response_time: float = Column(
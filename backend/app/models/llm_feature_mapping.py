@@ -1,11 +1,18 @@
 """
 LLM功能映射模型
 """
-from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, String
+from sqlalchemy import Column, Integer, ForeignKey, Text, DateTime, String, Boolean, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
+from enum import Enum
 from app.models.base_model import BaseDBModel
 
+class RoutingStrategy(str, Enum):
+    """渠道池的路由策略"""
+    PRIORITY = "priority"  # 按配置顺序，前面的渠道不可用时才使用后面的渠道
+    WEIGHTED = "weighted"  # 按权重随机分配
+    LATENCY = "latency"  # 按实际调用的延迟和错误率（EWMA）选择，权重越大越优先
+
 class LLMFeatureMapping(BaseDBModel):
     """LLM功能映射"""
     __tablename__ = "llm_feature_mappings"
@@ -47,6 +54,26 @@ class LLMFeatureMapping(BaseDBModel):
         comment="自定义提示词模板"
     )
     
+    cache_enabled: bool = Column(
+        Boolean,
+        nullable=False,
+        default=False,
+        comment="是否缓存LLM响应，相同输入直接返回缓存结果"
+    )
+    
+    max_input_tokens: int = Column(
+        Integer,
+        nullable=True,
+        comment="单次调用的输入token上限（提示词+消息），为空使用默认值，超出时截断消息"
+    )
+    
+    routing_strategy: str = Column(
+        String(20),
+        nullable=False,
+        default=RoutingStrategy.LATENCY.value,
+        comment="渠道池的路由策略：priority/weighted/latency"
+    )
+    
     last_used_at: DateTime = Column(
         DateTime,
         nullable=True,
@@ -78,10 +105,71 @@ class LLMFeatureMapping(BaseDBModel):
         lazy="select"
     )
     
+    # 渠道池，为空时只使用 channel_id
+    pool = relationship(
+        "LLMFeatureMappingChannel",
+        back_populates="mapping",
+        order_by="LLMFeatureMappingChannel.priority",
+        lazy="select",
+        cascade="all, delete-orphan"
+    )
+    
     def __repr__(self) -> str:
         return f"<LLMFeatureMapping {self.feature_type}>"
     
     def update_usage(self) -> None:
         """更新使用统计"""
         self.last_used_at = datetime.now()
-        self.use_count += 1
\ No newline at end of file
+        self.use_count += 1
+
+
+class LLMFeatureMappingChannel(BaseDBModel):
+    """功能映射的渠道池成员"""
+    __tablename__ = "llm_feature_mapping_channels"
+    __table_args__ = (
+        UniqueConstraint("mapping_id", "channel_id", name="uk_mapping_channel"),
+    )
+
+    mapping_id: int = Column(
+        Integer,
+        ForeignKey("llm_feature_mappings.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+        comment="功能映射ID"
+    )
+
+    channel_id: int = Column(
+        Integer,
+        ForeignKey("llm_channels.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+        comment="渠道ID"
+    )
+
+    priority: int = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        comment="顺序，越小越优先"
+    )
+
+    weight: int = Column(
+        Integer,
+        nullable=False,
+        default=1,
+        comment="权重"
+    )
+
+    mapping = relationship(
+        "LLMFeatureMapping",
+        back_populates="pool",
+        lazy="select"
+    )
+
+    channel = relationship(
+        "LLMChannel",
+        lazy="joined"
+    )
+
+    def __repr__(self) -> str:
+        return f"<LLMFeatureMappingChannel {self.mapping_id}:{self.channel_id}>"
@@ -0,0 +1,93 @@
+"""
+LLM调用用量模型
+"""
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Index
+
+from app.models.base_model import BaseDBModel
+
+class LLMUsageLog(BaseDBModel):
+    """LLM单次调用的token用量"""
+    __tablename__ = "llm_usage_logs"
+    __table_args__ = (
+        Index("idx_llm_usage_logs_user_created", "user_id", "created_at"),
+    )
+
+    user_id: int = Column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        comment="用户ID"
+    )
+
+    channel_id: int = Column(
+        Integer,
+        ForeignKey("llm_channels.id", ondelete="SET NULL"),
+        nullable=True,
+        comment="渠道ID"
+    )
+
+    feature_type: str = Column(
+        String(50),
+        nullable=True,
+        comment="功能类型"
+    )
+
+    provider: str = Column(
+        String(50),
+        nullable=False,
+        comment="提供者"
+    )
+
+    model: str = Column(
+        String(100),
+        nullable=True,
+        comment="模型"
+    )
+
+    prompt_tokens: int = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        comment="输入token数"
+    )
+
+    completion_tokens: int = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        comment="输出token数"
+    )
+
+    estimated: bool = Column(
+        Boolean,
+        nullable=False,
+        default=False,
+        comment="token数是否为本地计算（提供者未返回用量）"
+    )
+
+    cached: bool = Column(
+        Boolean,
+        nullable=False,
+        default=False,
+        comment="是否命中响应缓存（未调用模型，token数记为0）"
+    )
+
+    truncated: bool = Column(
+        Boolean,
+        nullable=False,
+        default=False,
+        comment="输入是否因超出预算被截断"
+    )
+
+    duration_ms: int = Column(
+        Integer,
+        nullable=True,
+        comment="调用耗时(毫秒)"
+    )
+
+    @property
+    def total_tokens(self) -> int:
+        return (self.prompt_tokens or 0) + (self.completion_tokens or 0)
+
+    def __repr__(self) -> str:
+        return f"<LLMUsageLog {self.provider}/{self.model} {self.prompt_tokens}+{self.completion_tokens}>"
@@ -15,6 +15,7 @@ class EmailAttachmentCreate(EmailAttachmentBase):
     """创建邮件附件模型"""
     email_id: int
     storage_path: str
+    sha256: Optional[str] = None
 
 class EmailAttachmentUpdate(EmailAttachmentBase):
     """更新邮件附件模型"""
@@ -25,6 +26,7 @@ class EmailAttachment(EmailAttachmentBase):
     id: int
     email_id: int
     storage_path: str
+    sha256: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
@@ -44,16 +46,17 @@ class EmailBase(BaseModel):
     date: datetime
     content_type: str
     content: Optional[str] = None
-    raw_content: Optional[str] = None
     has_attachments: bool = False
     size: int = 0
     is_read: bool = False
     is_flagged: bool = False
     is_deleted: bool = False
     folder: str = "INBOX"
+    uid: Optional[int] = None
     importance: int = 0
     in_reply_to: Optional[str] = None
     references: Optional[List[str]] = None
+    thread_id: Optional[int] = None
 
 class EmailCreate(EmailBase):
     """创建邮件模型"""
@@ -100,6 +103,34 @@ class EmailSyncLogUpdate(BaseModel):
     deleted_emails: Optional[int] = None
     error_message: Optional[str] = None
 
+class EmailThread(BaseModel):
+    """邮件会话返回模型"""
+    id: int
+    account_id: int
+    root_message_id: Optional[str] = None
+    subject: Optional[str] = None
+    participants: List[str] = []
+    message_count: int = 0
+    last_activity: datetime
+    last_email_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class EmailFolderStateCreate(BaseModel):
+    """创建文件夹同步状态模型"""
+    account_id: int
+    folder: str
+    uidvalidity: Optional[int] = None
+    last_uid: int = 0
+
+class EmailFolderStateUpdate(BaseModel):
+    """更新文件夹同步状态模型"""
+    uidvalidity: Optional[int] = None
+    last_uid: Optional[int] = None
+    highestmodseq: Optional[int] = None
+    last_sync_time: Optional[datetime] = None
+
 class EmailSyncLog(EmailSyncLogBase):
     """邮件同步日志返回模型"""
     id: int
@@ -1,7 +1,7 @@
 """
 邮箱账户相关的Schema
 """
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from pydantic import Field, field_validator, EmailStr
 from app.schemas.base import BaseSchema
@@ -35,6 +35,9 @@ class EmailAccountBase(BaseSchema):
     # 自定义配置
     sync_interval: int = Field(default=30, ge=1, le=1440, description="同步间隔(分钟)")
     keep_days: int = Field(default=30, ge=1, le=365, description="邮件保留天数")
+    use_idle: bool = Field(default=False, description="是否启用IMAP IDLE实时推送")
+    sync_folders: Optional[List[str]] = Field(None, description="同步的文件夹列表，为空时仅同步INBOX")
+    sync_concurrency: int = Field(default=3, ge=1, le=10, description="文件夹并行同步的最大连接数")
 
 class EmailAccountCreate(EmailAccountBase):
     """创建邮箱账户"""
@@ -59,6 +62,9 @@ class EmailAccountUpdate(BaseSchema):
     # 自定义配置
     sync_interval: Optional[int] = Field(None, ge=1, le=1440, description="同步间隔(分钟)")
     keep_days: Optional[int] = Field(None, ge=1, le=365, description="邮件保留天数")
+    use_idle: Optional[bool] = Field(None, description="是否启用IMAP IDLE实时推送")
+    sync_folders: Optional[List[str]] = Field(None, description="同步的文件夹列表，为空时仅同步INBOX")
+    sync_concurrency: Optional[int] = Field(None, ge=1, le=10, description="文件夹并行同步的最大连接数")
 
 class EmailAccountInDBBase(EmailAccountBase):
     """数据库中的邮箱账户基础信息"""
@@ -133,6 +139,9 @@ class EmailAccountResponse(EmailAccountInDBBase):
                 "last_email_time": None,
                 "sync_interval": 30,
                 "keep_days": 30,
+                "use_idle": False,
+                "sync_folders": ["INBOX", "Sent Messages"],
+                "sync_concurrency": 3,
                 "smtp_last_test_time": "2024-01-20T08:30:00Z",
                 "smtp_test_result": True,
                 "smtp_test_error": None,
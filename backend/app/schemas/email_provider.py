@@ -22,6 +22,8 @@ class EmailProviderBase(BaseSchema):
     help_url: Optional[str] = Field(None, max_length=500, description="帮助文档URL")
     auth_help_url: Optional[str] = Field(None, max_length=500, description="授权帮助URL")
     sort_order: int = Field(default=0, description="排序顺序")
+    imap_max_connections: Optional[int] = Field(None, gt=0, description="所有worker到IMAP服务器的最大连接数，为空不限制")
+    imap_fetch_per_minute: Optional[int] = Field(None, gt=0, description="所有worker每分钟从IMAP服务器获取的邮件数，为空不限制")
 
     @field_validator('domain_suffix')
     def validate_domain_suffix(cls, v: str) -> str:
@@ -50,6 +52,8 @@ class EmailProviderUpdate(BaseSchema):
     help_url: Optional[str] = Field(None, max_length=500, description="帮助文档URL")
     auth_help_url: Optional[str] = Field(None, max_length=500, description="授权帮助URL")
     sort_order: Optional[int] = Field(None, description="排序顺序")
+    imap_max_connections: Optional[int] = Field(None, gt=0, description="所有worker到IMAP服务器的最大连接数")
+    imap_fetch_per_minute: Optional[int] = Field(None, gt=0, description="所有worker每分钟从IMAP服务器获取的邮件数")
 
     @field_validator('domain_suffix')
     def validate_domain_suffix(cls, v: Optional[str]) -> Optional[str]:
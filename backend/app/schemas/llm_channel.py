@@ -12,6 +12,11 @@ class LLMChannelBase(BaseModel):
     model: str = Field(..., description="具体模型", max_length=50)
     api_key: str = Field(..., description="API密钥", max_length=500)
     proxy_url: Optional[str] = Field(None, description="代理地址(可选)", max_length=200)
+    connect_timeout: Optional[float] = Field(None, description="连接超时(秒)，为空使用默认值", gt=0)
+    request_timeout: Optional[float] = Field(None, description="单次调用超时(秒)，为空使用默认值", gt=0)
+    max_concurrency: Optional[int] = Field(None, description="最大并发请求数，为空不限制", gt=0)
+    requests_per_minute: Optional[int] = Field(None, description="每分钟请求数上限，为空不限制", gt=0)
+    tokens_per_minute: Optional[int] = Field(None, description="每分钟token数上限，为空不限制", gt=0)
 
 class LLMChannelCreate(LLMChannelBase):
     """创建LLM渠道时的Schema"""
@@ -24,6 +29,11 @@ class LLMChannelUpdate(BaseModel):
     model: Optional[str] = Field(None, description="具体模型", max_length=50)
     api_key: Optional[str] = Field(None, description="API密钥", max_length=500)
     proxy_url: Optional[str] = Field(None, description="代理地址", max_length=200)
+    connect_timeout: Optional[float] = Field(None, description="连接超时(秒)", gt=0)
+    request_timeout: Optional[float] = Field(None, description="单次调用超时(秒)", gt=0)
+    max_concurrency: Optional[int] = Field(None, description="最大并发请求数", gt=0)
+    requests_per_minute: Optional[int] = Field(None, description="每分钟请求数上限", gt=0)
+    tokens_per_minute: Optional[int] = Field(None, description="每分钟token数上限", gt=0)
 
 class LLMChannelPerformance(BaseModel):
     """渠道性能统计Schema"""
@@ -6,6 +6,7 @@ from datetime import datetime
 from pydantic import BaseModel, Field
 from app.schemas.base import BaseSchema
 from app.models.llm_feature import FeatureType
+from app.models.llm_feature_mapping import RoutingStrategy
 
 class LLMFeatureBase(BaseModel):
     """功能定义基础Schema"""
@@ -19,20 +20,36 @@ class LLMFeatureRead(LLMFeatureBase):
     class Config:
         from_attributes = True
 
+class LLMFeatureMappingChannelItem(BaseModel):
+    """渠道池成员Schema"""
+    channel_id: int = Field(..., description="渠道ID")
+    weight: int = Field(1, ge=1, description="权重，weighted/latency 策略下越大越优先")
+
+    class Config:
+        from_attributes = True
+
 class LLMFeatureMappingBase(BaseModel):
     """功能映射基础Schema"""
     channel_id: int = Field(..., description="渠道ID")
     feature_type: FeatureType = Field(..., description="功能类型")
     prompt_template: Optional[str] = Field(None, description="自定义提示词模板")
+    cache_enabled: bool = Field(False, description="是否缓存LLM响应，相同输入直接返回缓存结果")
+    max_input_tokens: Optional[int] = Field(None, gt=0, description="单次调用的输入token上限，为空使用默认值")
+    routing_strategy: RoutingStrategy = Field(RoutingStrategy.LATENCY, description="渠道池的路由策略")
 
 class LLMFeatureMappingCreate(LLMFeatureMappingBase):
     """功能映射创建Schema"""
-    pass
+    pool: Optional[List[LLMFeatureMappingChannelItem]] = Field(
+        None, description="渠道池（按优先顺序），为空只使用 channel_id，不为空时 channel_id 取第一个渠道"
+    )
 
 class LLMFeatureMappingUpdate(BaseModel):
     """功能映射更新Schema"""
     channel_id: Optional[int] = Field(None, description="渠道ID")
     prompt_template: Optional[str] = Field(None, description="自定义提示词模板")
+    cache_enabled: Optional[bool] = Field(None, description="是否缓存LLM响应")
+    max_input_tokens: Optional[int] = Field(None, gt=0, description="单次调用的输入token上限")
+    routing_strategy: Optional[RoutingStrategy] = Field(None, description="渠道池的路由策略")
 
 class LLMFeatureMappingRead(LLMFeatureMappingBase, BaseSchema):
     """功能映射读取Schema"""
@@ -40,6 +57,7 @@ class LLMFeatureMappingRead(LLMFeatureMappingBase, BaseSchema):
     user_id: int
     last_used_at: Optional[datetime] = None
     use_count: int = 0
+    pool: List[LLMFeatureMappingChannelItem] = []
     
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""
+内容寻址的二进制存储模块
+
+附件等二进制内容以 SHA-256 作为键存储，相同内容（跨邮件、跨用户）只保存一份。
+支持本地文件系统和 MinIO 两种后端，由 BLOB_STORE_BACKEND 配置选择。
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent.parent.parent
+
+# 流式读取的块大小
+CHUNK_SIZE = 64 * 1024
+
+
+def compute_key(data: bytes) -> str:
+    """计算内容的存储键（SHA-256 十六进制）"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore:
+    """内容寻址存储基类"""
+
+    def put(self, data: bytes) -> str:
+        """写入内容并返回存储键，内容已存在时不重复写入"""
+        key = compute_key(data)
+        if not self.exists(key):
+            self._write(key, data)
+        return key
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def size(self, key: str) -> int:
+        raise NotImplementedError
+
+    def iter_range(
+        self,
+        key: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        """按块读取 [start, end] 范围（含end）的内容，end为空时读到末尾"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def _write(self, key: str, data: bytes) -> None:
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    """本地文件系统存储，按键的前两级目录分散存放"""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key[2:4] / key
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def size(self, key: str) -> int:
+        return self._path(key).stat().st_size
+
+    def iter_range(
+        self,
+        key: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        with open(self._path(key), 'rb') as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, key: str) -> None:
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再原子替换，避免并发写入或中断留下不完整的文件
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+class MinioBlobStore(BlobStore):
+    """MinIO 对象存储"""
+
+    def __init__(self, bucket: str):
+        from app.core.minio import minio_client
+        self.client = minio_client
+        self.bucket = bucket
+        if not self.client.bucket_exists(bucket):
+            self.client.make_bucket(bucket)
+
+    def exists(self, key: str) -> bool:
+        from minio.error import S3Error
+        try:
+            self.client.stat_object(self.bucket, key)
+            return True
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject"):
+                return False
+            raise
+
+    def size(self, key: str) -> int:
+        return self.client.stat_object(self.bucket, key).size
+
+    def iter_range(
+        self,
+        key: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        length = 0 if end is None else end - start + 1
+        response = self.client.get_object(self.bucket, key, offset=start, length=length)
+        try:
+            yield from response.stream(chunk_size)
+        finally:
+            response.close()
+            response.release_conn()
+
+    def delete(self, key: str) -> None:
+        self.client.remove_object(self.bucket, key)
+
+    def _write(self, key: str, data: bytes) -> None:
+        import io
+        self.client.put_object(self.bucket, key, io.BytesIO(data), length=len(data))
+
+
+@lru_cache()
+def get_blob_store() -> BlobStore:
+    """获取配置的存储后端实例"""
+    if settings.BLOB_STORE_BACKEND == "minio":
+        return MinioBlobStore(settings.BLOB_STORE_MINIO_BUCKET)
+    root = Path(settings.BLOB_STORE_LOCAL_DIR)
+    if not root.is_absolute():
+        root = ROOT_DIR / root
+    return LocalBlobStore(root)
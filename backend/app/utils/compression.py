@@ -0,0 +1,39 @@
+"""
+数据压缩工具模块
+
+优先使用 zstd（需安装 zstandard），未安装时回退为标准库 gzip。
+压缩结果带有算法标识，解压时按标识选择算法，两种格式可以共存。
+"""
+import gzip
+from typing import Tuple
+
+from app.core.config import settings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 可选依赖
+    zstandard = None
+
+CODEC_ZSTD = "zstd"
+CODEC_GZIP = "gzip"
+CODEC_NONE = "none"
+
+
+def compress(data: bytes) -> Tuple[str, bytes]:
+    """压缩数据，返回 (算法标识, 压缩后数据)"""
+    if settings.EMAIL_RAW_COMPRESSION == CODEC_ZSTD and zstandard is not None:
+        return CODEC_ZSTD, zstandard.ZstdCompressor(level=settings.EMAIL_RAW_COMPRESSION_LEVEL).compress(data)
+    if settings.EMAIL_RAW_COMPRESSION == CODEC_NONE:
+        return CODEC_NONE, data
+    return CODEC_GZIP, gzip.compress(data, compresslevel=min(settings.EMAIL_RAW_COMPRESSION_LEVEL, 9))
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    """按算法标识解压数据"""
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("解压zstd数据需要安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == CODEC_GZIP:
+        return gzip.decompress(data)
+    return data
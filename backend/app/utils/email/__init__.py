@@ -6,10 +6,16 @@ from app.utils.email.parser import (
     parse_email_address,
     get_email_body,
     get_attachment_info,
+    extract_attachment,
     parse_email_date,
-    parse_email_addresses
+    parse_email_addresses,
+    parse_message,
+    parse_thread_headers,
+    ParsedMessage
 )
+from app.utils.email.normalizer import html_to_text, normalize_for_llm, get_llm_text
 from app.utils.email.imap_client import IMAPClient, test_imap_connection
+from app.utils.email.aioimap_client import AsyncIMAPClient
 from app.utils.email.smtp_client import (
     SMTPClient,
     send_verification_email,
@@ -21,13 +27,21 @@ from app.utils.email.smtp_client import (
 __all__ = [
     # IMAP相关
     "IMAPClient",
+    "AsyncIMAPClient",
     "test_imap_connection",
     "decode_mime_words",
     "parse_email_address",
     "get_email_body",
     "get_attachment_info",
+    "extract_attachment",
     "parse_email_date",
     "parse_email_addresses",
+    "parse_message",
+    "parse_thread_headers",
+    "ParsedMessage",
+    "html_to_text",
+    "normalize_for_llm",
+    "get_llm_text",
     
     # SMTP相关
     "SMTPClient",
@@ -0,0 +1,547 @@
+"""
+异步IMAP客户端模块
+
+基于 asyncio 流实现的 IMAP4rev1 子集，接口与 IMAPClient 保持一致（方法均为协程）。
+"""
+import asyncio
+import email
+import re
+import ssl
+import time
+from datetime import datetime
+from typing import List, Tuple, Optional, Dict, Any, Set, Union
+import logging
+
+from app.core.config import settings
+from app.utils.email.connection_limiter import IMAPBudget, imap_budget_limiter, imap_connection_limiter
+
+logger = logging.getLogger(__name__)
+
+_LITERAL_RE = re.compile(rb'\{(\d+)\}\r\n$')
+_TAGGED_RE = re.compile(rb'^(A\d+) (OK|NO|BAD)\s?(.*)$', re.DOTALL)
+_FETCH_UID_RE = re.compile(rb'\bUID (\d+)')
+_FETCH_FLAGS_RE = re.compile(rb'\bFLAGS \(([^)]*)\)')
+_LIST_RE = re.compile(rb'^\* LIST \(([^)]*)\) (NIL|"(?:[^"\\]|\\.)*") (.*)$')
+_STATUS_CODE_RE = re.compile(rb'\[(UIDVALIDITY|UIDNEXT|HIGHESTMODSEQ) (\d+)\]')
+_VANISHED_RE = re.compile(rb'^\* VANISHED (?:\(EARLIER\) )?([\d:,]+)')
+# 服务器限流响应（NO/BYE 的响应码或文本）
+_THROTTLE_RE = re.compile(
+    r'\[(?:LIMIT|UNAVAILABLE|INUSE|OVERQUOTA)\]|throttl|too many|rate limit|limit exceeded|try again later'
+    r'|too fast|频繁|过多|稍后',
+    re.IGNORECASE
+)
+
+# 单个IMAP响应：(去掉字面量后的文本, 字面量列表)
+IMAPResponse = Tuple[bytes, List[bytes]]
+
+
+class _Literal:
+    """需要以字面量形式发送的参数"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+def _quote(value: str) -> Union[bytes, _Literal]:
+    """将字符串参数编码为带引号字符串，非ASCII内容使用字面量"""
+    if value.isascii() and '\r' not in value and '\n' not in value:
+        return b'"' + value.replace('\\', '\\\\').replace('"', '\\"').encode() + b'"'
+    return _Literal(value.encode('utf-8'))
+
+
+class IMAPThrottledError(ConnectionError):
+    """服务器返回限流响应"""
+
+
+def _parse_uid_set(value: bytes) -> List[int]:
+    """展开IMAP序列集合，如 b'1:3,7' -> [1, 2, 3, 7]"""
+    uids: List[int] = []
+    for part in value.split(b','):
+        if b':' in part:
+            start, end = sorted(int(item) for item in part.split(b':'))
+            uids.extend(range(start, end + 1))
+        elif part:
+            uids.append(int(part))
+    return uids
+
+
+def _unquote(value: bytes) -> str:
+    if value.startswith(b'"') and value.endswith(b'"'):
+        value = value[1:-1].replace(b'\\"', b'"').replace(b'\\\\', b'\\')
+    return value.decode('utf-8', errors='replace')
+
+
+class AsyncIMAPClient:
+    """异步IMAP客户端类"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        use_ssl: bool = True,
+        timeout: float = settings.IMAP_TIMEOUT,
+        use_limiter: bool = True,
+        budget: Optional[IMAPBudget] = None
+    ):
+        """
+        Args:
+            use_limiter: 是否受进程内连接数上限约束
+            budget: 提供商预算（所有worker共享的连接数和获取速率），为空时不限制
+        """
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.use_limiter = use_limiter
+        self.budget = budget or IMAPBudget()
+        self.capabilities: List[str] = []
+        self.enabled: Set[str] = set()
+        self.selected: Dict[str, Any] = {}
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+        self._tag_counter = 0
+        self._slot_acquired = False
+        self._lease: Optional[str] = None
+        self._lease_refreshed = 0.0
+        self._logging_out = False
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    async def test_connection(self, username: str, password: str) -> Dict[str, Any]:
+        """测试连接"""
+        from app.utils.email.imap_client import test_imap_connection
+        return await test_imap_connection(
+            host=self.host,
+            port=self.port,
+            username=username,
+            password=password,
+            use_ssl=self.use_ssl
+        )
+
+    async def connect(self, username: str, password: str) -> None:
+        """连接IMAP服务器"""
+        if self.use_limiter:
+            await imap_connection_limiter.acquire(self.host)
+            self._slot_acquired = True
+        try:
+            self._lease = await imap_budget_limiter.acquire_connection(self.host, self.budget)
+            self._lease_refreshed = time.monotonic()
+            ssl_context = ssl.create_default_context() if self.use_ssl else None
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(
+                    self.host,
+                    self.port,
+                    ssl=ssl_context,
+                    limit=settings.IMAP_READ_LIMIT
+                ),
+                timeout=self.timeout
+            )
+            greeting, _ = await self._read_response()
+            if greeting.startswith(b'* BYE'):
+                # 服务器在问候阶段拒绝连接，通常是连接数过多
+                await self._on_throttled(greeting, force=True)
+            if not greeting.startswith((b'* OK', b'* PREAUTH')):
+                raise ConnectionError(greeting.decode(errors='replace'))
+
+            await self._command(b'LOGIN', _quote(username), _quote(password))
+            untagged, _ = await self._command(b'CAPABILITY')
+            for line, _ in untagged:
+                if line.startswith(b'* CAPABILITY'):
+                    self.capabilities = line.decode().split()[2:]
+        except IMAPThrottledError:
+            await self._close()
+            raise
+        except Exception as e:
+            await self._close()
+            raise ConnectionError(f"连接IMAP服务器失败: {str(e)}")
+
+    async def disconnect(self) -> None:
+        """断开IMAP连接"""
+        if self._writer:
+            self._logging_out = True
+            try:
+                await asyncio.wait_for(self._command(b'LOGOUT'), timeout=5)
+            except Exception:
+                pass
+        await self._close()
+
+    async def _close(self) -> None:
+        if self._writer:
+            try:
+                self._writer.close()
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+        self._reader = None
+        self._writer = None
+        self.selected = {}
+        self.enabled = set()
+        self._logging_out = False
+        if self._lease:
+            lease, self._lease = self._lease, None
+            await imap_budget_limiter.release_connection(self.host, lease)
+        if self._slot_acquired:
+            self._slot_acquired = False
+            imap_connection_limiter.release(self.host)
+
+    def has_capability(self, name: str) -> bool:
+        """服务器是否支持指定能力"""
+        return name.upper() in (c.upper() for c in self.capabilities)
+
+    async def enable(self, *extensions: str) -> Set[str]:
+        """启用服务器扩展（RFC 5161），返回实际启用的扩展"""
+        if not self.connected:
+            raise ConnectionError("未连接到IMAP服务器")
+        untagged, _ = await self._command(b'ENABLE', *(name.encode() for name in extensions))
+        for line, _ in untagged:
+            if line.startswith(b'* ENABLED'):
+                self.enabled.update(name.upper() for name in line.decode().split()[2:])
+        return self.enabled
+
+    async def select_folder(self, folder: str = "INBOX", condstore: bool = False) -> int:
+        """选择邮件文件夹
+
+        Args:
+            folder: 文件夹名称
+            condstore: 服务器支持CONDSTORE时请求返回 HIGHESTMODSEQ（已启用QRESYNC时无需指定）
+        """
+        if not self.connected:
+            raise ConnectionError("未连接到IMAP服务器")
+        try:
+            args = [b'SELECT', _quote(folder)]
+            if condstore and self.has_capability("CONDSTORE") and "QRESYNC" not in self.enabled:
+                args.append(b'(CONDSTORE)')
+            untagged, text = await self._command(*args)
+            selected: Dict[str, Any] = {"folder": folder, "exists": 0}
+            for line, _ in untagged + [(text, [])]:
+                if line.endswith(b' EXISTS'):
+                    selected["exists"] = int(line.split()[1])
+                if b'[NOMODSEQ]' in line:
+                    selected["nomodseq"] = True
+                for key, value in _STATUS_CODE_RE.findall(line):
+                    selected[key.decode().lower()] = int(value)
+            self.selected = selected
+            return selected["exists"]
+        except Exception as e:
+            raise ValueError(f"选择文件夹失败: {str(e)}")
+
+    async def list_folders(self) -> List[str]:
+        """获取文件夹列表"""
+        if not self.connected:
+            raise ConnectionError("未连接到IMAP服务器")
+        untagged, _ = await self._command(b'LIST', b'""', b'"*"')
+        folders = []
+        for line, literals in untagged:
+            match = _LIST_RE.match(line)
+            if not match:
+                continue
+            if b'\\Noselect' in match.group(1):
+                continue
+            name = match.group(3)
+            folders.append(literals[0].decode('utf-8', errors='replace') if literals and not name else _unquote(name))
+        return folders
+
+    async def search_emails(self, criteria: List[str] = None) -> List[bytes]:
+        """搜索邮件，返回UID列表"""
+        if not self.connected:
+            raise ConnectionError("未连接到IMAP服务器")
+        try:
+            if not criteria:
+                criteria = ['ALL']
+            untagged, _ = await self._command(b'UID', b'SEARCH', *(c.encode() for c in criteria))
+            uids: List[bytes] = []
+            for line, _ in untagged:
+                if line.startswith(b'* SEARCH'):
+                    uids.extend(line.split()[2:])
+            return uids
+        except Exception as e:
+            raise ValueError(f"搜索邮件失败: {str(e)}")
+
+    async def search_new_uids(self, last_uid: int = 0) -> List[int]:
+        """搜索当前文件夹中UID大于 last_uid 的邮件，返回升序UID列表"""
+        criteria = ['UID', f'{last_uid + 1}:*'] if last_uid else ['ALL']
+        uids = await self.search_emails(criteria)
+        # "n:*" 在没有新邮件时也会返回当前最大UID，需要过滤
+        return sorted(uid for uid in map(int, uids) if uid > last_uid)
+
+    async def fetch_flags(
+        self,
+        uid_set: str,
+        changed_since: Optional[int] = None,
+        vanished: bool = False
+    ) -> Tuple[Dict[int, List[str]], List[int]]:
+        """获取邮件标志
+
+        Args:
+            uid_set: UID序列集合，如 "1:500"
+            changed_since: 只返回MODSEQ大于该值的邮件（CONDSTORE）
+            vanished: 同时返回该范围内已删除的UID（需已启用QRESYNC）
+
+        Returns:
+            Tuple[Dict[int, List[str]], List[int]]: ({UID: 标志列表}, 已删除的UID列表)
+        """
+        if not self.connected:
+            raise ConnectionError("未连接到IMAP服务器")
+        args = [b'UID', b'FETCH', uid_set.encode(), b'(UID FLAGS)']
+        if changed_since is not None:
+            modifiers = b'CHANGEDSINCE %d' % changed_since
+            if vanished:
+                modifiers += b' VANISHED'
+            args.append(b'(' + modifiers + b')')
+        untagged, _ = await self._command(*args)
+
+        flags: Dict[int, List[str]] = {}
+        vanished_uids: List[int] = []
+        for line, _ in untagged:
+            match = _VANISHED_RE.match(line)
+            if match:
+                vanished_uids.extend(_parse_uid_set(match.group(1)))
+                continue
+            if b' FETCH (' not in line:
+                continue
+            uid_match = _FETCH_UID_RE.search(line)
+            flags_match = _FETCH_FLAGS_RE.search(line)
+            if uid_match and flags_match:
+                flags[int(uid_match.group(1))] = flags_match.group(1).decode().split()
+        return flags, vanished_uids
+
+    async def fetch_raw_messages(self, uids: List[bytes]) -> List[Tuple[int, List[str], bytes]]:
+        """批量获取邮件原文
+
+        UID按 IMAP_FETCH_BATCH_SIZE 分组，最多同时发出 IMAP_PIPELINE_DEPTH 条 UID FETCH 命令。
+        使用 BODY.PEEK[] 获取，不会改变服务器上的已读状态。
+        任一分组返回 NO/BAD 时不再发出新命令，读完已发出命令的响应后抛出异常，由调用方从检查点重试。
+
+        Returns:
+            List[Tuple[int, List[str], bytes]]: 按UID升序排列的 (UID, 标志列表, 邮件原文)
+        """
+        if not self.connected:
+            raise ConnectionError("未连接到IMAP服务器")
+        batch_size = settings.IMAP_FETCH_BATCH_SIZE
+        chunks = [uids[i:i + batch_size] for i in range(0, len(uids), batch_size)]
+        messages: Dict[int, Tuple[int, List[str], bytes]] = {}
+
+        failure: Optional[bytes] = None
+        async with self._lock:
+            pending: Dict[bytes, List[bytes]] = {}
+            next_chunk = 0
+            while (failure is None and next_chunk < len(chunks)) or pending:
+                while failure is None and next_chunk < len(chunks) and len(pending) < settings.IMAP_PIPELINE_DEPTH:
+                    await imap_budget_limiter.acquire_fetch(self.host, self.budget, len(chunks[next_chunk]))
+                    tag = await self._send(b'UID', b'FETCH', b','.join(chunks[next_chunk]), b'(UID FLAGS BODY.PEEK[])')
+                    pending[tag] = chunks[next_chunk]
+                    next_chunk += 1
+
+                untagged: List[IMAPResponse] = []
+                tag, status, text = await self._read_until_tagged(untagged)
+                for line, literals in untagged:
+                    parsed = self._parse_fetch(line, literals)
+                    if parsed:
+                        messages[parsed[0]] = parsed
+                chunk = pending.pop(tag, None)
+                if status != b'OK' and chunk is not None:
+                    logger.error(f"获取邮件失败: {b','.join(chunk).decode()} {text.decode(errors='replace')}")
+                    failure = failure or text
+
+        if failure is not None:
+            # 丢弃整组结果，避免检查点越过未获取的邮件
+            await self._on_throttled(failure)
+            raise ValueError(f"获取邮件失败: {failure.decode(errors='replace')[:200]}")
+        return [messages[uid] for uid in sorted(messages)]
+
+    async def fetch_email(self, num: bytes) -> Tuple[bytes, email.message.Message]:
+        """获取单封邮件"""
+        try:
+            messages = await self.fetch_raw_messages([num])
+            if not messages:
+                raise ValueError(f"邮件不存在: {num.decode()}")
+            email_body = messages[0][2]
+            return email_body, email.message_from_bytes(email_body)
+        except Exception as e:
+            raise ValueError(f"获取邮件失败: {str(e)}")
+
+    async def get_emails_since(self, since_date: Optional[datetime] = None) -> List[Tuple[bytes, email.message.Message]]:
+        """获取指定日期之后的所有邮件"""
+        try:
+            criteria = ['ALL']
+            if since_date:
+                date_str = since_date.strftime("%d-%b-%Y")
+                criteria = ['SINCE', date_str]
+
+            uids = await self.search_emails(criteria)
+            messages = await self.fetch_raw_messages(uids)
+            return [(body, email.message_from_bytes(body)) for _, _, body in messages]
+
+        except Exception as e:
+            raise ValueError(f"获取邮件列表失败: {str(e)}")
+
+    async def idle(self, timeout: float) -> List[bytes]:
+        """进入IDLE等待服务器推送，收到首个通知或超时后退出IDLE
+
+        Args:
+            timeout: 最长等待时间（秒），RFC 2177 建议不超过29分钟
+
+        Returns:
+            List[bytes]: IDLE期间收到的未标记响应，如 b'* 5 EXISTS'
+        """
+        if not self.connected:
+            raise ConnectionError("未连接到IMAP服务器")
+        if not self.has_capability("IDLE"):
+            raise ValueError("服务器不支持IDLE")
+
+        notifications: List[bytes] = []
+        async with self._lock:
+            tag = await self._send(b'IDLE')
+            while True:
+                line, _ = await self._read_response()
+                if line.startswith(b'+'):
+                    break
+                if not line.startswith(b'* '):
+                    raise ValueError(f"IDLE失败: {line.decode(errors='replace')}")
+                notifications.append(line)
+
+            # 持有提供商连接名额时分段等待，每段之间为名额续期，避免长时间IDLE期间租约过期
+            deadline = time.monotonic() + timeout
+            while not notifications:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if self._lease:
+                    remaining = min(remaining, settings.IMAP_BUDGET_LEASE_TTL / 3)
+                try:
+                    line, _ = await self._read_response(timeout=remaining)
+                    notifications.append(line)
+                except asyncio.TimeoutError:
+                    await self._refresh_lease()
+
+            self._writer.write(b'DONE\r\n')
+            await self._writer.drain()
+            untagged: List[IMAPResponse] = []
+            while True:
+                done_tag, _, _ = await self._read_until_tagged(untagged)
+                if done_tag == tag:
+                    break
+            notifications.extend(line for line, _ in untagged)
+        return notifications
+
+    async def _on_throttled(self, text: bytes, force: bool = False) -> None:
+        """响应为限流时收缩该服务器的预算并抛出 IMAPThrottledError"""
+        message = text.decode(errors='replace')
+        if not force and not _THROTTLE_RE.search(message):
+            return
+        if self.use_limiter:
+            await imap_budget_limiter.penalize(self.host)
+        raise IMAPThrottledError(f"IMAP服务器限流: {message[:200]}")
+
+    @staticmethod
+    def _parse_fetch(line: bytes, literals: List[bytes]) -> Optional[Tuple[int, List[str], bytes]]:
+        """解析 FETCH 响应为 (UID, 标志列表, 邮件原文)"""
+        if b' FETCH (' not in line or not literals:
+            return None
+        uid_match = _FETCH_UID_RE.search(line)
+        if not uid_match:
+            return None
+        flags_match = _FETCH_FLAGS_RE.search(line)
+        flags = flags_match.group(1).decode().split() if flags_match else []
+        return int(uid_match.group(1)), flags, literals[0]
+
+    # ---- 协议层 ----
+
+    async def _refresh_lease(self) -> None:
+        """距上次续期超过租约有效期的1/3时为提供商连接名额续期"""
+        if self._lease and time.monotonic() - self._lease_refreshed > settings.IMAP_BUDGET_LEASE_TTL / 3:
+            self._lease_refreshed = time.monotonic()
+            await imap_budget_limiter.refresh_connection(self.host, self._lease)
+
+    def _next_tag(self) -> bytes:
+        self._tag_counter += 1
+        return b'A%04d' % self._tag_counter
+
+    async def _command(self, *args: Union[bytes, _Literal]) -> Tuple[List[IMAPResponse], bytes]:
+        """发送命令并等待完成，返回(未标记响应列表, 完成响应文本)"""
+        if not self.connected:
+            raise ConnectionError("未连接到IMAP服务器")
+        async with self._lock:
+            tag = await self._send(*args)
+            untagged: List[IMAPResponse] = []
+            while True:
+                done_tag, status, text = await self._read_until_tagged(untagged)
+                if done_tag == tag:
+                    break
+        if status != b'OK':
+            await self._on_throttled(text)
+            raise ValueError(f"{args[0].decode()} {status.decode()}: {text.decode(errors='replace')}")
+        return untagged, text
+
+    async def _send(self, *args: Union[bytes, _Literal]) -> bytes:
+        """发送一条命令，返回命令标签"""
+        await self._refresh_lease()
+        tag = self._next_tag()
+        buffer = tag
+        for arg in args:
+            if isinstance(arg, _Literal):
+                self._writer.write(buffer + b' {%d}\r\n' % len(arg.data))
+                await self._writer.drain()
+                line = await self._readline()
+                if not line.startswith(b'+'):
+                    raise ValueError(f"服务器拒绝字面量: {line.decode(errors='replace')}")
+                buffer = arg.data
+            else:
+                buffer += b' ' + arg
+        self._writer.write(buffer + b'\r\n')
+        await self._writer.drain()
+        return tag
+
+    async def _read_until_tagged(self, untagged: List[IMAPResponse]) -> Tuple[bytes, bytes, bytes]:
+        """读取响应直到遇到标记响应，未标记响应追加到 untagged"""
+        while True:
+            line, literals = await self._read_response()
+            if line.startswith(b'* '):
+                if line.startswith(b'* BYE') and not self._logging_out:
+                    await self._on_throttled(line)
+                untagged.append((line, literals))
+                continue
+            if line.startswith(b'+'):
+                continue
+            match = _TAGGED_RE.match(line)
+            if match:
+                return match.group(1), match.group(2), match.group(3)
+            logger.warning(f"无法识别的IMAP响应: {line[:200]!r}")
+
+    async def _read_response(self, timeout: Optional[float] = None) -> IMAPResponse:
+        """读取一条完整响应，字面量以流式方式按长度读取"""
+        parts: List[bytes] = []
+        literals: List[bytes] = []
+        while True:
+            line = await self._readline(timeout)
+            match = _LITERAL_RE.search(line)
+            if match:
+                parts.append(line[:match.start()])
+                literals.append(await self._readexactly(int(match.group(1))))
+                timeout = None
+                continue
+            parts.append(line.rstrip(b'\r\n'))
+            return b''.join(parts), literals
+
+    async def _readline(self, timeout: Optional[float] = None) -> bytes:
+        if not self._reader:
+            raise ConnectionError("未连接到IMAP服务器")
+        line = await asyncio.wait_for(
+            self._reader.readline(),
+            timeout=self.timeout if timeout is None else timeout
+        )
+        if not line:
+            raise ConnectionError("IMAP服务器已断开连接")
+        return line
+
+    async def _readexactly(self, size: int) -> bytes:
+        return await asyncio.wait_for(self._reader.readexactly(size), timeout=self.timeout)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.disconnect()
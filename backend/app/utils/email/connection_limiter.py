@@ -0,0 +1,333 @@
+"""
+IMAP连接数限制模块
+
+- IMAPConnectionLimiter：进程内的全局连接数和每个服务器的连接数上限
+- IMAPBudgetLimiter：按提供商配置、所有worker共享的连接数和邮件获取速率预算，服务器返回限流响应时自适应收缩
+"""
+import asyncio
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.redis import get_redis, report_redis_error
+
+logger = logging.getLogger(__name__)
+
+
+class IMAPConnectionLimiter:
+    """IMAP连接数限制器
+
+    同时限制进程内的全局连接数和每个服务器的连接数。
+    调度器为每个任务创建独立的事件循环，因此计数使用线程锁保护，
+    等待者通过 call_soon_threadsafe 在各自的事件循环中被唤醒。
+    """
+
+    def __init__(self, max_connections: int, max_connections_per_host: int):
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self._lock = threading.Lock()
+        self._total = 0
+        self._per_host: Dict[str, int] = defaultdict(int)
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def _can_acquire(self, host: str) -> bool:
+        return (
+            self._total < self.max_connections
+            and self._per_host[host] < self.max_connections_per_host
+        )
+
+    async def acquire(self, host: str) -> None:
+        """获取一个连接名额，名额不足时等待"""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._can_acquire(host):
+                    self._total += 1
+                    self._per_host[host] += 1
+                    return
+                waiter = (loop, loop.create_future())
+                self._waiters.append(waiter)
+            try:
+                await waiter[1]
+            finally:
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+
+    def release(self, host: str) -> None:
+        """释放连接名额并唤醒等待者重新竞争"""
+        with self._lock:
+            self._total = max(self._total - 1, 0)
+            self._per_host[host] = max(self._per_host[host] - 1, 0)
+            if not self._per_host[host]:
+                del self._per_host[host]
+            waiters, self._waiters = self._waiters, []
+
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake_waiter, future)
+            except RuntimeError:
+                # 等待者所在的事件循环已关闭
+                continue
+
+    @asynccontextmanager
+    async def limit(self, host: str):
+        """以上下文管理器方式占用连接名额"""
+        await self.acquire(host)
+        try:
+            yield
+        finally:
+            self.release(host)
+
+    def stats(self) -> Dict[str, int]:
+        """当前连接占用情况"""
+        with self._lock:
+            return {"total": self._total, **self._per_host}
+
+
+def _wake_waiter(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+@dataclass(frozen=True)
+class IMAPBudget:
+    """提供商的IMAP预算，None 表示不限制"""
+    max_connections: Optional[int] = None  # 所有worker到该服务器的最大连接数
+    fetch_per_minute: Optional[int] = None  # 所有worker每分钟从该服务器获取的邮件数
+
+    @classmethod
+    def from_provider(cls, provider: Any) -> "IMAPBudget":
+        """从 EmailProvider 记录构造预算，未匹配到提供商时不限制"""
+        if provider is None:
+            return cls()
+        return cls(
+            max_connections=provider.imap_max_connections or None,
+            fetch_per_minute=provider.imap_fetch_per_minute or None
+        )
+
+
+# 限流系数：收缩后按 2^(经过秒数/恢复周期) 倍恢复，最大为1
+_THROTTLE_FACTOR_LUA = """
+local function throttle_factor(key, now, recovery)
+    local state = redis.call('HMGET', key, 'factor', 'ts')
+    if not state[1] then
+        return 1
+    end
+    return math.min(1, tonumber(state[1]) * 2 ^ ((now - tonumber(state[2])) / recovery))
+end
+"""
+
+# KEYS: 租约集合, 限流状态  ARGV: 当前时间, 租约有效期, 连接上限, 租约ID, 恢复周期
+_ACQUIRE_LUA = _THROTTLE_FACTOR_LUA + """
+local now = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+local limit = math.max(1, math.floor(tonumber(ARGV[3]) * throttle_factor(KEYS[2], now, tonumber(ARGV[5]))))
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) < limit then
+    redis.call('ZADD', KEYS[1], now + ttl, ARGV[4])
+    redis.call('EXPIRE', KEYS[1], ttl)
+    return 1
+end
+return 0
+"""
+
+# KEYS: 令牌桶, 限流状态  ARGV: 当前时间, 每分钟邮件数, 申请数量, 恢复周期
+# 令牌不足时先预支，返回需要等待的秒数，使等待者按申请顺序依次获得令牌
+_FETCH_LUA = _THROTTLE_FACTOR_LUA + """
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2]) * throttle_factor(KEYS[2], now, tonumber(ARGV[4])) / 60
+local capacity = tonumber(ARGV[2]) / 6
+local requested = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate) - requested
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 600)
+if tokens >= 0 then
+    return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+# KEYS: 限流状态  ARGV: 当前时间, 最小比例, 恢复周期
+_PENALIZE_LUA = _THROTTLE_FACTOR_LUA + """
+local now = tonumber(ARGV[1])
+local factor = math.max(tonumber(ARGV[2]), throttle_factor(KEYS[1], now, tonumber(ARGV[3])) / 2)
+redis.call('HSET', KEYS[1], 'factor', factor, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[3]) * 10))
+return tostring(factor)
+"""
+
+
+class IMAPBudgetLimiter:
+    """按提供商预算限制所有worker的IMAP连接数和邮件获取速率
+
+    状态保存在Redis中（连接名额为带过期时间的租约，速率为令牌桶），Redis不可用时回退到进程内状态。
+    服务器返回限流响应时调用 penalize，该服务器的连接数和速率预算减半（不低于 IMAP_THROTTLE_MIN_FACTOR），
+    之后每经过 IMAP_THROTTLE_RECOVERY_SECONDS 秒恢复一倍，直到恢复配置值。
+    """
+
+    KEY_PREFIX = "imap:budget"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scripts: Dict[str, Any] = {}
+        self._scripts_client = None
+        self._leases: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._throttle: Dict[str, Tuple[float, float]] = {}
+
+    def _key(self, kind: str, host: str) -> str:
+        return f"{self.KEY_PREFIX}:{kind}:{host}"
+
+    def _script(self, client, name: str, source: str):
+        with self._lock:
+            if self._scripts_client is not client:
+                self._scripts = {}
+                self._scripts_client = client
+            if name not in self._scripts:
+                self._scripts[name] = client.register_script(source)
+            return self._scripts[name]
+
+    async def _run_script(self, name: str, source: str, keys: List[str], args: List[Any]) -> Optional[Any]:
+        """执行Lua脚本，Redis不可用时返回None"""
+        client = get_redis()
+        if client is None:
+            return None
+        try:
+            return await asyncio.to_thread(self._script(client, name, source), keys=keys, args=args)
+        except Exception as e:
+            report_redis_error(e)
+            return None
+
+    # ---- 限流系数 ----
+
+    def _local_factor(self, host: str, now: float) -> float:
+        state = self._throttle.get(host)
+        if state is None:
+            return 1.0
+        factor, ts = state
+        return min(1.0, factor * 2 ** ((now - ts) / settings.IMAP_THROTTLE_RECOVERY_SECONDS))
+
+    async def penalize(self, host: str) -> float:
+        """服务器返回限流响应后收缩该服务器的预算，返回收缩后的比例"""
+        now = time.time()
+        result = await self._run_script(
+            "penalize", _PENALIZE_LUA,
+            [self._key("throttle", host)],
+            [now, settings.IMAP_THROTTLE_MIN_FACTOR, settings.IMAP_THROTTLE_RECOVERY_SECONDS]
+        )
+        if result is not None:
+            factor = float(result)
+        else:
+            with self._lock:
+                factor = max(settings.IMAP_THROTTLE_MIN_FACTOR, self._local_factor(host, now) / 2)
+                self._throttle[host] = (factor, now)
+        logger.warning(f"IMAP服务器 {host} 返回限流响应，预算收缩为 {factor:.0%}")
+        return factor
+
+    # ---- 连接名额 ----
+
+    async def acquire_connection(self, host: str, budget: IMAPBudget) -> Optional[str]:
+        """获取一个连接名额，名额不足时等待；未配置连接数预算时返回None
+
+        Returns:
+            Optional[str]: 租约ID，连接期间需定期调用 refresh_connection 续期，断开时调用 release_connection
+        """
+        if not budget.max_connections:
+            return None
+        token = uuid.uuid4().hex
+        while True:
+            now = time.time()
+            acquired = await self._run_script(
+                "acquire", _ACQUIRE_LUA,
+                [self._key("conn", host), self._key("throttle", host)],
+                [now, settings.IMAP_BUDGET_LEASE_TTL, budget.max_connections, token,
+                 settings.IMAP_THROTTLE_RECOVERY_SECONDS]
+            )
+            if acquired is None:
+                with self._lock:
+                    leases = self._leases[host]
+                    for expired in [key for key, expires in leases.items() if expires <= now]:
+                        del leases[expired]
+                    limit = max(1, math.floor(budget.max_connections * self._local_factor(host, now)))
+                    acquired = len(leases) < limit
+                    if acquired:
+                        leases[token] = now + settings.IMAP_BUDGET_LEASE_TTL
+            if acquired:
+                return token
+            # 加入随机抖动，避免多个等待者同时重试
+            await asyncio.sleep(settings.IMAP_BUDGET_POLL_INTERVAL * (0.5 + random.random()))
+
+    async def refresh_connection(self, host: str, token: str) -> None:
+        """为仍在使用的连接名额续期"""
+        expires = time.time() + settings.IMAP_BUDGET_LEASE_TTL
+        client = get_redis()
+        if client is not None:
+            try:
+                await asyncio.to_thread(client.zadd, self._key("conn", host), {token: expires}, xx=True)
+                return
+            except Exception as e:
+                report_redis_error(e)
+        with self._lock:
+            if token in self._leases[host]:
+                self._leases[host][token] = expires
+
+    async def release_connection(self, host: str, token: str) -> None:
+        """释放连接名额"""
+        client = get_redis()
+        if client is not None:
+            try:
+                await asyncio.to_thread(client.zrem, self._key("conn", host), token)
+            except Exception as e:
+                report_redis_error(e)
+        with self._lock:
+            self._leases[host].pop(token, None)
+            if not self._leases[host]:
+                del self._leases[host]
+
+    # ---- 获取速率 ----
+
+    async def acquire_fetch(self, host: str, budget: IMAPBudget, count: int) -> float:
+        """获取 count 封邮件的速率配额，配额不足时等待，返回等待的秒数"""
+        if not budget.fetch_per_minute or count <= 0:
+            return 0.0
+        now = time.time()
+        result = await self._run_script(
+            "fetch", _FETCH_LUA,
+            [self._key("rate", host), self._key("throttle", host)],
+            [now, budget.fetch_per_minute, count, settings.IMAP_THROTTLE_RECOVERY_SECONDS]
+        )
+        if result is not None:
+            wait = float(result)
+        else:
+            with self._lock:
+                rate = budget.fetch_per_minute * self._local_factor(host, now) / 60
+                capacity = budget.fetch_per_minute / 6
+                tokens, ts = self._buckets.get(host, (capacity, now))
+                tokens = min(capacity, tokens + max(0.0, now - ts) * rate) - count
+                self._buckets[host] = (tokens, now)
+                wait = -tokens / rate if tokens < 0 else 0.0
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+# 全局IMAP连接限制器实例
+imap_connection_limiter = IMAPConnectionLimiter(
+    max_connections=settings.IMAP_MAX_CONNECTIONS,
+    max_connections_per_host=settings.IMAP_MAX_CONNECTIONS_PER_HOST
+)
+
+# 全局IMAP提供商预算限制器实例
+imap_budget_limiter = IMAPBudgetLimiter()
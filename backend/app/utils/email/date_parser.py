@@ -0,0 +1,177 @@
+"""
+邮件日期解析模块
+
+邮件日期格式五花八门，依次尝试多种解析方式的代价主要花在失败的尝试和异常处理上。
+DateParser 按日期字符串的格式特征（数字、字母归一后的形状）记住上次成功的解析策略，
+同一格式的后续日期直接使用该策略；标准 RFC 2822 格式使用预编译正则的快速路径。
+"""
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Callable, List, Optional, Tuple
+
+from dateutil import parser
+
+_MONTHS = {
+    name: index + 1
+    for index, name in enumerate(
+        ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+    )
+}
+
+# 标准 RFC 2822 日期：[星期,] 日 月 年 时:分[:秒] [时区] [其他内容]
+_RFC2822_RE = re.compile(
+    r"\s*(?:[A-Za-z]+,\s*|(?:mon|tue|wed|thu|fri|sat|sun)\s+)?"
+    r"(\d{1,2})\s+([A-Za-z]{3})\s+(\d{4})\s+"
+    r"(\d{1,2}):(\d{2})(?::(\d{2}))?"
+    r"(?:\s+(?:([+-]?\d+)(?!\S)|\S+))?(?:\s.*)?$",
+    re.DOTALL | re.IGNORECASE
+)
+# Received 头中分号之后的日期部分
+_RECEIVED_DATE_RE = re.compile(r";\s*(?P<date>[\w, :+\-]+)$")
+# 格式特征：数字归一为9，字母归一为a
+_SIGNATURE_TABLE = str.maketrans(
+    "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ",
+    "9" * 10 + "a" * 52
+)
+
+_OTHER_FORMATS = (
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d'
+)
+
+Strategy = Tuple[str, Callable[[str], Optional[datetime]]]
+
+
+def _parse_rfc2822_fast(date_str: str) -> Optional[datetime]:
+    """RFC 2822 快速路径，结果与 parsedate_to_datetime 去掉时区后一致，不匹配时返回None"""
+    match = _RFC2822_RE.match(date_str)
+    if not match:
+        return None
+    day, month, year, hour, minute, second, tz = match.groups()
+    month_number = _MONTHS.get(month.lower())
+    if month_number is None:
+        return None
+    if tz:
+        offset = abs(int(tz))
+        if (offset // 100) * 3600 + (offset % 100) * 60 >= 86400:
+            # 非法时区偏移，交给后续策略处理
+            return None
+    return datetime(int(year), month_number, int(day), int(hour), int(minute), int(second or 0))
+
+
+def _parse_rfc2822(date_str: str) -> Optional[datetime]:
+    """RFC 2822 格式 (邮件标准格式)，保留原始时区的本地时间"""
+    dt = _parse_rfc2822_fast(date_str)
+    if dt is None:
+        dt = parsedate_to_datetime(date_str)
+    return dt.replace(tzinfo=None)
+
+
+def _parse_iso_utc(date_str: str) -> Optional[datetime]:
+    """ISO 8601 'Z' 格式，本身就是 UTC 时间"""
+    return datetime.strptime(date_str, '%Y-%m-%dT%H:%M:%SZ')
+
+
+def _parse_iso(date_str: str) -> Optional[datetime]:
+    """其他 ISO 8601 变体"""
+    return parser.isoparse(date_str).replace(tzinfo=None)
+
+
+def _parse_received(date_str: str) -> Optional[datetime]:
+    """Received 头格式：取分号之后的日期部分"""
+    match = _RECEIVED_DATE_RE.search(date_str)
+    if match:
+        date_str = match.group('date').strip()
+    dt = _parse_rfc2822_fast(date_str)
+    if dt is not None:
+        return dt
+    return datetime.strptime(date_str, '%a, %d %b %Y %H:%M:%S %z').replace(tzinfo=None)
+
+
+def _parse_other(date_str: str) -> Optional[datetime]:
+    """其他常见格式"""
+    for fmt in _OTHER_FORMATS:
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+class DateParser:
+    """带策略记忆的邮件日期解析器
+
+    先走 RFC 2822 快速路径；不匹配时按默认顺序尝试各策略，成功后以格式特征为键记住该策略，
+    之后同一特征的日期优先使用该策略，失败时再按默认顺序尝试其余策略。
+    """
+
+    STRATEGIES: List[Strategy] = [
+        ("rfc2822", _parse_rfc2822),
+        ("iso_utc", _parse_iso_utc),
+        ("iso", _parse_iso),
+        ("received", _parse_received),
+        ("other", _parse_other)
+    ]
+
+    def __init__(self, max_signatures: int = 1024):
+        self.max_signatures = max_signatures
+        self._memo: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def signature(date_str: str) -> str:
+        """计算日期字符串的格式特征，如 '2024-01-01T10:00:00Z' -> '9999-99-99a99:99:99a'"""
+        return date_str.strip().translate(_SIGNATURE_TABLE)
+
+    def _remember(self, signature: str, index: int) -> None:
+        with self._lock:
+            self._memo[signature] = index
+            self._memo.move_to_end(signature)
+            if len(self._memo) > self.max_signatures:
+                self._memo.popitem(last=False)
+
+    def parse(self, date_str: str) -> Optional[datetime]:
+        """解析日期，所有策略都失败时返回None"""
+        try:
+            dt = _parse_rfc2822_fast(date_str)
+            if dt is not None:
+                return dt
+        except ValueError:
+            pass
+
+        signature = self.signature(date_str)
+        remembered = self._memo.get(signature)
+        if remembered is not None:
+            dt = self._try(remembered, date_str)
+            if dt is not None:
+                return dt
+
+        for index in range(len(self.STRATEGIES)):
+            if index == remembered:
+                continue
+            dt = self._try(index, date_str)
+            if dt is not None:
+                self._remember(signature, index)
+                return dt
+        return None
+
+    def _try(self, index: int, date_str: str) -> Optional[datetime]:
+        _, strategy = self.STRATEGIES[index]
+        try:
+            return strategy(date_str)
+        except (TypeError, ValueError, OverflowError):
+            return None
+
+    def clear(self) -> None:
+        """清空策略记忆"""
+        with self._lock:
+            self._memo.clear()
+
+
+# 创建全局实例
+date_parser = DateParser()
@@ -0,0 +1,61 @@
+"""
+邮件内容指纹（SimHash）
+
+验证码、物流通知、营销邮件等模板邮件之间只相差验证码、姓名、日期等少量内容，
+64位SimHash的汉明距离很小，不相关的邮件之间约为32。
+"""
+import hashlib
+import html
+import re
+from collections import Counter
+from typing import List, Optional
+
+from app.core.config import settings
+
+BITS = 64
+
+_STYLE_RE = re.compile(r'<(style|script)[^>]*>.*?</\1>', re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]+>')
+_URL_RE = re.compile(r'(?:https?://|www\.)\S+', re.IGNORECASE)
+_ADDRESS_RE = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+_DIGIT_RE = re.compile(r'\d+')
+# 拉丁字母单词、CJK字符
+_TOKEN_RE = re.compile(r'[a-z#]+|[\u4e00-\u9fff\u3040-\u30ff\uac00-\ud7af]')
+
+
+def _tokens(text: str) -> List[str]:
+    text = _STYLE_RE.sub(' ', text)
+    text = html.unescape(_TAG_RE.sub(' ', text)).lower()
+    # 链接、邮件地址、数字（验证码、订单号、日期）替换为占位符，只保留模板结构
+    text = _URL_RE.sub(' url ', text)
+    text = _ADDRESS_RE.sub(' addr ', text)
+    text = _DIGIT_RE.sub('#', text)
+    return _TOKEN_RE.findall(text)
+
+
+def _features(tokens: List[str]) -> Counter:
+    """单个词元和相邻两个词元（中文即字符二元组）作为特征，后者保留一定的词序信息"""
+    features = Counter(tokens)
+    features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return features
+
+
+def compute_simhash(subject: Optional[str], content: Optional[str]) -> Optional[int]:
+    """计算邮件主题和正文的64位SimHash（有符号整数，便于存入BIGINT）
+
+    词元数少于 EMAIL_SIMHASH_MIN_TOKENS 的短邮件区分度不足，返回None。
+    """
+    tokens = _tokens(f"{subject or ''}\n{content or ''}")
+    if len(tokens) < settings.EMAIL_SIMHASH_MIN_TOKENS:
+        return None
+    weights = [0] * BITS
+    for feature, count in _features(tokens).items():
+        value = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(BITS):
+            weights[bit] += count if value >> bit & 1 else -count
+    fingerprint = sum(1 << bit for bit in range(BITS) if weights[bit] > 0)
+    return fingerprint - (1 << BITS) if fingerprint >= 1 << (BITS - 1) else fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin((a ^ b) & ((1 << BITS) - 1)).count('1')
@@ -35,25 +35,12 @@ async def test_imap_connection(
         }
     """
     try:
-        if use_ssl:
-            client = imaplib.IMAP4_SSL(host, port)
-        else:
-            client = imaplib.IMAP4(host, port)
-            
-        client.login(username, password)
-        
-        # 获取文件夹列表
-        _, folders = client.list()
-        folder_list = []
-        for folder in folders:
-            try:
-                # 解析文件夹名称
-                folder_name = folder.decode().split('"/"')[-1].strip('" ')
-                folder_list.append(folder_name)
-            except:
-                continue
+        from app.utils.email.aioimap_client import AsyncIMAPClient
         
-        client.logout()
+        async with AsyncIMAPClient(host, port, use_ssl) as client:
+            await client.connect(username, password)
+            # 获取文件夹列表
+            folder_list = await client.list_folders()
         
         return {
             "success": True,
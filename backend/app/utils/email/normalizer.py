@@ -0,0 +1,227 @@
+"""
+邮件正文规范化（供LLM使用）
+
+把HTML正文转换为纯文本，去掉引用的历史回复、签名和退订等模板页脚，并合并空白，
+结果在同步时写入 emails.llm_text，标签分类、预回复等功能直接使用，不再把样式、表格和追踪像素发送给模型。
+"""
+import re
+from html.parser import HTMLParser
+from typing import Any, List, Optional
+
+from app.core.config import settings
+
+# 内容不可见的元素
+_SKIP_TAGS = {"script", "style", "head", "title", "noscript", "template", "svg", "xml"}
+# 结束后换行的块级元素
+_BLOCK_TAGS = {
+    "p", "div", "br", "tr", "li", "ul", "ol", "table", "section", "article", "header", "footer",
+    "h1", "h2", "h3", "h4", "h5", "h6", "hr", "pre", "blockquote", "dl", "dt", "dd", "center"
+}
+_VOID_TAGS = {"br", "hr", "img", "meta", "link", "input", "col", "area", "base", "wbr", "source"}
+# 邮件客户端包裹引用内容的class
+_QUOTE_CLASSES = ("gmail_quote", "yahoo_quoted", "moz-cite-prefix", "protonmail_quote")
+# Outlook 在引用内容前插入的元素，其后全部为历史邮件
+_QUOTE_START_IDS = ("appendonsend", "divRplyFwdMsg", "mail-editor-reference-message-container")
+_HIDDEN_STYLE_RE = re.compile(r'display\s*:\s*none|visibility\s*:\s*hidden|max-height\s*:\s*0', re.IGNORECASE)
+
+# 引用的历史邮件开头
+_REPLY_HEADER_RES = [
+    re.compile(r'^On\b.{5,300}\bwrote:$', re.IGNORECASE),
+    re.compile(r'^在.{2,300}写道[:：]$'),
+    re.compile(r'^-{2,}\s*(Original Message|Forwarded message|原始邮件|转发邮件|转发的邮件|原邮件)\s*-{2,}$', re.IGNORECASE),
+]
+_FROM_LINE_RE = re.compile(r'^\*?(From|发件人)\*?\s*[:：]', re.IGNORECASE)
+_HEADER_FIELD_RE = re.compile(r'^\*?(Sent|Date|To|Subject|发送时间|时间|日期|收件人|主题)\*?\s*[:：]', re.IGNORECASE)
+# 签名分隔线（RFC 3676 为 "-- "）
+_SIGNATURE_RE = re.compile(r'^--\s*$')
+# 移动客户端签名、退订和版权等模板行
+_BOILERPLATE_RE = re.compile(
+    r'^(sent from my \w+|发自我的\w+|从我的\w+发送)'
+    r'|(to|here to) unsubscribe|unsubscribe (here|from|link)|manage (your )?(subscription|email preferences)'
+    r'|点击.{0,10}退订|退订.{0,4}(请|链接)|回复\s*TD\s*退订|不想再收到|取消订阅'
+    r'|view (it |this email )?in (your )?browser|在浏览器中查看|无法正常显示'
+    r'|you are receiving this|this (e-?mail|message) was sent to|您收到此邮件是因为|此邮件由系统自动发送'
+    r'|all rights reserved|copyright\s*(©|\(c\))|版权所有',
+    re.IGNORECASE
+)
+# 引用头前的分隔线
+_SEPARATOR_RE = re.compile(r'^[_=\-*]{5,}$')
+# 引用前的正文少于该字符数（如“FYI”“见下文”）时保留引用内容，整封都是转发或引用的邮件同样保留
+_MIN_BODY_CHARS = 10
+_BOILERPLATE_MAX_LENGTH = 200
+# 只在开头和结尾的若干行中查找模板行，避免误删正文
+_BOILERPLATE_HEAD_LINES = 3
+_BOILERPLATE_TAIL_LINES = 8
+_INVISIBLE_RE = re.compile(r'[\u200b\u200c\u200d\u2060\ufeff\u034f\u00ad]')
+_SPACE_RE = re.compile(r'[ \t\r\f\v\u00a0\u3000]+')
+
+
+class _TextExtractor(HTMLParser):
+    """提取HTML中可见的文本，跳过隐藏元素和引用的历史邮件"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        # 正在跳过的元素及其同名嵌套层数
+        self._skip_tag: Optional[str] = None
+        self._skip_depth = 0
+        self._stopped = False
+        self.size = 0
+        # 已提取的非空白字符数，达到 _MIN_BODY_CHARS 后才跳过引用内容
+        self._body_chars = 0
+
+    def handle_starttag(self, tag: str, attrs: List[Any]) -> None:
+        if self._stopped:
+            return
+        if self._skip_tag is not None:
+            if tag == self._skip_tag and tag not in _VOID_TAGS:
+                self._skip_depth += 1
+            return
+        attributes = dict(attrs)
+        has_body = self._body_chars >= _MIN_BODY_CHARS
+        if attributes.get("id") in _QUOTE_START_IDS and has_body:
+            self._stopped = True
+            return
+        if (
+            tag in _SKIP_TAGS
+            or self._is_hidden(attributes)
+            or (has_body and (tag == "blockquote" or self._is_quote(attributes)))
+        ):
+            if tag not in _VOID_TAGS:
+                self._skip_tag, self._skip_depth = tag, 1
+            return
+        if tag == "li":
+            self.parts.append("\n- ")
+        elif tag in ("td", "th"):
+            self.parts.append(" ")
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_startendtag(self, tag: str, attrs: List[Any]) -> None:
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._stopped:
+            return
+        if self._skip_tag is not None:
+            if tag == self._skip_tag:
+                self._skip_depth -= 1
+                if self._skip_depth == 0:
+                    self._skip_tag = None
+            return
+        if tag in _BLOCK_TAGS and tag != "li":
+            self.parts.append("\n")
+
+    def handle_data(self, data: str) -> None:
+        if not self._stopped and self._skip_tag is None:
+            self.parts.append(data)
+            self.size += len(data)
+            if self._body_chars < _MIN_BODY_CHARS:
+                self._body_chars += len("".join(data.split()))
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    @staticmethod
+    def _is_hidden(attributes: dict) -> bool:
+        return "hidden" in attributes or bool(_HIDDEN_STYLE_RE.search(attributes.get("style") or ""))
+
+    @staticmethod
+    def _is_quote(attributes: dict) -> bool:
+        if attributes.get("type") == "cite":
+            return True
+        classes = attributes.get("class") or ""
+        return any(name in classes for name in _QUOTE_CLASSES)
+
+
+_FEED_CHUNK_SIZE = 32 * 1024
+
+
+def html_to_text(html: str, max_chars: Optional[int] = None) -> str:
+    """HTML转换为纯文本（保留段落和列表结构，不含样式、脚本、隐藏元素和正文之后引用的历史邮件）
+
+    Args:
+        max_chars: 提取的文本超过该长度后不再解析剩余的HTML
+    """
+    parser = _TextExtractor()
+    try:
+        for start in range(0, len(html), _FEED_CHUNK_SIZE):
+            parser.feed(html[start:start + _FEED_CHUNK_SIZE])
+            if max_chars and parser.size > max_chars:
+                break
+        parser.close()
+    except Exception:
+        # HTMLParser 对畸形HTML通常不会报错，出错时保留已提取的部分
+        pass
+    return parser.text()
+
+
+def _is_reply_header(lines: List[str], index: int) -> bool:
+    line = lines[index]
+    if any(pattern.match(line) for pattern in _REPLY_HEADER_RES):
+        return True
+    # "On ... wrote:" 被客户端折成两行
+    if index + 1 < len(lines) and _REPLY_HEADER_RES[0].match(f"{line} {lines[index + 1]}"):
+        return True
+    # Outlook / Foxmail 的 "发件人: ... 发送时间: ..." 头部
+    if _FROM_LINE_RE.match(line):
+        following = [item for item in lines[index + 1:index + 5] if item]
+        return sum(1 for item in following if _HEADER_FIELD_RE.match(item)) >= 2
+    return False
+
+
+def _is_boilerplate(line: str) -> bool:
+    return len(line) <= _BOILERPLATE_MAX_LENGTH and bool(_BOILERPLATE_RE.search(line))
+
+
+def strip_quotes_and_signature(text: str) -> str:
+    """去掉引用的历史邮件、签名和开头结尾的模板行
+
+    只有在签名分隔线之前已有正文时才截断；引用头和 ">" 引用行在正文达到 _MIN_BODY_CHARS 后才去掉，
+    整封都是转发内容或正文只有一句附言的邮件保留引用内容。
+    """
+    lines = [line.strip() for line in text.split("\n")]
+    kept: List[str] = []
+    body_chars = 0
+    for index, line in enumerate(lines):
+        is_header = _is_reply_header(lines, index)
+        quoted = line.startswith(">")
+        has_body = body_chars >= _MIN_BODY_CHARS
+        if (has_body and is_header) or (body_chars and _SIGNATURE_RE.match(line)):
+            break
+        if quoted and has_body:
+            continue
+        kept.append(line)
+        # 转发邮件开头的引用头、引用行和分隔线不算正文
+        if line and not is_header and not quoted and not _SEPARATOR_RE.match(line):
+            body_chars += len("".join(line.split()))
+    while kept and (not kept[-1] or _SEPARATOR_RE.match(kept[-1])):
+        kept.pop()
+
+    non_empty = [index for index, line in enumerate(kept) if line]
+    edges = set(non_empty[:_BOILERPLATE_HEAD_LINES] + non_empty[-_BOILERPLATE_TAIL_LINES:])
+    return "\n".join(line for index, line in enumerate(kept) if index not in edges or not _is_boilerplate(line))
+
+
+def normalize_for_llm(html: Optional[str] = None, text: Optional[str] = None) -> str:
+    """生成发送给模型的正文：有HTML时转换HTML，否则使用纯文本；结果最多 EMAIL_LLM_TEXT_MAX_CHARS 个字符"""
+    # 引用、空白去除前的文本留出余量
+    body = html_to_text(html, max_chars=settings.EMAIL_LLM_TEXT_MAX_CHARS * 2) if html else (text or "")
+    body = _INVISIBLE_RE.sub("", body)
+    body = "\n".join(_SPACE_RE.sub(" ", line) for line in body.split("\n"))
+    # 去掉引用和模板行后为空时使用未去除的文本
+    body = strip_quotes_and_signature(body).strip() or body
+    # 连续空行合并为一个
+    body = re.sub(r'\n{3,}', "\n\n", body).strip()
+    return body[:settings.EMAIL_LLM_TEXT_MAX_CHARS]
+
+
+def get_llm_text(email: Any) -> str:
+    """返回邮件的LLM正文，同步时未生成（历史邮件）的按正文内容即时计算"""
+    if email.llm_text is not None:
+        return email.llm_text
+    if email.content_type == "text/html":
+        return normalize_for_llm(html=email.content)
+    return normalize_for_llm(text=email.content)
@@ -0,0 +1,147 @@
+"""
+邮件解析进程池模块
+
+邮件解析是纯Python的CPU密集操作，受GIL限制在线程中无法并行。
+首次全量同步等大批量场景下，将原文按块分发到进程池解析，结果按提交顺序返回给写库阶段。
+"""
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.utils.blob_store import get_blob_store
+from app.utils.email.fingerprint import compute_simhash
+from app.utils.email.normalizer import normalize_for_llm
+from app.utils.email.parser import parse_message
+
+logger = logging.getLogger(__name__)
+
+# (UID, 标志列表, 邮件原文)
+RawMessage = Tuple[int, List[str], bytes]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def fallback_message_id(email_body: bytes) -> str:
+    """没有 Message-ID 的邮件按原文摘要生成稳定的ID，避免这类邮件在按message_id去重时互相覆盖"""
+    return f"<{hashlib.sha1(email_body).hexdigest()}@no-message-id>"
+
+
+def build_email_row(
+    account_id: int,
+    email_body: bytes,
+    folder: str = "INBOX",
+    uid: Optional[int] = None,
+    flags: Optional[List[str]] = None,
+    blob_store=None
+) -> Dict[str, Any]:
+    """将IMAP获取的邮件解析为批量写入用的字段字典，附件内容写入 blob_store"""
+    parsed = parse_message(email_body, blob_store)
+    return {
+        "account_id": account_id,
+        "message_id": parsed.message_id or fallback_message_id(email_body),
+        "subject": parsed.subject,
+        "from_address": parsed.from_address,
+        "from_name": parsed.from_name,
+        "to_address": parsed.to_address,
+        "cc_address": parsed.cc_address,
+        "bcc_address": parsed.bcc_address,
+        "reply_to": parsed.reply_to,
+        "date": parsed.date,
+        "content_type": parsed.content_type,
+        "content": parsed.content,
+        "llm_text": normalize_for_llm(html=parsed.html, text=parsed.text),
+        "in_reply_to": parsed.in_reply_to,
+        "references": parsed.references,
+        "raw_message": email_body,
+        "simhash": compute_simhash(parsed.subject, parsed.content) if settings.EMAIL_SIMHASH_ENABLED else None,
+        "has_attachments": bool(parsed.attachments),
+        "size": parsed.size,
+        "folder": folder,
+        "uid": uid,
+        "is_read": "\\Seen" in (flags or []),
+        "is_flagged": "\\Flagged" in (flags or []),
+        "attachments": parsed.attachments
+    }
+
+
+def build_email_rows(account_id: int, folder: str, messages: List[RawMessage]) -> List[Dict[str, Any]]:
+    """解析一批 (UID, 标志, 原文)，同一批次内按message_id去重
+
+    可在线程或子进程中执行，子进程中的存储后端实例按进程各自创建。
+    """
+    blob_store = get_blob_store()
+    batch: Dict[str, Dict[str, Any]] = {}
+    for uid, flags, email_body in messages:
+        try:
+            row = build_email_row(
+                account_id, email_body,
+                folder=folder, uid=uid, flags=flags, blob_store=blob_store
+            )
+            batch[row["message_id"]] = row
+        except Exception as e:
+            logger.error(f"处理邮件失败: {str(e)}")
+    return list(batch.values())
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """获取全局解析进程池（首次使用时创建）
+
+    调度器进程中有多个线程，使用 spawn 方式启动子进程以避免 fork 复制锁状态。
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            max_workers = settings.EMAIL_PARSE_POOL_SIZE or os.cpu_count() or 1
+            _pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"邮件解析进程池已启动，进程数: {max_workers}")
+        return _pool
+
+
+def shutdown_parse_pool() -> None:
+    """关闭解析进程池"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+async def parse_email_batch(
+    account_id: int,
+    folder: str,
+    messages: List[RawMessage],
+    use_pool: bool = False
+) -> List[Dict[str, Any]]:
+    """解析一批邮件
+
+    use_pool 为真时按 EMAIL_PARSE_POOL_CHUNK_SIZE 切块分发到进程池，结果按原顺序合并；
+    否则在线程中解析，不阻塞事件循环。
+    """
+    if not messages:
+        return []
+    if not use_pool:
+        return await asyncio.to_thread(build_email_rows, account_id, folder, messages)
+
+    loop = asyncio.get_running_loop()
+    pool = get_parse_pool()
+    chunk_size = max(settings.EMAIL_PARSE_POOL_CHUNK_SIZE, 1)
+    chunks = await asyncio.gather(*(
+        loop.run_in_executor(pool, build_email_rows, account_id, folder, messages[i:i + chunk_size])
+        for i in range(0, len(messages), chunk_size)
+    ))
+    # 跨块按message_id去重，与单块解析保持一致（后出现的覆盖先出现的）
+    batch: Dict[str, Dict[str, Any]] = {}
+    for rows in chunks:
+        for row in rows:
+            batch[row["message_id"]] = row
+    return list(batch.values())
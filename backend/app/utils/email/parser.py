@@ -1,14 +1,18 @@
+import binascii
 import email
+from dataclasses import dataclass, field
 from datetime import datetime
 from email.header import decode_header
-from email.utils import parseaddr, parsedate_to_datetime
-from typing import Tuple, List, Optional
+from email.parser import BytesHeaderParser
+from email.policy import compat32
+from email.utils import getaddresses, parseaddr
+from typing import Tuple, List, Optional, Dict, Any, Iterator, Union
 import pytz
 import logging
-from dateutil import parser
 import re
 
 from app.schemas.email import EmailAttachmentCreate
+from app.utils.email.date_parser import date_parser
 
 logger = logging.getLogger(__name__)
 
@@ -55,8 +59,16 @@ def get_email_body(msg: email.message.Message) -> Tuple[str, str]:
         return text_content, 'text/plain'
     return html_content, 'text/html'
 
-def get_attachment_info(part: email.message.Message, email_id: int) -> Optional[EmailAttachmentCreate]:
-    """获取邮件附件信息"""
+def extract_attachment(
+    part: email.message.Message,
+    blob_store=None,
+    payload: Optional[bytes] = None
+) -> Optional[Dict[str, Any]]:
+    """提取附件字段（不含email_id），供批量写入使用
+
+    传入 blob_store 时附件内容按 SHA-256 写入存储，storage_path 为存储键；相同内容只保存一份。
+    payload 为已解码的附件内容，为空时从 part 中解码。
+    """
     try:
         filename = part.get_filename()
         if not filename:
@@ -69,88 +81,45 @@ def get_attachment_info(part: email.message.Message, email_id: int) -> Optional[
             content_id = content_id.strip('<>')
             
         # 获取附件大小
-        payload = part.get_payload(decode=True)
+        if payload is None:
+            payload = part.get_payload(decode=True)
         size = len(payload) if payload else 0
+        
+        sha256 = None
+        if blob_store is not None and payload:
+            sha256 = blob_store.put(payload)
             
-        return EmailAttachmentCreate(
-            email_id=email_id,
-            filename=filename,
-            content_type=content_type,
-            size=size,
-            storage_path="",
-            content_id=content_id,
-            is_inline=bool(content_id)
-        )
+        return {
+            "filename": filename,
+            "content_type": content_type,
+            "size": size,
+            "storage_path": sha256 or "",
+            "sha256": sha256,
+            "content_id": content_id,
+            "is_inline": bool(content_id)
+        }
     except Exception as e:
         logger.error(f"获取附件信息失败: {str(e)}")
         return None
 
+def get_attachment_info(part: email.message.Message, email_id: int) -> Optional[EmailAttachmentCreate]:
+    """获取邮件附件信息"""
+    attachment = extract_attachment(part)
+    if not attachment:
+        return None
+    return EmailAttachmentCreate(email_id=email_id, **attachment)
+
 def parse_email_date(date_str: str) -> datetime:
-    """解析邮件日期"""
+    """解析邮件日期，无法解析时返回当前时间"""
     try:
-        # 尝试解析 RFC 2822 格式 (邮件标准格式)
-        try:
-            dt = parsedate_to_datetime(date_str)
-            # if dt.tzinfo:
-            #     # 转换为 UTC 时间并移除时区信息
-            #     return dt.astimezone(pytz.UTC).replace(tzinfo=None)
-            return dt.replace(tzinfo=None)
-        except (TypeError, ValueError):
-            pass
-            
-        # 尝试解析 ISO 8601 格式
-        try:
-            dt = datetime.strptime(date_str, '%Y-%m-%dT%H:%M:%SZ')
-            return dt  # ISO 8601 'Z' 格式本身就是 UTC 时间
-        except ValueError:
-            pass
-            
-        # 尝试其他 ISO 8601 变体
-        try:
-            dt = parser.isoparse(date_str)
-            # if dt.tzinfo:
-            #     # 转换为 UTC 时间并移除时区信息
-            #     return dt.astimezone(pytz.UTC).replace(tzinfo=None)
-            return dt.replace(tzinfo=None)
-        except (ValueError, TypeError):
-            pass
-        
-        # 尝试解析新添加的格式
-        try:
-            date_pattern = r";\s*(?P<date>[\w, :+\-]+)$"
-            match = re.search(date_pattern, date_str)
-            if match:
-                date_str = match.group('date').strip()
-            dt = datetime.strptime(date_str, '%a, %d %b %Y %H:%M:%S %z')
-            if dt.tzinfo:
-                # 转换为 UTC 时间并移除时区信息
-                return dt.replace(tzinfo=None)
-            return dt
-            
-        except ValueError:
-            pass
-        
-        # 尝试其他常见格式
-        formats = [
-            '%Y-%m-%d %H:%M:%S',
-            '%Y-%m-%d %H:%M:%S.%f',
-            '%Y-%m-%d %H:%M',
-            '%Y-%m-%d'
-        ]
-        
-        for fmt in formats:
-            try:
-                return datetime.strptime(date_str, fmt)
-            except ValueError:
-                continue
-                
-        # 如果所有格式都失败,记录警告并返回当前时间
-        logger.warning(f"无法解析日期格式: {date_str}, 使用当前时间")
-        return datetime.now()
-        
+        dt = date_parser.parse(date_str)
     except Exception as e:
         logger.error(f"解析日期出错: {str(e)}, date_str: {date_str}")
         return datetime.now()
+    if dt is None:
+        logger.warning(f"无法解析日期格式: {date_str}, 使用当前时间")
+        return datetime.now()
+    return dt
 
 def parse_email_addresses(addresses: List[str]) -> List[str]:
     """解析邮件地址列表"""
@@ -159,4 +128,265 @@ def parse_email_addresses(addresses: List[str]) -> List[str]:
         _, address = parse_email_address(addr)
         if address:
             result.append(address)
-    return result 
\ No newline at end of file
+    return result 
+
+_PREVIEW_LENGTH = 200
+_TAG_RE = re.compile(r'<(script|style)\b.*?</\1>|<[^>]+>', re.IGNORECASE | re.DOTALL)
+_SPACE_RE = re.compile(r'\s+')
+_MESSAGE_ID_RE = re.compile(r'<[^<>\s]+>')
+
+
+@dataclass
+class ParsedMessage:
+    """单次遍历解析得到的邮件结构"""
+    message_id: str
+    subject: str
+    from_name: str
+    from_address: str
+    to_address: List[str]
+    cc_address: List[str]
+    bcc_address: List[str]
+    reply_to: List[str]
+    date: datetime
+    in_reply_to: Optional[str]
+    references: List[str]
+    html: str = ""
+    text: str = ""
+    attachments: List[Dict[str, Any]] = field(default_factory=list)
+    size: int = 0
+
+    @property
+    def content(self) -> str:
+        """正文内容，优先HTML"""
+        return self.html or self.text
+
+    @property
+    def content_type(self) -> str:
+        return 'text/html' if self.html else 'text/plain'
+
+    @property
+    def preview(self) -> str:
+        """纯文本摘要"""
+        text = self.text or _TAG_RE.sub(' ', self.html)
+        return _SPACE_RE.sub(' ', text).strip()[:_PREVIEW_LENGTH]
+
+
+class _MIMEStructureError(Exception):
+    """快速解析无法处理的MIME结构，回退为标准库解析"""
+
+
+_HEADER_PARSER = BytesHeaderParser(policy=compat32)
+_MAX_MIME_DEPTH = 32
+
+
+def _split_header_block(data: bytes) -> Tuple[bytes, bytes]:
+    """拆分头部和正文，兼容CRLF和LF换行"""
+    if data.startswith(b'\r\n'):
+        return b'', data[2:]
+    if data.startswith(b'\n'):
+        return b'', data[1:]
+    crlf = data.find(b'\r\n\r\n')
+    lf = data.find(b'\n\n')
+    if crlf == -1 and lf == -1:
+        return data, b''
+    if lf != -1 and (crlf == -1 or lf < crlf):
+        return data[:lf + 1], data[lf + 2:]
+    return data[:crlf + 2], data[crlf + 4:]
+
+
+def _find_delimiter(body: bytes, delimiter: bytes, start: int) -> int:
+    """查找位于行首、且后面只跟 "--" 或空白的分隔符，返回分隔符起始位置"""
+    if start == 0 and body.startswith(delimiter):
+        pos = 0
+    else:
+        pos = body.find(b'\n' + delimiter, max(start - 1, 0))
+        pos = pos + 1 if pos != -1 else -1
+    while pos != -1:
+        tail = body[pos + len(delimiter):pos + len(delimiter) + 2]
+        if tail[:2] == b'--' or not tail or tail[:1] in b' \t\r\n':
+            return pos
+        pos = body.find(b'\n' + delimiter, pos + len(delimiter))
+        pos = pos + 1 if pos != -1 else -1
+    return -1
+
+
+def _split_multipart(body: bytes, boundary: bytes) -> List[bytes]:
+    """按boundary切分multipart正文，返回各子部分（含头部）"""
+    delimiter = b'--' + boundary
+    parts: List[bytes] = []
+    pos = _find_delimiter(body, delimiter, 0)
+    if pos == -1:
+        raise _MIMEStructureError("未找到boundary")
+    while True:
+        if body[pos + len(delimiter):pos + len(delimiter) + 2] == b'--':
+            break
+        line_end = body.find(b'\n', pos)
+        if line_end == -1:
+            break
+        start = line_end + 1
+        next_pos = _find_delimiter(body, delimiter, start)
+        if next_pos == -1:
+            # 缺少结束分隔符时取到正文末尾
+            parts.append(body[start:])
+            break
+        # 分隔符前的换行属于分隔符
+        end = next_pos - 1
+        if end > start and body[end - 1:end] == b'\r':
+            end -= 1
+        parts.append(body[start:max(end, start)])
+        pos = next_pos
+    return parts
+
+
+def _iter_leaf_parts(
+    headers: email.message.Message,
+    body: bytes,
+    depth: int = 0
+) -> Iterator[Tuple[email.message.Message, bytes]]:
+    """按字节切分遍历MIME树，产出 (头部, 未解码正文)，不逐行解析大体积的附件内容"""
+    if depth > _MAX_MIME_DEPTH:
+        raise _MIMEStructureError("MIME嵌套层级过深")
+    maintype = headers.get_content_maintype()
+    if maintype == 'multipart':
+        boundary = headers.get_boundary()
+        if not boundary or not boundary.isascii():
+            raise _MIMEStructureError("无效的boundary")
+        for part in _split_multipart(body, boundary.encode()):
+            part_headers, part_body = _split_header_block(part)
+            yield from _iter_leaf_parts(_HEADER_PARSER.parsebytes(part_headers), part_body, depth + 1)
+    elif headers.get_content_type() == 'message/rfc822':
+        if _transfer_encoding(headers) in ('base64', 'quoted-printable'):
+            raise _MIMEStructureError("编码的内嵌邮件")
+        # 与 Message.walk 一致，继续遍历内嵌邮件
+        inner_headers, inner_body = _split_header_block(body)
+        yield from _iter_leaf_parts(_HEADER_PARSER.parsebytes(inner_headers), inner_body, depth + 1)
+    else:
+        yield headers, body
+
+
+def _transfer_encoding(headers: email.message.Message) -> str:
+    return str(headers.get('Content-Transfer-Encoding', '')).strip().lower()
+
+
+def _decode_transfer_encoding(headers: email.message.Message, body: bytes) -> bytes:
+    encoding = _transfer_encoding(headers)
+    if encoding == 'base64':
+        return binascii.a2b_base64(body)
+    if encoding == 'quoted-printable':
+        return binascii.a2b_qp(body)
+    if encoding in ('x-uuencode', 'uuencode', 'uue', 'x-uue'):
+        raise _MIMEStructureError("不支持的传输编码")
+    return body
+
+
+def _decode_text(payload: bytes, charset: Optional[str]) -> str:
+    try:
+        return payload.decode(charset or 'utf-8', errors='replace')
+    except LookupError:
+        # 未知字符集
+        return payload.decode('utf-8', errors='replace')
+
+
+def _get_addresses(msg: email.message.Message, name: str) -> List[str]:
+    values = msg.get_all(name) or []
+    return [address for _, address in getaddresses(values) if address]
+
+
+def _collect_parts(
+    parsed: ParsedMessage,
+    parts: Iterator[Tuple[email.message.Message, Optional[bytes]]],
+    blob_store=None
+) -> None:
+    """提取正文和附件；parts 中正文为None时由标准库解码载荷"""
+    for part, body in parts:
+        maintype = part.get_content_maintype()
+        is_attachment = part.get_content_disposition() == 'attachment' or (
+            maintype != 'text' and part.get_filename()
+        )
+        if maintype == 'text' and not is_attachment:
+            subtype = part.get_content_subtype()
+            # 取第一个HTML/纯文本部分，避免被转发邮件中的正文覆盖
+            if subtype not in ('html', 'plain') or getattr(parsed, 'html' if subtype == 'html' else 'text'):
+                continue
+            payload = part.get_payload(decode=True) if body is None else _decode_transfer_encoding(part, body)
+            text = _decode_text(payload or b'', part.get_content_charset())
+            if subtype == 'html':
+                parsed.html = text
+            else:
+                parsed.text = text
+            continue
+        if not part.get_filename():
+            continue
+        payload = None if body is None else _decode_transfer_encoding(part, body)
+        attachment = extract_attachment(part, blob_store, payload)
+        if attachment:
+            parsed.attachments.append(attachment)
+
+
+def parse_thread_headers(data: bytes) -> Tuple[Optional[str], List[str]]:
+    """只解析头部，返回会话归并用的 (In-Reply-To, References)"""
+    header_bytes, _ = _split_header_block(data)
+    msg = _HEADER_PARSER.parsebytes(header_bytes)
+    in_reply_to = _MESSAGE_ID_RE.search(msg.get('In-Reply-To', '') or '')
+    return (
+        in_reply_to.group(0) if in_reply_to else None,
+        _MESSAGE_ID_RE.findall(msg.get('References', '') or '')
+    )
+
+def parse_message(
+    data: Union[bytes, email.message.Message],
+    blob_store=None
+) -> ParsedMessage:
+    """单次遍历MIME树解析邮件：头部只解码一次，正文和附件在同一次遍历中提取
+
+    传入bytes时按boundary直接切分字节并只解码一次各部分载荷，避免标准库逐行解析大附件；
+    遇到无法处理的结构时回退为标准库解析。传入 blob_store 时附件内容写入存储（见 extract_attachment）。
+    """
+    fast_parts = None
+    if isinstance(data, bytes):
+        header_bytes, body = _split_header_block(data)
+        msg = _HEADER_PARSER.parsebytes(header_bytes)
+        try:
+            fast_parts = list(_iter_leaf_parts(msg, body))
+        except _MIMEStructureError as e:
+            logger.debug(f"快速解析失败，使用标准库解析: {str(e)}")
+            msg = email.message_from_bytes(data)
+    else:
+        msg = data
+
+    from_name, from_address = parse_email_address(msg.get('From', ''))
+    # 如果没获取到时间可能是自己发送给自己的邮件
+    date_str = msg.get('Date') or msg.get('Received')
+    in_reply_to = _MESSAGE_ID_RE.search(msg.get('In-Reply-To', '') or '')
+
+    parsed = ParsedMessage(
+        message_id=msg.get('Message-ID', ''),
+        subject=decode_mime_words(msg.get('Subject', '')),
+        from_name=from_name,
+        from_address=from_address,
+        to_address=_get_addresses(msg, 'To'),
+        cc_address=_get_addresses(msg, 'Cc'),
+        bcc_address=_get_addresses(msg, 'Bcc'),
+        reply_to=_get_addresses(msg, 'Reply-To'),
+        date=parse_email_date(date_str) if date_str else datetime.now(),
+        in_reply_to=in_reply_to.group(0) if in_reply_to else None,
+        references=_MESSAGE_ID_RE.findall(msg.get('References', '') or ''),
+        size=len(data) if isinstance(data, bytes) else 0
+    )
+
+    if fast_parts is not None:
+        try:
+            _collect_parts(parsed, iter(fast_parts), blob_store)
+            return parsed
+        except (_MIMEStructureError, binascii.Error) as e:
+            logger.debug(f"快速解析失败，使用标准库解析: {str(e)}")
+            msg = email.message_from_bytes(data)
+            parsed.html = parsed.text = ""
+            parsed.attachments = []
+
+    _collect_parts(
+        parsed,
+        ((part, None) for part in msg.walk() if not part.is_multipart()),
+        blob_store
+    )
+    return parsed
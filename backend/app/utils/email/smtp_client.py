@@ -5,7 +5,7 @@ import logging
 from typing import List, Optional, Dict, Any
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from email.utils import formataddr
+from email.utils import formataddr, formatdate, make_msgid
 import aiosmtplib
 from jinja2 import Environment, FileSystemLoader
 import os
@@ -58,13 +58,23 @@ async def test_smtp_connection(
 class SMTPClient:
     """SMTP客户端类"""
     
-    def __init__(self, host: str, port: int, username: str, password: str, use_ssl: bool = True, use_tls: bool = False):
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: str,
+        use_ssl: bool = True,
+        use_tls: bool = False,
+        display_name: Optional[str] = None
+    ):
         self.host = host
         self.port = port
         self.username = username
         self.password = password
         self.use_ssl = use_ssl
         self.use_tls = use_tls
+        self.display_name = display_name
     
     async def test_connection(self) -> Dict[str, Any]:
         """测试连接"""
@@ -93,6 +103,8 @@ class SMTPClient:
             msg["Subject"] = subject
             msg["From"] = formataddr((from_name or self.display_name, self.username))
             msg["To"] = ", ".join(to_addresses)
+            msg["Date"] = formatdate(localtime=True)
+            msg["Message-ID"] = make_msgid(domain=self.username.rpartition("@")[2] or None)
             
             if cc_addresses:
                 msg["Cc"] = ", ".join(cc_addresses)
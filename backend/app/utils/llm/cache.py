@@ -0,0 +1,239 @@
+"""
+LLM响应缓存
+
+按 (提供者, 模型, 提示词, 消息, 调用参数) 的哈希缓存非流式调用的响应，相同输入只调用一次模型：
+
+- L1：进程内LRU（LLM_CACHE_L1_SIZE）
+- L2：Redis（多个进程共享），未启用或不可用时使用本地SQLite文件（LLM_CACHE_SQLITE_PATH）
+
+两级缓存都按 LLM_CACHE_TTL 过期，L2 的条目数超过 LLM_CACHE_L2_MAX_ENTRIES 时淘汰最早写入的条目。
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.redis import get_redis, report_redis_error
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent.parent.parent.parent
+
+_KEY_PREFIX = "llm:cache:"
+_INDEX_KEY = "llm:cache:index"
+_STATS_KEY = "llm:cache:stats"
+# SQLite 每写入该数量的条目清理一次过期和超量条目
+_SQLITE_PRUNE_EVERY = 100
+
+
+class LLMResponseCache:
+    """两级LLM响应缓存"""
+
+    def __init__(self):
+        self._l1: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Counter = Counter()
+        self._sqlite: Optional[sqlite3.Connection] = None
+        self._sqlite_writes = 0
+
+    @staticmethod
+    def make_key(
+        provider: str,
+        model: Optional[str],
+        prompt: str,
+        message: str,
+        params: Dict[str, Any]
+    ) -> str:
+        """计算缓存键，调用参数按名称排序后参与哈希"""
+        payload = json.dumps(
+            [provider, model, prompt, message, params],
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """查询缓存，L2命中时回填L1"""
+        now = time.time()
+        value = None
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._l1.move_to_end(key)
+                    value = entry[1]
+                else:
+                    del self._l1[key]
+        if value is not None:
+            self._record("l1_hits")
+            return value
+
+        value = self._l2_get(key, now)
+        if value is None:
+            self._record("misses")
+            return None
+        self._record("l2_hits")
+        self._l1_set(key, value, now + settings.LLM_CACHE_TTL)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """写入两级缓存"""
+        now = time.time()
+        self._l1_set(key, value, now + settings.LLM_CACHE_TTL)
+        self._l2_set(key, value, now)
+        self._record("writes")
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计：local 为当前进程，shared 为通过Redis汇总的所有进程（Redis不可用时为空）"""
+        with self._lock:
+            local = dict(self._stats)
+            l1_size = len(self._l1)
+        shared: Dict[str, int] = {}
+        client = get_redis()
+        if client is not None:
+            try:
+                shared = {k.decode(): int(v) for k, v in client.hgetall(_STATS_KEY).items()}
+            except Exception as e:
+                report_redis_error(e)
+        return {
+            "local": self._with_hit_rate(local),
+            "shared": self._with_hit_rate(shared) if shared else {},
+            "l1_size": l1_size
+        }
+
+    def clear(self) -> None:
+        """清空进程内缓存和本地SQLite缓存（Redis中的条目按TTL过期）"""
+        with self._lock:
+            self._l1.clear()
+            self._stats.clear()
+            if self._sqlite is not None:
+                self._sqlite.execute("DELETE FROM llm_cache")
+                self._sqlite.commit()
+
+    @staticmethod
+    def _with_hit_rate(stats: Dict[str, int]) -> Dict[str, Any]:
+        hits = stats.get("l1_hits", 0) + stats.get("l2_hits", 0)
+        total = hits + stats.get("misses", 0)
+        return {**stats, "hit_rate": round(hits / total, 4) if total else 0.0}
+
+    def _record(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+        client = get_redis() if settings.LLM_CACHE_L2_BACKEND == "redis" else None
+        if client is not None:
+            try:
+                client.hincrby(_STATS_KEY, name, 1)
+            except Exception as e:
+                report_redis_error(e)
+
+    def _l1_set(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._l1[key] = (expires_at, value)
+            self._l1.move_to_end(key)
+            while len(self._l1) > settings.LLM_CACHE_L1_SIZE:
+                self._l1.popitem(last=False)
+
+    # L2
+
+    def _l2_get(self, key: str, now: float) -> Optional[str]:
+        backend = settings.LLM_CACHE_L2_BACKEND
+        if backend == "none":
+            return None
+        if backend == "redis":
+            client = get_redis()
+            if client is not None:
+                try:
+                    value = client.get(_KEY_PREFIX + key)
+                    return value.decode("utf-8") if value is not None else None
+                except Exception as e:
+                    report_redis_error(e)
+        return self._sqlite_get(key, now)
+
+    def _l2_set(self, key: str, value: str, now: float) -> None:
+        backend = settings.LLM_CACHE_L2_BACKEND
+        if backend == "none":
+            return
+        if backend == "redis":
+            client = get_redis()
+            if client is not None:
+                try:
+                    self._redis_set(client, key, value, now)
+                    return
+                except Exception as e:
+                    report_redis_error(e)
+        self._sqlite_set(key, value, now)
+
+    @staticmethod
+    def _redis_set(client: Any, key: str, value: str, now: float) -> None:
+        pipe = client.pipeline()
+        pipe.set(_KEY_PREFIX + key, value.encode("utf-8"), ex=settings.LLM_CACHE_TTL)
+        pipe.zadd(_INDEX_KEY, {key: now})
+        pipe.zcard(_INDEX_KEY)
+        size = pipe.execute()[-1]
+        excess = size - settings.LLM_CACHE_L2_MAX_ENTRIES
+        if excess > 0:
+            evicted = [member for member, _ in client.zpopmin(_INDEX_KEY, excess)]
+            if evicted:
+                client.delete(*[_KEY_PREFIX + member.decode() for member in evicted])
+
+    def _get_sqlite(self) -> sqlite3.Connection:
+        """调用方需持有 self._lock"""
+        if self._sqlite is None:
+            path = Path(settings.LLM_CACHE_SQLITE_PATH)
+            if not path.is_absolute():
+                path = ROOT_DIR / path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(path), timeout=5, check_same_thread=False)
+            # WAL模式允许API和调度器进程同时读写
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_expires_at ON llm_cache (expires_at)")
+            conn.commit()
+            self._sqlite = conn
+        return self._sqlite
+
+    def _sqlite_get(self, key: str, now: float) -> Optional[str]:
+        try:
+            with self._lock:
+                row = self._get_sqlite().execute(
+                    "SELECT value FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            logger.warning(f"读取LLM缓存失败: {str(e)}")
+            return None
+
+    def _sqlite_set(self, key: str, value: str, now: float) -> None:
+        try:
+            with self._lock:
+                conn = self._get_sqlite()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, now + settings.LLM_CACHE_TTL)
+                )
+                self._sqlite_writes += 1
+                if self._sqlite_writes % _SQLITE_PRUNE_EVERY == 0:
+                    conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+                    # 过期时间相同的TTL下，过期时间最早即写入最早
+                    conn.execute(
+                        "DELETE FROM llm_cache WHERE key IN ("
+                        "SELECT key FROM llm_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                        (settings.LLM_CACHE_L2_MAX_ENTRIES,)
+                    )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"写入LLM缓存失败: {str(e)}")
+
+
+# 创建全局实例
+llm_response_cache = LLMResponseCache()
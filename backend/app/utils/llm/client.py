@@ -1,10 +1,80 @@
 """
 LLM统一调用工具
 """
-from typing import Optional, Dict, Any, AsyncGenerator
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, AsyncGenerator, Callable, Iterator
+
+from app.core.config import settings
 from .providers import zhipu_sdk, RAGflow, Openai
+from .cache import llm_response_cache
+from .token_counter import count_tokens
+from .usage import record_usage
+from .rate_limiter import LLMRateLimit, get_retry_after, is_rate_limit_error, llm_rate_limiter
 from .mapping import DEFAULT_PROVIDER, MODEL_MAPPING
 
+logger = logging.getLogger(__name__)
+
+# 迭代同步SDK流式响应的专用线程池，避免长时间的流占满事件循环的默认线程池
+_stream_executor = ThreadPoolExecutor(
+    max_workers=settings.LLM_STREAM_MAX_WORKERS,
+    thread_name_prefix="llm-stream"
+)
+_DONE = object()
+
+
+async def iterate_in_thread(factory: Callable[[], Iterator[str]]) -> AsyncGenerator[str, None]:
+    """在工作线程中迭代同步生成器，通过队列把数据块交回事件循环
+
+    调用方停止迭代（如客户端断开连接导致任务被取消）时通知工作线程停止，
+    工作线程在收到下一个数据块后关闭生成器，由提供者关闭HTTP响应。
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def put(item: Any) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # 事件循环已关闭
+            stop.set()
+
+    def worker() -> None:
+        iterator = None
+        try:
+            iterator = factory()
+            for chunk in iterator:
+                if stop.is_set():
+                    break
+                put(chunk)
+        except BaseException as e:
+            if not stop.is_set():
+                put(e)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception as e:
+                    logger.warning(f"关闭LLM流式响应失败: {str(e)}")
+            put(_DONE)
+
+    loop.run_in_executor(_stream_executor, worker)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
 class LLMClient:
     _providers = {
         "zhipu": zhipu_sdk,
@@ -20,8 +90,17 @@ class LLMClient:
         provider: str = DEFAULT_PROVIDER,
         model: Optional[str] = None,
         proxy_url: Optional[str] = None,
+        cache: bool = False,
+        usage_context: Optional[Dict[str, Any]] = None,
+        metrics: Optional[Dict[str, Any]] = None,
         **kwargs: Any
     ) -> str:
+        """同步生成
+
+        cache 为 True 时按 (提供者, 模型, 提示词, 消息, 调用参数) 缓存响应，相同输入不再调用模型；
+        传入 usage_context 时记录本次调用的token用量，见 app/utils/llm/usage.py；
+        传入 metrics 时写入 cached（是否命中缓存）和 duration_ms（调用提供者的耗时），供渠道路由统计延迟
+        """
         # 获取提供者模块
         if provider not in LLMClient._providers:
             raise ValueError(f"不支持的LLM提供者: {provider}")
@@ -32,9 +111,141 @@ class LLMClient:
         if model and model in MODEL_MAPPING:
             model = MODEL_MAPPING[model]
             
-        # 调用对应的SDK
-        return sdk.generate(prompt, message, api_key=api_key, model=model,proxy_url=proxy_url, **kwargs)
+        cache_key = None
+        if cache:
+            # 超时参数不影响响应内容，不参与缓存键
+            params = {k: v for k, v in kwargs.items() if k != "timeout"}
+            cache_key = llm_response_cache.make_key(provider, model, prompt, message, params)
+            cached = llm_response_cache.get(cache_key)
+            if cached is not None:
+                if metrics is not None:
+                    metrics["cached"] = True
+                record_usage(
+                    usage_context, provider=provider, model=model,
+                    prompt_tokens=0, completion_tokens=0, estimated=False, cached=True
+                )
+                return cached
+
+        # 调用对应的SDK，提供者返回用量时写入 usage
+        usage: Dict[str, int] = {}
+        started = time.monotonic()
+        response = sdk.generate(prompt, message, api_key=api_key, model=model,proxy_url=proxy_url, usage=usage, **kwargs)
+        if metrics is not None:
+            metrics["cached"] = False
+            metrics["duration_ms"] = int((time.monotonic() - started) * 1000)
+        if cache_key and response:
+            llm_response_cache.set(cache_key, response)
+        if usage_context:
+            LLMClient._record(
+                usage_context, provider, model, prompt + message, response or "", usage,
+                int((time.monotonic() - started) * 1000)
+            )
+        return response
+
+    @staticmethod
+    def _record(
+        usage_context: Dict[str, Any],
+        provider: str,
+        model: Optional[str],
+        prompt_text: str,
+        completion: str,
+        usage: Dict[str, int],
+        duration_ms: int
+    ) -> None:
+        """记录用量，提供者未返回用量时在本地计算"""
+        estimated = "prompt_tokens" not in usage
+        if estimated:
+            usage = {
+                "prompt_tokens": count_tokens(prompt_text, model, provider),
+                "completion_tokens": count_tokens(completion, model, provider)
+            }
+        record_usage(
+            usage_context,
+            provider=provider,
+            model=model,
+            prompt_tokens=usage["prompt_tokens"],
+            completion_tokens=usage.get("completion_tokens", 0),
+            estimated=estimated,
+            duration_ms=duration_ms
+        )
     
+    @staticmethod
+    async def agenerate(
+        prompt: str,
+        message: str,
+        api_key: str,
+        provider: str = DEFAULT_PROVIDER,
+        model: Optional[str] = None,
+        proxy_url: Optional[str] = None,
+        timeout: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        cache: bool = False,
+        usage_context: Optional[Dict[str, Any]] = None,
+        rate_limit: Optional[LLMRateLimit] = None,
+        metrics: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> str:
+        """异步生成，不阻塞事件循环
+
+        Args:
+            timeout: 单次调用的截止时间（秒），默认 LLM_HTTP_TIMEOUT；SDK请求的读取超时同样受此限制，
+                超时或调用方被取消后，工作线程中的请求最迟在读取超时后结束
+            connect_timeout: 连接超时（秒），默认 LLM_CONNECT_TIMEOUT
+            cache: 是否使用响应缓存，见 generate
+            usage_context: 用量记录的上下文，见 generate
+            rate_limit: 渠道的限流配置（LLMRateLimit.from_channel），同一API密钥的调用共享配额；
+                返回429时按 Retry-After 暂停该密钥的所有调用，最多重试 LLM_RATE_LIMIT_MAX_RETRIES 次
+                等待限流的时间不计入截止时间
+            metrics: 调用指标，见 generate；另外写入 started（最近一次尝试取得限流配额后的 time.monotonic()），
+                供调用失败时计算不含限流等待的耗时
+
+        Raises:
+            asyncio.TimeoutError: 超过截止时间
+        """
+        deadline = timeout or settings.LLM_HTTP_TIMEOUT
+        connect = min(connect_timeout or settings.LLM_CONNECT_TIMEOUT, deadline)
+        rate_limit = rate_limit or LLMRateLimit()
+        limit_key = llm_rate_limiter.limit_key(provider, api_key)
+        input_tokens = count_tokens(prompt + message, model, provider) if rate_limit.tokens_per_minute else 0
+        attempt = 0
+        while True:
+            lease = await llm_rate_limiter.acquire(limit_key, rate_limit, input_tokens)
+            if metrics is not None:
+                metrics["started"] = time.monotonic()
+            try:
+                response = await asyncio.wait_for(
+                    asyncio.to_thread(
+                        LLMClient.generate,
+                        prompt,
+                        message,
+                        api_key=api_key,
+                        provider=provider,
+                        model=model,
+                        proxy_url=proxy_url,
+                        cache=cache,
+                        usage_context=usage_context,
+                        metrics=metrics,
+                        timeout=(connect, deadline),
+                        **kwargs
+                    ),
+                    timeout=deadline
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"LLM调用超时: provider={provider}, model={model}, timeout={deadline}s")
+                raise
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                await llm_rate_limiter.penalize(limit_key, get_retry_after(e))
+                attempt += 1
+                if attempt > settings.LLM_RATE_LIMIT_MAX_RETRIES:
+                    raise
+                continue
+            finally:
+                await llm_rate_limiter.release(limit_key, lease)
+            await llm_rate_limiter.settle(limit_key, rate_limit, count_tokens(response, model, provider))
+            return response
+
     @staticmethod
     async def generate_stream(
         prompt: str,
@@ -43,8 +254,15 @@ class LLMClient:
         provider: str = DEFAULT_PROVIDER,
         model: Optional[str] = None,
         proxy_url: Optional[str] = None,
+        usage_context: Optional[Dict[str, Any]] = None,
+        rate_limit: Optional[LLMRateLimit] = None,
         **kwargs: Any
     ) -> AsyncGenerator[str, None]:
+        """流式生成
+
+        传入 usage_context 时在流正常结束后记录本地计算的用量；rate_limit 见 agenerate，
+        并发名额在流结束前一直占用，返回429时暂停该密钥的调用后抛出异常（不重试）
+        """
         # 获取提供者模块
         if provider not in LLMClient._providers:
             raise ValueError(f"不支持的LLM提供者: {provider}")
@@ -55,6 +273,31 @@ class LLMClient:
         if model and model in MODEL_MAPPING:
             model = MODEL_MAPPING[model]
         
-        # 调用对应的SDK
-        async for chunk in sdk.generate_stream(prompt, message, api_key=api_key, model=model,proxy_url=proxy_url, **kwargs):
-            yield chunk
\ No newline at end of file
+        rate_limit = rate_limit or LLMRateLimit()
+        limit_key = llm_rate_limiter.limit_key(provider, api_key)
+        input_tokens = count_tokens(prompt + message, model, provider) if rate_limit.tokens_per_minute else 0
+        lease = await llm_rate_limiter.acquire(limit_key, rate_limit, input_tokens)
+
+        # 调用对应的SDK，同步流在工作线程中迭代，不阻塞事件循环
+        stream = iterate_in_thread(
+            lambda: sdk.generate_stream(prompt, message, api_key=api_key, model=model, proxy_url=proxy_url, **kwargs)
+        )
+        chunks = []
+        started = time.monotonic()
+        try:
+            async for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            if is_rate_limit_error(e):
+                await llm_rate_limiter.penalize(limit_key, get_retry_after(e))
+            raise
+        finally:
+            await stream.aclose()
+            await llm_rate_limiter.release(limit_key, lease)
+        await llm_rate_limiter.settle(limit_key, rate_limit, count_tokens("".join(chunks), model, provider))
+        if usage_context:
+            await asyncio.to_thread(
+                LLMClient._record, usage_context, provider, model, prompt + message, "".join(chunks), {},
+                int((time.monotonic() - started) * 1000)
+            )
\ No newline at end of file
@@ -1,38 +1,49 @@
-import os
-from typing import Any, AsyncGenerator
+import logging
+from typing import Any, Dict, Iterator, Optional, Tuple
 from openai import OpenAI
 
+from ..registry import build_http_client, build_timeout, fill_usage, llm_client_registry
 
+logger = logging.getLogger(__name__)
 
-def generate(prompt: str, message: str, api_key: str, model: str, proxy_url: str, **kwargs: Any) -> str:
-    os.environ['OPENAI_API_KEY'] = api_key
-    client = OpenAI(
-        base_url=proxy_url,
+
+def get_client(api_key: str, proxy_url: Optional[str]) -> OpenAI:
+    """获取渠道复用的客户端，API密钥直接传给客户端，不再写入进程环境变量"""
+    return llm_client_registry.get(
+        "openai", api_key, proxy_url,
+        lambda: OpenAI(api_key=api_key, base_url=proxy_url or None, http_client=build_http_client())
     )
+
+def generate(prompt: str, message: str, api_key: str, model: str, proxy_url: str, timeout: Optional[Tuple[float, float]] = None, usage: Optional[Dict[str, int]] = None, **kwargs: Any) -> str:
+    client = get_client(api_key, proxy_url)
+    if timeout:
+        kwargs["timeout"] = build_timeout(timeout)
     response = client.chat.completions.create(
         model=model,
         messages=[{"role": "system", "content": prompt}, {"role": "user", "content": message}],
         **kwargs
     )
+    fill_usage(usage, response)
     return response.choices[0].message.content
 
-async def generate_stream(prompt: str, message: str, api_key: str, model: str, proxy_url: str, **kwargs: Any) -> AsyncGenerator[str, None]:
-    os.environ['OPENAI_API_KEY'] = api_key
-    client = OpenAI(
-        base_url=proxy_url,
-    )
+def generate_stream(prompt: str, message: str, api_key: str, model: str, proxy_url: str, **kwargs: Any) -> Iterator[str]:
+    """同步流式生成，由 LLMClient.generate_stream 在工作线程中迭代"""
+    client = get_client(api_key, proxy_url)
     response = client.chat.completions.create(
         model=model,
         messages=[{"role": "system", "content": prompt}, {"role": "user", "content": message}],
         stream=True,
         **kwargs
     )
-    for chunk in response:
-        try:
-            if chunk.choices and len(chunk.choices) > 0:
-                if chunk.choices[0].delta.content is not None:
-                    yield chunk.choices[0].delta.content
-        except Exception as e:
-            print(f"处理chunk时出错: {e}")
-            continue
-
+    try:
+        for chunk in response:
+            try:
+                if chunk.choices and len(chunk.choices) > 0:
+                    if chunk.choices[0].delta.content is not None:
+                        yield chunk.choices[0].delta.content
+            except Exception as e:
+                logger.warning(f"处理chunk时出错: {str(e)}")
+                continue
+    finally:
+        # 提前结束时关闭响应，归还连接到连接池
+        response.close()
@@ -1,48 +1,62 @@
-from typing import Any, AsyncGenerator
+from typing import Any, Iterator, Optional, Tuple
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import logging
 import re
 
-from sqlalchemy import true
+from app.core.config import settings
+from ..registry import llm_client_registry
 
-def get_session_id(api_key: str, proxy_url: str, agent_id: str):
-    # /api/v1/agents/{agent_id}/sessions
-    headers = {
+logger = logging.getLogger(__name__)
+
+def _create_session(api_key: str) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.LLM_HTTP_MAX_CONNECTIONS
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({
         'content-Type': 'application/json',
         'Authorization': f'Bearer {api_key}'
-    }
-    response = requests.post(f'{proxy_url}/api/v1/agents/{agent_id}/sessions', headers=headers, data={})
+    })
+    return session
+
+def get_http_session(api_key: str, proxy_url: str) -> requests.Session:
+    """获取渠道复用的HTTP会话（keep-alive连接池）"""
+    return llm_client_registry.get("ragflow", api_key, proxy_url, lambda: _create_session(api_key))
+
+def get_session_id(api_key: str, proxy_url: str, agent_id: str, timeout: Optional[Tuple[float, float]] = None):
+    # /api/v1/agents/{agent_id}/sessions
+    http = get_http_session(api_key, proxy_url)
+    response = http.post(f'{proxy_url}/api/v1/agents/{agent_id}/sessions', data={}, timeout=timeout or settings.LLM_HTTP_TIMEOUT)
     response.raise_for_status()
     return response.json()['data']['id']
 
-def generate(prompt: str, message: str, api_key: str, model: str, proxy_url: str, **kwargs: Any) -> str:
-    # 请求RAGflow API proxy_url
-    session_id = get_session_id(api_key, proxy_url, model)
-    headers = {
-        'content-Type': 'application/json',
-        'Authorization': f'Bearer {api_key}'
-    }
+def generate(prompt: str, message: str, api_key: str, model: str, proxy_url: str, timeout: Optional[Tuple[float, float]] = None, **kwargs: Any) -> str:
+    # 请求RAGflow API proxy_url，接口不返回token用量，由调用方计算
+    session_id = get_session_id(api_key, proxy_url, model, timeout)
     data = {
         "question":prompt + message,
         "stream": False,
         "session_id":session_id
     }
     agent_id = model
-    response = requests.post(f'{proxy_url}/api/v1/agents/{agent_id}/completions', headers=headers, data=json.dumps(data))
+    http = get_http_session(api_key, proxy_url)
+    response = http.post(f'{proxy_url}/api/v1/agents/{agent_id}/completions', data=json.dumps(data), timeout=timeout or settings.LLM_HTTP_TIMEOUT)
     response.raise_for_status()
     return response.json()['data']['answer']
     # 返回文本
 
-async def generate_stream(prompt: str, message: str, api_key: str, model: str, proxy_url: str, **kwargs: Any) -> AsyncGenerator[str, None]:
+def generate_stream(prompt: str, message: str, api_key: str, model: str, proxy_url: str, **kwargs: Any) -> Iterator[str]:
+    """同步流式生成，由 LLMClient.generate_stream 在工作线程中迭代"""
 
     session_id = get_session_id(api_key, proxy_url, model)
     # 这里需要获取到session_id才能进行流式输出
     
     # 请求RAGflow API proxy_url
-    headers = {
-        'content-Type': 'application/json',
-        'Authorization': f'Bearer {api_key}'
-    }
     data = {
         "question": prompt + message,
         "stream": True,
@@ -50,37 +64,38 @@ async def generate_stream(prompt: str, message: str, api_key: str, model: str, p
     }
 
     agent_id = model
-    response = requests.post(f'{proxy_url}/api/v1/agents/{agent_id}/completions', headers=headers, data=json.dumps(data), stream=True)
+    http = get_http_session(api_key, proxy_url)
+    response = http.post(f'{proxy_url}/api/v1/agents/{agent_id}/completions', data=json.dumps(data), stream=True, timeout=settings.LLM_HTTP_TIMEOUT)
     
-    previous_length = 0  # 记录上一次答案的长度
-    for chunk in response.iter_content(chunk_size=None):  # 使用 None 作为 chunk_size，让请求自动处理分块
-        if chunk:
-            try:
-                # 将字节转换为字符串
-                chunk_str = chunk.decode('utf-8')
-                if chunk_str.startswith('data:'):
-                    # 移除 'data:' 前缀并解析 JSON
-                    json_str = chunk_str[5:].strip()
-                    chunk_data = json.loads(json_str)
+    try:
+        previous_length = 0  # 记录上一次答案的长度
+        for chunk in response.iter_content(chunk_size=None):  # 使用 None 作为 chunk_size，让请求自动处理分块
+            if chunk:
+                try:
+                    # 将字节转换为字符串
+                    chunk_str = chunk.decode('utf-8')
+                    if chunk_str.startswith('data:'):
+                        # 移除 'data:' 前缀并解析 JSON
+                        json_str = chunk_str[5:].strip()
+                        chunk_data = json.loads(json_str)
                     
-                    if 'data' in chunk_data:
-                        if isinstance(chunk_data['data'], dict) and 'answer' in chunk_data['data']:
-                            answer = chunk_data['data']['answer']
-                            if isinstance(answer, str):
-                                # 检查是否是运行提示信息
-                                if re.match(r'\*.*?\* is running...🕞', answer):
-                                    # print("跳过运行提示信息")  # 调试信息
-                                    yield ''
-                                # 获取新增的内容
-                                new_content = answer[previous_length:]
-                                # print(f"新增内容: {new_content}")  # 调试信息
-                                if new_content:
-                                    yield new_content
-                                previous_length = len(answer)
-                        elif chunk_data['data'] is True:
-                            break
-            except (json.JSONDecodeError, UnicodeDecodeError) as e:
-                print(f"解析错误: {e}")  # 调试信息
-                continue
-
-
+                        if 'data' in chunk_data:
+                            if isinstance(chunk_data['data'], dict) and 'answer' in chunk_data['data']:
+                                answer = chunk_data['data']['answer']
+                                if isinstance(answer, str):
+                                    # 检查是否是运行提示信息
+                                    if re.match(r'\*.*?\* is running...🕞', answer):
+                                        yield ''
+                                    # 获取新增的内容
+                                    new_content = answer[previous_length:]
+                                    if new_content:
+                                        yield new_content
+                                    previous_length = len(answer)
+                            elif chunk_data['data'] is True:
+                                break
+                except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                    logger.warning(f"RAGflow流式响应解析错误: {str(e)}")
+                    continue
+    finally:
+        # 归还连接到连接池
+        response.close()
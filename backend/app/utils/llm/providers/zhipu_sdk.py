@@ -1,6 +1,16 @@
-from typing import Optional, Dict, Any, AsyncGenerator
+from typing import Optional, Dict, Any, Iterator, Tuple
 from zhipuai import ZhipuAI
 
+from ..registry import build_http_client, build_timeout, fill_usage, llm_client_registry
+
+
+def get_client(api_key: str) -> ZhipuAI:
+    """获取渠道复用的客户端"""
+    return llm_client_registry.get(
+        "zhipu", api_key, None,
+        lambda: ZhipuAI(api_key=api_key, http_client=build_http_client())
+    )
+
 def generate(
     prompt: str,
     message: str,
@@ -9,9 +19,13 @@ def generate(
     temperature: float = 0.7,
     max_tokens: Optional[int] = None,
     proxy_url: Optional[str] = None,
+    timeout: Optional[Tuple[float, float]] = None,
+    usage: Optional[Dict[str, int]] = None,
     **kwargs: Any
 ) -> str:
-    client = ZhipuAI(api_key=api_key)
+    client = get_client(api_key)
+    if timeout:
+        kwargs["timeout"] = build_timeout(timeout)
     messages = [
         {"role": "system", "content": prompt},
         {"role": "user", "content": message}
@@ -24,10 +38,11 @@ def generate(
         max_tokens=max_tokens,
         **kwargs
     )
+    fill_usage(usage, response)
     
     return response.choices[0].message.content
 
-async def generate_stream(
+def generate_stream(
     prompt: str,
     message: str,
     api_key: str,
@@ -36,8 +51,9 @@ async def generate_stream(
     max_tokens: Optional[int] = None,
     proxy_url: Optional[str] = None,
     **kwargs: Any
-) -> AsyncGenerator[str, None]:
-    client = ZhipuAI(api_key=api_key)
+) -> Iterator[str]:
+    """同步流式生成，由 LLMClient.generate_stream 在工作线程中迭代"""
+    client = get_client(api_key)
     messages = [
         {"role": "system", "content": prompt},
         {"role": "user", "content": message}
@@ -52,6 +68,10 @@ async def generate_stream(
         **kwargs
     )
     
-    for chunk in stream:
-        if chunk.choices[0].delta.content is not None:
-            yield chunk.choices[0].delta.content
+    try:
+        for chunk in stream:
+            if chunk.choices[0].delta.content is not None:
+                yield chunk.choices[0].delta.content
+    finally:
+        # 提前结束时关闭响应，归还连接到连接池
+        stream.response.close()
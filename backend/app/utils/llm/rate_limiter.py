@@ -0,0 +1,334 @@
+"""
+LLM渠道限流模块
+
+按 (提供者, API密钥) 限制所有worker的并发请求数、每分钟请求数和每分钟token数，使用同一API密钥的多个渠道共享配额。
+状态保存在Redis中（并发名额为带过期时间的租约，速率为令牌桶），Redis不可用时回退到进程内状态。
+
+提供者返回429时调用 penalize：按 Retry-After（没有时为 LLM_RATE_LIMIT_DEFAULT_BACKOFF）暂停该密钥的所有调用，
+并把配额减半（不低于 LLM_THROTTLE_MIN_FACTOR），之后每经过 LLM_THROTTLE_RECOVERY_SECONDS 秒恢复一倍。
+暂停期间的其他429只延长暂停时间，不再重复减半，避免同一波突发请求把配额压到最低。
+"""
+import asyncio
+import email.utils
+import hashlib
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.redis import get_redis, report_redis_error
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LLMRateLimit:
+    """渠道的限流配置，None 表示不限制"""
+    max_concurrency: Optional[int] = None  # 所有worker同时进行的请求数
+    requests_per_minute: Optional[int] = None  # 所有worker每分钟的请求数
+    tokens_per_minute: Optional[int] = None  # 所有worker每分钟的token数（输入按调用前计算，输出在调用后扣除）
+
+    @classmethod
+    def from_channel(cls, channel: Any) -> "LLMRateLimit":
+        """从 LLMChannel 记录构造限流配置"""
+        if channel is None:
+            return cls()
+        return cls(
+            max_concurrency=channel.max_concurrency or None,
+            requests_per_minute=channel.requests_per_minute or None,
+            tokens_per_minute=channel.tokens_per_minute or None
+        )
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """是否为提供者返回的429响应（OpenAI/智谱SDK的状态码异常、requests的HTTPError）"""
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code == 429
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """从429响应的 Retry-After / retry-after-ms 头部解析需要等待的秒数"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            return max(float(retry_after_ms) / 1000, 0.0)
+        retry_after = headers.get("retry-after")
+        if not retry_after:
+            return None
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            # HTTP日期格式
+            retry_at = email.utils.parsedate_to_datetime(retry_after)
+            return max(retry_at.timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+# 限流系数：收缩后按 2^(经过秒数/恢复周期) 倍恢复，最大为1
+_THROTTLE_FACTOR_LUA = """
+local function throttle_factor(key, now, recovery)
+    local state = redis.call('HMGET', key, 'factor', 'ts')
+    if not state[1] then
+        return 1
+    end
+    return math.min(1, tonumber(state[1]) * 2 ^ ((now - tonumber(state[2])) / recovery))
+end
+
+-- 从令牌桶取出 requested 个令牌，不足时预支并返回需要等待的秒数
+local function take(key, per_minute, requested, burst, now)
+    local rate = per_minute / 60
+    local capacity = math.max(1, rate * burst)
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate) - requested
+    redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', key, 600)
+    if tokens >= 0 then
+        return 0
+    end
+    return -tokens / rate
+end
+"""
+
+# KEYS: 租约集合, 限流状态, 请求数令牌桶, token数令牌桶
+# ARGV: 当前时间, 租约有效期, 并发上限, 租约ID, 恢复周期, 每分钟请求数, 每分钟token数, 本次token数, 突发秒数
+# 返回 {状态, 秒数}：状态0为已获取（等待秒数后发起请求），1为暂停中或并发已满（等待后重试，-1表示轮询）
+_ACQUIRE_LUA = _THROTTLE_FACTOR_LUA + """
+local now = tonumber(ARGV[1])
+local blocked = tonumber(redis.call('HGET', KEYS[2], 'blocked_until'))
+if blocked and blocked > now then
+    return {'1', tostring(blocked - now)}
+end
+local factor = throttle_factor(KEYS[2], now, tonumber(ARGV[5]))
+local concurrency = tonumber(ARGV[3])
+if concurrency > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+    if redis.call('ZCARD', KEYS[1]) >= math.max(1, math.floor(concurrency * factor)) then
+        return {'1', '-1'}
+    end
+end
+local burst = tonumber(ARGV[9])
+local wait = 0
+if tonumber(ARGV[6]) > 0 then
+    wait = math.max(wait, take(KEYS[3], tonumber(ARGV[6]) * factor, 1, burst, now))
+end
+if tonumber(ARGV[7]) > 0 then
+    wait = math.max(wait, take(KEYS[4], tonumber(ARGV[7]) * factor, tonumber(ARGV[8]), burst, now))
+end
+if concurrency > 0 then
+    local ttl = wait + tonumber(ARGV[2])
+    redis.call('ZADD', KEYS[1], now + ttl, ARGV[4])
+    redis.call('EXPIRE', KEYS[1], math.ceil(ttl))
+end
+return {'0', tostring(wait)}
+"""
+
+# KEYS: token数令牌桶, 限流状态  ARGV: 当前时间, 每分钟token数, token数, 恢复周期, 突发秒数
+_SETTLE_LUA = _THROTTLE_FACTOR_LUA + """
+local now = tonumber(ARGV[1])
+local factor = throttle_factor(KEYS[2], now, tonumber(ARGV[4]))
+take(KEYS[1], tonumber(ARGV[2]) * factor, tonumber(ARGV[3]), tonumber(ARGV[5]), now)
+return 1
+"""
+
+# KEYS: 限流状态  ARGV: 当前时间, 最小比例, 恢复周期, 暂停秒数
+_PENALIZE_LUA = _THROTTLE_FACTOR_LUA + """
+local now = tonumber(ARGV[1])
+local blocked = tonumber(redis.call('HGET', KEYS[1], 'blocked_until')) or 0
+local factor = throttle_factor(KEYS[1], now, tonumber(ARGV[3]))
+if blocked <= now then
+    factor = math.max(tonumber(ARGV[2]), factor / 2)
+end
+redis.call('HSET', KEYS[1], 'factor', factor, 'ts', now, 'blocked_until', math.max(blocked, now + tonumber(ARGV[4])))
+redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[3]) * 10))
+return tostring(factor)
+"""
+
+
+class LLMRateLimiter:
+    """按API密钥限制所有worker的LLM请求并发数和速率"""
+
+    KEY_PREFIX = "llm:ratelimit"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scripts: Dict[str, Any] = {}
+        self._scripts_client = None
+        self._leases: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        # 限流状态：(比例, 收缩时间, 暂停截止时间)
+        self._throttle: Dict[str, Tuple[float, float, float]] = {}
+
+    @staticmethod
+    def limit_key(provider: str, api_key: str) -> str:
+        """限流键，使用密钥摘要，不在Redis中保存明文密钥"""
+        return hashlib.sha256(f"{provider}:{api_key}".encode("utf-8")).hexdigest()[:16]
+
+    def _key(self, kind: str, key: str) -> str:
+        return f"{self.KEY_PREFIX}:{kind}:{key}"
+
+    def _script(self, client, name: str, source: str):
+        with self._lock:
+            if self._scripts_client is not client:
+                self._scripts = {}
+                self._scripts_client = client
+            if name not in self._scripts:
+                self._scripts[name] = client.register_script(source)
+            return self._scripts[name]
+
+    async def _run_script(self, name: str, source: str, keys: List[str], args: List[Any]) -> Optional[Any]:
+        """执行Lua脚本，Redis不可用时返回None"""
+        client = get_redis()
+        if client is None:
+            return None
+        try:
+            return await asyncio.to_thread(self._script(client, name, source), keys=keys, args=args)
+        except Exception as e:
+            report_redis_error(e)
+            return None
+
+    # ---- 进程内回退，调用方需持有 self._lock ----
+
+    def _local_factor(self, key: str, now: float) -> float:
+        state = self._throttle.get(key)
+        if state is None:
+            return 1.0
+        factor, ts, _ = state
+        return min(1.0, factor * 2 ** ((now - ts) / settings.LLM_THROTTLE_RECOVERY_SECONDS))
+
+    def _local_take(self, bucket: str, per_minute: float, requested: float, now: float) -> float:
+        rate = per_minute / 60
+        capacity = max(1.0, rate * settings.LLM_RATE_LIMIT_BURST_SECONDS)
+        tokens, ts = self._buckets.get(bucket, (capacity, now))
+        tokens = min(capacity, tokens + max(0.0, now - ts) * rate) - requested
+        self._buckets[bucket] = (tokens, now)
+        return -tokens / rate if tokens < 0 else 0.0
+
+    def _local_acquire(self, key: str, limit: LLMRateLimit, lease: str, tokens: int, now: float) -> Tuple[int, float]:
+        with self._lock:
+            state = self._throttle.get(key)
+            if state is not None and state[2] > now:
+                return 1, state[2] - now
+            factor = self._local_factor(key, now)
+            if limit.max_concurrency:
+                leases = self._leases[key]
+                for expired in [item for item, expires in leases.items() if expires <= now]:
+                    del leases[expired]
+                if len(leases) >= max(1, math.floor(limit.max_concurrency * factor)):
+                    return 1, -1.0
+            wait = 0.0
+            if limit.requests_per_minute:
+                wait = max(wait, self._local_take(f"rpm:{key}", limit.requests_per_minute * factor, 1, now))
+            if limit.tokens_per_minute:
+                wait = max(wait, self._local_take(f"tpm:{key}", limit.tokens_per_minute * factor, tokens, now))
+            if limit.max_concurrency:
+                self._leases[key][lease] = now + wait + settings.LLM_RATE_LIMIT_LEASE_TTL
+            return 0, wait
+
+    # ---- 对外接口 ----
+
+    async def acquire(self, key: str, limit: LLMRateLimit, tokens: int = 0) -> Optional[str]:
+        """等待到可以发起请求为止
+
+        Args:
+            tokens: 本次请求的输入token数，配置了每分钟token数时从令牌桶中扣除
+
+        Returns:
+            Optional[str]: 并发名额的租约ID，请求结束后需调用 release；未配置并发上限时返回None
+        """
+        lease = uuid.uuid4().hex
+        while True:
+            now = time.time()
+            result = await self._run_script(
+                "acquire", _ACQUIRE_LUA,
+                [self._key("lease", key), self._key("throttle", key), self._key("rpm", key), self._key("tpm", key)],
+                [now, settings.LLM_RATE_LIMIT_LEASE_TTL, limit.max_concurrency or 0, lease,
+                 settings.LLM_THROTTLE_RECOVERY_SECONDS, limit.requests_per_minute or 0,
+                 limit.tokens_per_minute or 0, tokens, settings.LLM_RATE_LIMIT_BURST_SECONDS]
+            )
+            if result is not None:
+                status, wait = int(result[0]), float(result[1])
+            else:
+                status, wait = self._local_acquire(key, limit, lease, tokens, now)
+            if status == 0:
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                return lease if limit.max_concurrency else None
+            if wait < 0:
+                # 并发已满，加入随机抖动避免多个等待者同时重试
+                wait = settings.LLM_RATE_LIMIT_POLL_INTERVAL * (0.5 + random.random())
+            await asyncio.sleep(wait)
+
+    async def release(self, key: str, lease: Optional[str]) -> None:
+        """释放并发名额"""
+        if lease is None:
+            return
+        client = get_redis()
+        if client is not None:
+            try:
+                await asyncio.to_thread(client.zrem, self._key("lease", key), lease)
+            except Exception as e:
+                report_redis_error(e)
+        with self._lock:
+            leases = self._leases.get(key)
+            if leases is not None:
+                leases.pop(lease, None)
+                if not leases:
+                    del self._leases[key]
+
+    async def settle(self, key: str, limit: LLMRateLimit, tokens: int) -> None:
+        """请求完成后从token数令牌桶中扣除输出token数"""
+        if not limit.tokens_per_minute or tokens <= 0:
+            return
+        now = time.time()
+        result = await self._run_script(
+            "settle", _SETTLE_LUA,
+            [self._key("tpm", key), self._key("throttle", key)],
+            [now, limit.tokens_per_minute, tokens, settings.LLM_THROTTLE_RECOVERY_SECONDS,
+             settings.LLM_RATE_LIMIT_BURST_SECONDS]
+        )
+        if result is None:
+            with self._lock:
+                factor = self._local_factor(key, now)
+                self._local_take(f"tpm:{key}", limit.tokens_per_minute * factor, tokens, now)
+
+    async def penalize(self, key: str, retry_after: Optional[float] = None) -> float:
+        """提供者返回429后暂停该密钥的调用并收缩配额，返回收缩后的比例"""
+        now = time.time()
+        backoff = min(
+            retry_after if retry_after is not None else settings.LLM_RATE_LIMIT_DEFAULT_BACKOFF,
+            settings.LLM_RATE_LIMIT_MAX_BACKOFF
+        )
+        result = await self._run_script(
+            "penalize", _PENALIZE_LUA,
+            [self._key("throttle", key)],
+            [now, settings.LLM_THROTTLE_MIN_FACTOR, settings.LLM_THROTTLE_RECOVERY_SECONDS, backoff]
+        )
+        if result is not None:
+            factor = float(result)
+        else:
+            with self._lock:
+                blocked = self._throttle.get(key, (1.0, now, 0.0))[2]
+                factor = self._local_factor(key, now)
+                if blocked <= now:
+                    factor = max(settings.LLM_THROTTLE_MIN_FACTOR, factor / 2)
+                self._throttle[key] = (factor, now, max(blocked, now + backoff))
+        logger.warning(f"LLM提供者返回429，暂停 {backoff:.1f} 秒，配额收缩为 {factor:.0%}")
+        return factor
+
+
+# 创建全局实例
+llm_rate_limiter = LLMRateLimiter()
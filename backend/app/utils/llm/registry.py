@@ -0,0 +1,113 @@
+"""
+LLM提供者客户端注册表
+
+按 (provider, api_key, proxy_url) 缓存长期存活的SDK客户端/HTTP会话，复用其连接池（keep-alive），
+避免每次调用都重新创建客户端和进行TLS握手。缓存数量受 LLM_CLIENT_CACHE_SIZE 限制，超出时按LRU淘汰；
+被淘汰的客户端可能仍在其他线程的请求或流式输出中使用，不主动关闭，不再被引用后由垃圾回收释放连接。
+客户端本身是线程安全的，可被多个调度器工作线程同时使用。
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+ClientKey = Tuple[str, str, Optional[str]]
+
+
+def build_http_client() -> httpx.Client:
+    """创建带连接池限制的HTTP客户端，供OpenAI兼容SDK使用"""
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(settings.LLM_HTTP_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT),
+        follow_redirects=True
+    )
+
+
+def build_timeout(timeout: Tuple[float, float]) -> httpx.Timeout:
+    """把 (连接超时, 读取超时) 转换为SDK单次请求的超时参数"""
+    connect, read = timeout
+    return httpx.Timeout(read, connect=connect)
+
+
+def fill_usage(usage: Optional[Dict[str, int]], response: Any) -> None:
+    """把OpenAI兼容SDK响应中的token用量写入调用方传入的字典"""
+    if usage is None or getattr(response, "usage", None) is None:
+        return
+    usage["prompt_tokens"] = response.usage.prompt_tokens or 0
+    usage["completion_tokens"] = response.usage.completion_tokens or 0
+
+
+class LLMClientRegistry:
+    """按渠道缓存提供者客户端的LRU注册表"""
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size or settings.LLM_CLIENT_CACHE_SIZE
+        self._clients: "OrderedDict[ClientKey, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        provider: str,
+        api_key: str,
+        proxy_url: Optional[str],
+        factory: Callable[[], Any]
+    ) -> Any:
+        """获取渠道对应的客户端，不存在时调用 factory 创建"""
+        key = (provider, api_key, proxy_url or None)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+
+        # 在锁外创建客户端，避免阻塞其他渠道；并发创建时保留先放入的一个
+        client = factory()
+        duplicate = None
+        with self._lock:
+            existing = self._clients.get(key)
+            if existing is not None:
+                self._clients.move_to_end(key)
+                duplicate, client = client, existing
+            else:
+                self._clients[key] = client
+                while len(self._clients) > self.max_size:
+                    self._clients.popitem(last=False)
+        if duplicate is not None:
+            # 新建的客户端尚未交给任何调用方，可以直接关闭
+            self._close(duplicate)
+        return client
+
+    def clear(self) -> None:
+        """关闭并移除所有客户端（仅在没有进行中的调用时使用，如进程退出）"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            self._close(client)
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    @staticmethod
+    def _close(client: Any) -> None:
+        close = getattr(client, "close", None)
+        if close is None:
+            return
+        try:
+            close()
+        except Exception as e:
+            logger.warning(f"关闭LLM客户端失败: {str(e)}")
+
+
+# 创建全局实例
+llm_client_registry = LLMClientRegistry()
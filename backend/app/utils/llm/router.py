@@ -0,0 +1,386 @@
+"""
+LLM渠道路由模块
+
+功能映射可以配置由多个渠道组成的渠道池（llm_feature_mapping_channels），调用时按路由策略排列渠道，
+依次尝试直到成功，单个渠道变慢或不可用时自动切换到其他渠道：
+
+- priority：按配置顺序
+- weighted：按权重随机排列
+- latency：按实际调用的延迟和错误率（EWMA）排序，分数 = 延迟 × (1 + LLM_ROUTER_ERROR_PENALTY × 错误率) / 权重，
+  另有 LLM_ROUTER_EXPLORE_RATIO 的请求随机优先其他健康渠道，使其延迟统计保持更新
+
+渠道连续失败 LLM_CIRCUIT_FAILURE_THRESHOLD 次后熔断 LLM_CIRCUIT_OPEN_SECONDS 秒，熔断期间排在所有渠道之后（只在其他渠道都失败时尝试）；
+到期后放行一个探测请求并排在最前，成功则恢复，失败则继续熔断。
+统计和熔断状态保存在Redis中由所有worker共享，Redis不可用时回退到进程内状态。
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.redis import get_redis, report_redis_error
+from app.models.llm_feature_mapping import RoutingStrategy
+from .client import LLMClient
+from .rate_limiter import LLMRateLimit
+
+logger = logging.getLogger(__name__)
+
+# (渠道, 权重)
+PoolEntry = Tuple[Any, int]
+
+# KEYS: 渠道状态  ARGV: 当前时间, 是否成功, 延迟(毫秒，-1表示没有), 平滑系数, 熔断阈值, 熔断秒数, 过期秒数
+# 失败时的延迟（如超时）只在已有均值且高于均值时计入，返回连续失败次数
+_RECORD_LUA = """
+local now = tonumber(ARGV[1])
+local alpha = tonumber(ARGV[4])
+local latency = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'latency', 'error', 'failures')
+local avg = tonumber(state[1])
+local err = tonumber(state[2]) or 0
+local failures = tonumber(state[3]) or 0
+if latency >= 0 and (ARGV[2] == '1' or (avg and latency > avg)) then
+    if avg then
+        avg = avg + alpha * (latency - avg)
+    else
+        avg = latency
+    end
+    redis.call('HSET', KEYS[1], 'latency', avg)
+end
+if ARGV[2] == '1' then
+    failures = 0
+    redis.call('HSET', KEYS[1], 'error', err * (1 - alpha), 'failures', 0, 'open_until', 0)
+else
+    failures = failures + 1
+    redis.call('HSET', KEYS[1], 'error', err + alpha * (1 - err), 'failures', failures)
+    if failures >= tonumber(ARGV[5]) then
+        redis.call('HSET', KEYS[1], 'open_until', now + tonumber(ARGV[6]))
+    end
+end
+redis.call('HINCRBY', KEYS[1], 'samples', 1)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[7]))
+return failures
+"""
+
+# KEYS: 渠道状态  ARGV: 当前时间, 探测有效期
+# 熔断到期且没有进行中的探测时占用探测名额，返回1；否则返回0
+_PROBE_LUA = """
+local now = tonumber(ARGV[1])
+local state = redis.call('HMGET', KEYS[1], 'open_until', 'probe_until')
+local open_until = tonumber(state[1]) or 0
+local probe_until = tonumber(state[2]) or 0
+if open_until == 0 or open_until > now or probe_until > now then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'probe_until', now + tonumber(ARGV[2]))
+return 1
+"""
+
+
+@dataclass
+class ChannelHealth:
+    """渠道的实时统计"""
+    latency_ms: Optional[float] = None  # 延迟EWMA
+    error_rate: float = 0.0  # 错误率EWMA
+    failures: int = 0  # 连续失败次数
+    open_until: float = 0.0  # 熔断截止时间，0表示未熔断
+    probe_until: float = 0.0  # 进行中的探测请求的截止时间
+    samples: int = 0  # 调用次数
+
+    @classmethod
+    def from_hash(cls, data: Dict[Any, Any]) -> "ChannelHealth":
+        data = {(k.decode() if isinstance(k, bytes) else k): v for k, v in data.items()}
+        return cls(
+            latency_ms=float(data["latency"]) if data.get("latency") is not None else None,
+            error_rate=float(data.get("error") or 0),
+            failures=int(float(data.get("failures") or 0)),
+            open_until=float(data.get("open_until") or 0),
+            probe_until=float(data.get("probe_until") or 0),
+            samples=int(data.get("samples") or 0)
+        )
+
+    def state(self, now: float) -> str:
+        """closed：正常，open：熔断中，half_open：熔断到期，等待探测"""
+        if not self.open_until:
+            return "closed"
+        return "open" if self.open_until > now else "half_open"
+
+    def to_dict(self, now: Optional[float] = None) -> Dict[str, Any]:
+        return {
+            "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "failures": self.failures,
+            "state": self.state(now or time.time()),
+            "samples": self.samples
+        }
+
+
+class LLMChannelRouter:
+    """按实时延迟、错误率和熔断状态排列渠道池"""
+
+    KEY_PREFIX = "llm:router"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scripts: Dict[str, Any] = {}
+        self._scripts_client = None
+        self._local: Dict[int, ChannelHealth] = {}
+
+    def _key(self, channel_id: int) -> str:
+        return f"{self.KEY_PREFIX}:{channel_id}"
+
+    def _script(self, client, name: str, source: str):
+        with self._lock:
+            if self._scripts_client is not client:
+                self._scripts = {}
+                self._scripts_client = client
+            if name not in self._scripts:
+                self._scripts[name] = client.register_script(source)
+            return self._scripts[name]
+
+    async def _run_script(self, name: str, source: str, keys: List[str], args: List[Any]) -> Optional[Any]:
+        """执行Lua脚本，Redis不可用时返回None"""
+        client = get_redis()
+        if client is None:
+            return None
+        try:
+            return await asyncio.to_thread(self._script(client, name, source), keys=keys, args=args)
+        except Exception as e:
+            report_redis_error(e)
+            return None
+
+    # ---- 统计 ----
+
+    async def get_health(self, channel_ids: Sequence[int]) -> Dict[int, ChannelHealth]:
+        """批量读取渠道统计，没有记录的渠道返回默认值"""
+        client = get_redis()
+        if client is not None and channel_ids:
+            def fetch():
+                pipe = client.pipeline()
+                for channel_id in channel_ids:
+                    pipe.hgetall(self._key(channel_id))
+                return pipe.execute()
+            try:
+                rows = await asyncio.to_thread(fetch)
+                return {channel_id: ChannelHealth.from_hash(row) for channel_id, row in zip(channel_ids, rows)}
+            except Exception as e:
+                report_redis_error(e)
+        with self._lock:
+            return {
+                channel_id: ChannelHealth(**vars(self._local[channel_id])) if channel_id in self._local else ChannelHealth()
+                for channel_id in channel_ids
+            }
+
+    async def record(self, channel_id: int, success: bool, latency_ms: Optional[float] = None) -> None:
+        """记录一次调用的结果，latency_ms 为空时只更新错误率"""
+        now = time.time()
+        alpha = settings.LLM_ROUTER_EWMA_ALPHA
+        threshold = settings.LLM_CIRCUIT_FAILURE_THRESHOLD
+        result = await self._run_script(
+            "record", _RECORD_LUA,
+            [self._key(channel_id)],
+            [now, 1 if success else 0, latency_ms if latency_ms is not None else -1, alpha, threshold,
+             settings.LLM_CIRCUIT_OPEN_SECONDS, settings.LLM_ROUTER_STATS_TTL]
+        )
+        if result is not None:
+            failures = int(result)
+        else:
+            with self._lock:
+                health = self._local.setdefault(channel_id, ChannelHealth())
+                if latency_ms is not None and (
+                    success or (health.latency_ms is not None and latency_ms > health.latency_ms)
+                ):
+                    if health.latency_ms is None:
+                        health.latency_ms = latency_ms
+                    else:
+                        health.latency_ms += alpha * (latency_ms - health.latency_ms)
+                if success:
+                    health.error_rate *= 1 - alpha
+                    health.failures = 0
+                    health.open_until = 0.0
+                else:
+                    health.error_rate += alpha * (1 - health.error_rate)
+                    health.failures += 1
+                    if health.failures >= threshold:
+                        health.open_until = now + settings.LLM_CIRCUIT_OPEN_SECONDS
+                health.samples += 1
+                failures = health.failures
+        if not success and failures >= threshold:
+            logger.warning(
+                f"LLM渠道 {channel_id} 连续失败 {failures} 次，熔断 {settings.LLM_CIRCUIT_OPEN_SECONDS} 秒"
+            )
+
+    async def _claim_probe(self, channel_id: int, now: float) -> bool:
+        """熔断到期的渠道只放行一个探测请求"""
+        result = await self._run_script(
+            "probe", _PROBE_LUA, [self._key(channel_id)], [now, settings.LLM_CIRCUIT_OPEN_SECONDS]
+        )
+        if result is not None:
+            return int(result) == 1
+        with self._lock:
+            health = self._local.get(channel_id)
+            if health is None or health.state(now) != "half_open" or health.probe_until > now:
+                return False
+            health.probe_until = now + settings.LLM_CIRCUIT_OPEN_SECONDS
+            return True
+
+    # ---- 路由 ----
+
+    async def order(self, pool: Sequence[PoolEntry], strategy: Optional[str] = None) -> List[Any]:
+        """按路由策略排列渠道池，返回依次尝试的渠道列表
+
+        熔断到期的探测渠道排在最前，正常渠道按策略排序，熔断中的渠道排在最后。
+        """
+        if len(pool) <= 1:
+            return [channel for channel, _ in pool]
+        now = time.time()
+        health = await self.get_health([channel.id for channel, _ in pool])
+        probes, closed, opened = [], [], []
+        for channel, weight in pool:
+            state = health[channel.id].state(now)
+            if state == "closed":
+                closed.append((channel, max(weight or 1, 1)))
+            elif state == "half_open" and await self._claim_probe(channel.id, now):
+                probes.append(channel)
+            else:
+                opened.append(channel)
+        return probes + self._sort(closed, health, strategy) + opened
+
+    @staticmethod
+    def _sort(entries: List[PoolEntry], health: Dict[int, ChannelHealth], strategy: Optional[str]) -> List[Any]:
+        if strategy == RoutingStrategy.PRIORITY:
+            return [channel for channel, _ in entries]
+        if strategy == RoutingStrategy.WEIGHTED:
+            # 加权随机排列：随机数^(1/权重) 越大越靠前
+            return [channel for channel, weight in sorted(
+                entries, key=lambda entry: random.random() ** (1 / entry[1]), reverse=True
+            )]
+
+        def score(entry: PoolEntry) -> float:
+            channel, weight = entry
+            stats = health[channel.id]
+            latency = stats.latency_ms if stats.latency_ms is not None else settings.LLM_ROUTER_DEFAULT_LATENCY_MS
+            return latency * (1 + settings.LLM_ROUTER_ERROR_PENALTY * stats.error_rate) / weight
+
+        channels = [channel for channel, _ in sorted(entries, key=score)]
+        if len(channels) > 1 and random.random() < settings.LLM_ROUTER_EXPLORE_RATIO:
+            channels.insert(0, channels.pop(random.randrange(1, len(channels))))
+        return channels
+
+
+def _channel_kwargs(channel: Any, usage_context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """渠道对应的调用参数"""
+    return {
+        "api_key": channel.api_key,
+        "provider": channel.model_type,
+        "model": channel.model,
+        "proxy_url": channel.proxy_url,
+        "rate_limit": LLMRateLimit.from_channel(channel),
+        "usage_context": {**usage_context, "channel_id": channel.id} if usage_context else None
+    }
+
+
+async def agenerate_routed(
+    pool: Sequence[PoolEntry],
+    prompt: str,
+    message: str,
+    *,
+    strategy: Optional[str] = None,
+    cache: bool = False,
+    usage_context: Optional[Dict[str, Any]] = None,
+    **kwargs: Any
+) -> str:
+    """按路由策略在渠道池中调用 LLMClient.agenerate，失败（包括超时和重试后仍返回429）时切换到下一个渠道
+
+    Args:
+        pool: (渠道, 权重) 列表，见 crud_feature_mapping.get_channel_pool
+        strategy: 路由策略，见 RoutingStrategy
+
+    Raises:
+        ValueError: 渠道池为空
+        Exception: 所有渠道都失败时抛出最后一个渠道的异常
+    """
+    channels = await llm_channel_router.order(pool, strategy)
+    if not channels:
+        raise ValueError("功能映射没有可用的渠道")
+    last_error: Optional[Exception] = None
+    for channel in channels:
+        metrics: Dict[str, Any] = {}
+        try:
+            response = await LLMClient.agenerate(
+                prompt=prompt,
+                message=message,
+                timeout=channel.request_timeout,
+                connect_timeout=channel.connect_timeout,
+                cache=cache,
+                metrics=metrics,
+                **_channel_kwargs(channel, usage_context),
+                **kwargs
+            )
+        except Exception as e:
+            # 从取得限流配额后开始计时，排队等待自身限流的渠道不应被视为慢渠道；
+            # 未取得配额就失败时只计入错误率
+            started = metrics.get("started")
+            latency_ms = (time.monotonic() - started) * 1000 if started is not None else None
+            await llm_channel_router.record(channel.id, False, latency_ms)
+            if len(channels) > 1:
+                logger.warning(f"LLM渠道 {channel.id} 调用失败，切换到下一个渠道: {str(e)}")
+            last_error = e
+            continue
+        # 命中缓存的调用不反映渠道延迟
+        if not metrics.get("cached"):
+            await llm_channel_router.record(channel.id, True, metrics.get("duration_ms"))
+        return response
+    raise last_error
+
+
+async def generate_stream_routed(
+    pool: Sequence[PoolEntry],
+    prompt: str,
+    message: str,
+    *,
+    strategy: Optional[str] = None,
+    usage_context: Optional[Dict[str, Any]] = None,
+    **kwargs: Any
+) -> AsyncGenerator[str, None]:
+    """按路由策略在渠道池中调用 LLMClient.generate_stream
+
+    收到第一个数据块之前失败时切换到下一个渠道，之后失败时直接抛出异常。
+    流式调用的耗时取决于输出长度，只用于统计错误率，不计入延迟。
+    """
+    channels = await llm_channel_router.order(pool, strategy)
+    if not channels:
+        raise ValueError("功能映射没有可用的渠道")
+    for index, channel in enumerate(channels):
+        stream = LLMClient.generate_stream(prompt, message, **_channel_kwargs(channel, usage_context), **kwargs)
+        try:
+            first = await stream.__anext__()
+        except StopAsyncIteration:
+            await llm_channel_router.record(channel.id, True)
+            return
+        except Exception as e:
+            await stream.aclose()
+            await llm_channel_router.record(channel.id, False)
+            if index == len(channels) - 1:
+                raise
+            logger.warning(f"LLM渠道 {channel.id} 调用失败，切换到下一个渠道: {str(e)}")
+            continue
+
+        try:
+            yield first
+            async for chunk in stream:
+                yield chunk
+        except Exception:
+            await llm_channel_router.record(channel.id, False)
+            raise
+        finally:
+            await stream.aclose()
+        await llm_channel_router.record(channel.id, True)
+        return
+
+
+# 创建全局实例
+llm_channel_router = LLMChannelRouter()
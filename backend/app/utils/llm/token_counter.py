@@ -0,0 +1,116 @@
+"""
+Token 计数与输入预算
+
+安装 tiktoken 时，OpenAI 兼容渠道按其分词器计数；其他提供商、未安装 tiktoken 或分词器数据无法下载（离线）时
+按字符估算：CJK字符约1个token，其他字符约4个字符1个token。计数只用于预算控制和用量统计，允许少量误差。
+"""
+import logging
+import math
+import re
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    import tiktoken
+except ImportError:  # 可选依赖
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# 使用 tiktoken 分词器的提供者，None 表示调用方未指定提供者
+TIKTOKEN_PROVIDERS = (None, "openai")
+# 模型名称无法识别（如通过代理地址接入的兼容模型）时使用的编码
+DEFAULT_ENCODING = "cl100k_base"
+TRUNCATION_MARK = "\n……（内容过长，已截断）"
+
+_CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+
+_encodings: Dict[Optional[str], Any] = {}
+_encodings_lock = threading.Lock()
+
+
+def _get_encoding(model: Optional[str], provider: Optional[str]) -> Any:
+    """返回模型对应的 tiktoken 编码，不可用时返回None（结果按模型缓存）"""
+    if tiktoken is None or not settings.LLM_TOKENIZER_ENABLED or provider not in TIKTOKEN_PROVIDERS:
+        return None
+    with _encodings_lock:
+        if model in _encodings:
+            return _encodings[model]
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(DEFAULT_ENCODING)
+        except KeyError:
+            encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        # 首次使用需下载分词器数据，离线时改为估算
+        logger.warning(f"加载分词器失败，按字符估算token数: {str(e)}")
+        encoding = None
+    with _encodings_lock:
+        _encodings[model] = encoding
+    return encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """按字符估算token数"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def count_tokens(text: Optional[str], model: Optional[str] = None, provider: Optional[str] = None) -> int:
+    """计算文本的token数"""
+    if not text:
+        return 0
+    encoding = _get_encoding(model, provider)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(
+    text: Optional[str],
+    max_tokens: int,
+    model: Optional[str] = None,
+    provider: Optional[str] = None
+) -> str:
+    """保留文本开头不超过 max_tokens 个token的部分，截断时在末尾附加截断标记"""
+    text = text or ""
+    if count_tokens(text, model, provider) <= max_tokens:
+        return text
+    limit = max_tokens - count_tokens(TRUNCATION_MARK, model, provider)
+    if limit <= 0:
+        return ""
+    encoding = _get_encoding(model, provider)
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:limit]) + TRUNCATION_MARK
+    # 估算值随前缀长度单调增加，逐字符累计到超出预算为止，只需扫描保留的部分
+    cost = 0.0
+    end = 0
+    for end, char in enumerate(text):
+        cost += 1 if _CJK_RE.match(char) else 0.25
+        if math.ceil(cost) > limit:
+            break
+    return text[:end] + TRUNCATION_MARK
+
+
+def fit_to_budget(
+    prompt: str,
+    message: str,
+    max_input_tokens: Optional[int] = None,
+    model: Optional[str] = None,
+    provider: Optional[str] = None
+) -> Tuple[str, bool]:
+    """截断消息，使提示词和消息的token数之和不超过输入预算
+
+    Args:
+        max_input_tokens: 输入token上限，默认 LLM_MAX_INPUT_TOKENS
+
+    Returns:
+        (截断后的消息, 是否截断)
+    """
+    budget = (max_input_tokens or settings.LLM_MAX_INPUT_TOKENS) - count_tokens(prompt, model, provider)
+    fitted = truncate_to_tokens(message, max(budget, 0), model, provider)
+    return fitted, fitted != message
@@ -0,0 +1,49 @@
+"""
+LLM调用用量记录
+
+调用方通过 usage_context 传入 {"user_id", "channel_id", "feature_type", "truncated"}，
+LLMClient 在调用结束后写入 llm_usage_logs；写入失败只记录日志，不影响调用结果。
+"""
+import logging
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.crud.llm_usage import crud_llm_usage
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def record_usage(
+    context: Optional[Dict[str, Any]],
+    *,
+    provider: str,
+    model: Optional[str],
+    prompt_tokens: int,
+    completion_tokens: int,
+    estimated: bool,
+    cached: bool = False,
+    duration_ms: Optional[int] = None
+) -> None:
+    """写入一次调用的用量，context 为空（如测试渠道）时不记录"""
+    if not context or not context.get("user_id") or not settings.LLM_USAGE_LOG_ENABLED:
+        return
+    feature_type = context.get("feature_type")
+    try:
+        with SessionLocal() as db:
+            crud_llm_usage.record(
+                db,
+                user_id=context["user_id"],
+                channel_id=context.get("channel_id"),
+                feature_type=getattr(feature_type, "value", feature_type),
+                provider=provider,
+                model=model,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                estimated=estimated,
+                cached=cached,
+                truncated=bool(context.get("truncated")),
+                duration_ms=duration_ms
+            )
+    except Exception as e:
+        logger.error(f"记录LLM用量失败: {str(e)}")
@@ -0,0 +1,126 @@
+"""
+邮件日期解析性能基准
+
+对比依次尝试各解析方式的旧实现与带策略记忆、RFC 2822 快速路径的 DateParser。
+语料按真实邮件中常见的比例混合：标准 RFC 2822（含/不含星期、带时区注释）、
+ISO 8601、Received 头、常见本地格式以及少量无法解析的值。
+
+用法（在 backend 目录下，需可正常加载 .env 配置）：
+    python benchmarks/date_parser_benchmark.py --dates 20000 --rounds 3
+"""
+import argparse
+import logging
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dateutil import parser  # noqa: E402
+
+from app.utils.email.date_parser import DateParser  # noqa: E402
+
+_DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+_MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+_ZONES = ["+0800", "+0000", "-0700", "-0000", "GMT", "UT", "EST"]
+
+# (格式化函数, 权重)
+_TEMPLATES = [
+    (lambda dt, z: f"{_DAYS[dt.weekday()]}, {dt.day} {_MONTHS[dt.month - 1]} {dt:%Y %H:%M:%S} {z}", 50),
+    (lambda dt, z: f"{_DAYS[dt.weekday()]}, {dt:%d} {_MONTHS[dt.month - 1]} {dt:%Y %H:%M:%S} +0800 (CST)", 15),
+    (lambda dt, z: f"{dt.day} {_MONTHS[dt.month - 1]} {dt:%Y %H:%M:%S} {z}", 10),
+    (lambda dt, z: f"{_DAYS[dt.weekday()]},{dt.day} {_MONTHS[dt.month - 1]} {dt:%Y %H:%M} {z}", 3),
+    (lambda dt, z: f"{dt:%Y-%m-%dT%H:%M:%SZ}", 5),
+    (lambda dt, z: f"{dt:%Y-%m-%dT%H:%M:%S}+08:00", 5),
+    (lambda dt, z: f"from mail.example.com by mx.example.com; {_DAYS[dt.weekday()]}, {dt.day} "
+                   f"{_MONTHS[dt.month - 1]} {dt:%Y %H:%M:%S} +0800", 5),
+    (lambda dt, z: f"{dt:%Y-%m-%d %H:%M:%S}", 5),
+    (lambda dt, z: "unknown date", 2),
+]
+
+
+def build_corpus(count: int, seed: int = 42) -> List[str]:
+    """生成混合格式的日期语料"""
+    rng = random.Random(seed)
+    formats = [template for template, _ in _TEMPLATES]
+    weights = [weight for _, weight in _TEMPLATES]
+    start = datetime(2015, 1, 1)
+    corpus = []
+    for _ in range(count):
+        dt = start + timedelta(seconds=rng.randint(0, 10 * 365 * 86400))
+        corpus.append(rng.choices(formats, weights)[0](dt, rng.choice(_ZONES)))
+    return corpus
+
+
+def legacy_parse_email_date(date_str: str) -> datetime:
+    """旧实现：每次按固定顺序尝试全部解析方式"""
+    try:
+        try:
+            return parsedate_to_datetime(date_str).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            pass
+        try:
+            return datetime.strptime(date_str, '%Y-%m-%dT%H:%M:%SZ')
+        except ValueError:
+            pass
+        try:
+            return parser.isoparse(date_str).replace(tzinfo=None)
+        except (ValueError, TypeError):
+            pass
+        try:
+            match = re.search(r";\s*(?P<date>[\w, :+\-]+)$", date_str)
+            if match:
+                date_str = match.group('date').strip()
+            return datetime.strptime(date_str, '%a, %d %b %Y %H:%M:%S %z').replace(tzinfo=None)
+        except ValueError:
+            pass
+        for fmt in ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M', '%Y-%m-%d']:
+            try:
+                return datetime.strptime(date_str, fmt)
+            except ValueError:
+                continue
+        return None
+    except Exception:
+        return None
+
+
+def run(name: str, func: Callable[[str], object], corpus: List[str], rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for date_str in corpus:
+            func(date_str)
+        best = min(best, time.perf_counter() - start)
+    per_date = best / len(corpus) * 1e6
+    print(f"{name:<12} {best:8.3f}s  {per_date:8.2f}us/个")
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="邮件日期解析性能基准")
+    arg_parser.add_argument("--dates", type=int, default=20000, help="语料日期数")
+    arg_parser.add_argument("--rounds", type=int, default=3, help="重复轮数，取最快一轮")
+    args = arg_parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    corpus = build_corpus(args.dates)
+    date_parser = DateParser()
+    mismatches = sum(
+        1 for date_str in corpus
+        if legacy_parse_email_date(date_str) != date_parser.parse(date_str)
+    )
+    print(f"语料: {len(corpus)} 个日期, 格式特征 {len({DateParser.signature(d) for d in corpus})} 种, "
+          f"结果不一致 {mismatches} 个")
+
+    legacy = run("legacy", legacy_parse_email_date, corpus, args.rounds)
+    memoized = run("DateParser", date_parser.parse, corpus, args.rounds)
+    print(f"提升: {(1 - memoized / legacy) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
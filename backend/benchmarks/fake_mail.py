@@ -0,0 +1,682 @@
+"""
+本地模拟邮件服务器
+
+- FakeIMAPServer：基于 asyncio 的 IMAP4rev1 子集，覆盖 AsyncIMAPClient 用到的全部命令
+  （LOGIN、CAPABILITY、ENABLE、SELECT、LIST、UID SEARCH、UID FETCH（含 CHANGEDSINCE / VANISHED）、IDLE、LOGOUT）
+- FakeSMTPServer：SMTP 收信端（EHLO、AUTH PLAIN/LOGIN、MAIL、RCPT、DATA），收到的邮件可直接投递到模拟邮箱
+- FakeMailbox：内存中的邮箱，可按数量、MIME 复杂度批量生成合成邮件，并模拟新邮件、标志变化、删除和 UIDVALIDITY 变化
+
+仅用于基准测试和本地调试，不校验密码，不支持 TLS。
+
+用法：
+    mailbox = FakeMailbox()
+    seed_folder(mailbox.folder("INBOX"), count=1000, complexity="mixed")
+    async with FakeIMAPServer(mailbox, latency=0.005) as imap, FakeSMTPServer(mailbox) as smtp:
+        ...  # 使用 imap.port / smtp.port 连接
+"""
+import asyncio
+import base64
+import random
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from email import policy
+from email.header import Header
+from email.mime.application import MIMEApplication
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import format_datetime
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+DEFAULT_CAPABILITIES = ("IMAP4rev1", "IDLE", "ENABLE", "CONDSTORE", "QRESYNC")
+
+_LITERAL_RE = re.compile(rb'\{(\d+)\+?\}\r\n$')
+_TOKEN_RE = re.compile(r'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()]+')
+
+WORDS = "邮件 同步 测试 report meeting invoice 项目 进度 please review the attached 文件 合同 schedule 预算 update".split()
+COMPLEXITIES = ("simple", "mixed", "heavy")
+
+
+# ---- 邮箱 ----
+
+@dataclass
+class FakeMessage:
+    """模拟邮件"""
+    uid: int
+    data: bytes
+    flags: Set[str] = field(default_factory=set)
+    modseq: int = 1
+    date: datetime = field(default_factory=datetime.now)
+
+
+class FakeFolder:
+    """模拟文件夹，维护UID、MODSEQ和已删除UID（用于 VANISHED 响应）"""
+
+    def __init__(self, name: str, uidvalidity: int = 1):
+        self.name = name
+        self.uidvalidity = uidvalidity
+        self.uidnext = 1
+        self.highestmodseq = 1
+        self.messages: Dict[int, FakeMessage] = {}
+        self.expunged: Dict[int, int] = {}
+        self.watchers: Set[asyncio.Queue] = set()
+
+    def _next_modseq(self) -> int:
+        self.highestmodseq += 1
+        return self.highestmodseq
+
+    def append(self, data: bytes, flags: Optional[Set[str]] = None, date: Optional[datetime] = None) -> int:
+        """追加一封邮件，返回UID，并通知处于IDLE的连接"""
+        uid = self.uidnext
+        self.uidnext += 1
+        self.messages[uid] = FakeMessage(
+            uid=uid,
+            data=data,
+            flags=set(flags or ()),
+            modseq=self._next_modseq(),
+            date=date or datetime.now()
+        )
+        self._notify(b'* %d EXISTS\r\n' % len(self.messages))
+        return uid
+
+    def set_flags(self, uid: int, add: Set[str] = frozenset(), remove: Set[str] = frozenset()) -> None:
+        """修改邮件标志"""
+        message = self.messages[uid]
+        message.flags = (message.flags | set(add)) - set(remove)
+        message.modseq = self._next_modseq()
+        self._notify(b'* %d FETCH (FLAGS (%s))\r\n' % (self.seq_of(uid), " ".join(sorted(message.flags)).encode()))
+
+    def expunge(self, uid: int) -> None:
+        """删除邮件"""
+        seq = self.seq_of(uid)
+        del self.messages[uid]
+        self.expunged[uid] = self._next_modseq()
+        self._notify(b'* %d EXPUNGE\r\n' % seq)
+
+    def reset_uidvalidity(self) -> None:
+        """模拟服务器重建文件夹：UIDVALIDITY 变化，全部邮件重新编号"""
+        messages = list(self.messages.values())
+        self.uidvalidity += 1
+        self.uidnext = 1
+        self.messages = {}
+        self.expunged = {}
+        for message in messages:
+            message.uid = self.uidnext
+            self.uidnext += 1
+            self.messages[message.uid] = message
+
+    def seq_of(self, uid: int) -> int:
+        return list(self.messages).index(uid) + 1
+
+    def max_uid(self) -> int:
+        return next(reversed(self.messages), 0)
+
+    def _notify(self, line: bytes) -> None:
+        for queue in self.watchers:
+            queue.put_nowait(line)
+
+
+class FakeMailbox:
+    """模拟邮箱，包含若干文件夹"""
+
+    def __init__(self, uidvalidity: int = 1):
+        self.uidvalidity = uidvalidity
+        self.folders: Dict[str, FakeFolder] = {}
+
+    def folder(self, name: str) -> FakeFolder:
+        """获取文件夹，不存在时创建"""
+        if name not in self.folders:
+            self.folders[name] = FakeFolder(name, self.uidvalidity)
+        return self.folders[name]
+
+
+# ---- 合成邮件 ----
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def build_message(
+    rng: random.Random,
+    index: int,
+    complexity: str = "mixed",
+    date: Optional[datetime] = None,
+    message_id: Optional[str] = None,
+    subject: Optional[str] = None,
+    in_reply_to: Optional[str] = None
+) -> bytes:
+    """生成一封合成邮件
+
+    Args:
+        rng: 随机数生成器
+        index: 序号，用于生成唯一的 Message-ID
+        complexity: simple（纯文本）、mixed（常见的 HTML/纯文本双正文及小附件）、
+            heavy（编码主题、内嵌图片、嵌套 multipart、较大附件）
+        date: 邮件时间
+        message_id: Message-ID，默认按序号生成
+        subject: 主题，默认随机生成
+        in_reply_to: 被回复邮件的 Message-ID，用于生成 In-Reply-To/References
+    """
+    if complexity not in COMPLEXITIES:
+        raise ValueError(f"未知的邮件复杂度: {complexity}")
+    text = "\n".join(_sentence(rng, 12) for _ in range(rng.randint(5, 40)))
+    html = "<html><body>" + "".join(f"<p>{line}</p>" for line in text.split("\n")) + "</body></html>"
+    kind = rng.random()
+
+    if complexity == "simple" or (complexity == "mixed" and kind < 0.4):
+        msg = MIMEText(text, "plain", "utf-8")
+    else:
+        alternative = MIMEMultipart("alternative")
+        alternative.attach(MIMEText(text, "plain", "utf-8"))
+        if complexity == "heavy":
+            related = MIMEMultipart("related")
+            related.attach(MIMEText(html.replace("</body>", '<img src="cid:logo"></body>'), "html", "utf-8"))
+            image = MIMEImage(b"\x89PNG\r\n\x1a\n" + rng.randbytes(8 * 1024), "png")
+            image.add_header("Content-ID", "<logo>")
+            related.attach(image)
+            alternative.attach(related)
+        else:
+            alternative.attach(MIMEText(html, "html", "utf-8"))
+
+        attachments = 0
+        if complexity == "heavy":
+            attachments = rng.randint(1, 3)
+        elif kind > 0.7:
+            attachments = 1
+        if attachments:
+            msg = MIMEMultipart("mixed")
+            msg.attach(alternative)
+            sizes = [16, 64, 256] if complexity == "heavy" else [4, 16, 64]
+            for n in range(attachments):
+                part = MIMEApplication(rng.randbytes(rng.choice(sizes) * 1024), "octet-stream")
+                filename = f"附件{index}_{n}.bin" if complexity == "heavy" else f"file{index}_{n}.bin"
+                part.add_header("Content-Disposition", "attachment", filename=("utf-8", "", filename))
+                msg.attach(part)
+        else:
+            msg = alternative
+
+    subject = subject or f"{_sentence(rng, 4)} #{index}"
+    if in_reply_to:
+        msg["In-Reply-To"] = in_reply_to
+        msg["References"] = in_reply_to
+    # heavy 邮件的主题总是按 RFC 2047 编码，其余仅在包含非ASCII字符时编码
+    msg["Subject"] = Header(subject, "utf-8").encode() if complexity == "heavy" or not subject.isascii() else subject
+    msg["From"] = f"sender{rng.randint(1, 50)}@example.com"
+    msg["To"] = "bench@example.com"
+    if complexity != "simple" and rng.random() < 0.3:
+        msg["Cc"] = ", ".join(f"cc{rng.randint(1, 50)}@example.com" for _ in range(rng.randint(1, 3)))
+    msg["Date"] = format_datetime((date or datetime.now()).astimezone())
+    msg["Message-ID"] = message_id or f"<bench.{index}@example.com>"
+    return msg.as_bytes(policy=policy.SMTP)
+
+
+def seed_folder(
+    folder: FakeFolder,
+    count: int,
+    complexity: str = "mixed",
+    seed: int = 42,
+    start_index: int = 0,
+    read_ratio: float = 0.6,
+    flagged_ratio: float = 0.05,
+    reply_ratio: float = 0.3
+) -> List[int]:
+    """向文件夹追加合成邮件，按时间先后排列，约 reply_ratio 比例为对之前邮件的回复，返回新邮件UID"""
+    rng = random.Random(seed + start_index)
+    start = datetime.now() - timedelta(minutes=count)
+    recent: List[Tuple[str, str]] = []
+    uids = []
+    for i in range(count):
+        index = start_index + i
+        date = start + timedelta(minutes=i)
+        message_id = f"<bench.{seed}.{index}@example.com>"
+        subject = f"{_sentence(rng, 4)} #{index}"
+        in_reply_to = None
+        if recent and rng.random() < reply_ratio:
+            in_reply_to, parent_subject = rng.choice(recent)
+            subject = f"Re: {parent_subject}"
+        data = build_message(
+            rng, index, complexity, date=date, message_id=message_id, subject=subject, in_reply_to=in_reply_to
+        )
+        flags = set()
+        if rng.random() < read_ratio:
+            flags.add("\\Seen")
+        if rng.random() < flagged_ratio:
+            flags.add("\\Flagged")
+        uids.append(folder.append(data, flags, date))
+        recent.append((message_id, subject.removeprefix("Re: ")))
+        del recent[:-50]
+    return uids
+
+
+# ---- IMAP ----
+
+def _parse_args(tokens: List[Union[str, bytes]]) -> list:
+    """将词法单元转换为嵌套列表，括号组为子列表"""
+    stack: list = [[]]
+    for token in tokens:
+        if isinstance(token, _Quoted):
+            stack[-1].append(token)
+        elif token == "(":
+            stack.append([])
+        elif token == ")" and len(stack) > 1:
+            group = stack.pop()
+            stack[-1].append(group)
+        else:
+            stack[-1].append(token)
+    while len(stack) > 1:
+        group = stack.pop()
+        stack[-1].append(group)
+    return stack[0]
+
+
+def _tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN_RE.findall(text):
+        if token.startswith('"') and token.endswith('"') and len(token) > 1:
+            token = token[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+            tokens.append(_Quoted(token))
+        else:
+            tokens.append(token)
+    return tokens
+
+
+class _Quoted(str):
+    """带引号字符串，与同名的括号、原子区分"""
+
+
+def _parse_set(value: str, max_value: int) -> List[Tuple[int, int]]:
+    """解析序列集合为区间列表，"*" 表示最大值"""
+    ranges = []
+    for part in value.split(","):
+        bounds = [max_value if item == "*" else int(item) for item in part.split(":")]
+        ranges.append((min(bounds), max(bounds)))
+    return ranges
+
+
+def _in_ranges(value: int, ranges: List[Tuple[int, int]]) -> bool:
+    return any(low <= value <= high for low, high in ranges)
+
+
+def _format_set(values: List[int]) -> bytes:
+    """将UID列表压缩为序列集合，如 [1, 2, 3, 7] -> b'1:3,7'"""
+    parts = []
+    values = sorted(values)
+    i = 0
+    while i < len(values):
+        j = i
+        while j + 1 < len(values) and values[j + 1] == values[j] + 1:
+            j += 1
+        parts.append(str(values[i]) if i == j else f"{values[i]}:{values[j]}")
+        i = j + 1
+    return ",".join(parts).encode()
+
+
+class FakeIMAPServer:
+    """模拟IMAP服务器
+
+    Args:
+        mailbox: 模拟邮箱
+        latency: 每条命令处理前的延迟（秒），模拟网络往返
+        capabilities: 声明的能力，去掉 CONDSTORE/QRESYNC 可测试客户端的降级路径
+        max_connections: 同时连接数上限，超出时以 "* BYE [UNAVAILABLE]" 拒绝，模拟服务商限流
+    """
+
+    def __init__(
+        self,
+        mailbox: FakeMailbox,
+        latency: float = 0.0,
+        capabilities: Tuple[str, ...] = DEFAULT_CAPABILITIES,
+        max_connections: Optional[int] = None
+    ):
+        self.mailbox = mailbox
+        self.latency = latency
+        self.capabilities = tuple(capabilities)
+        self.max_connections = max_connections
+        self.rejected = 0
+        self.port: Optional[int] = None
+        self.commands: Counter = Counter()
+        self.connections = 0
+        self.peak_connections = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> "FakeIMAPServer":
+        self._server = await asyncio.start_server(self._handle, host, port, limit=1 << 20)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    def has_capability(self, name: str) -> bool:
+        return name.upper() in (c.upper() for c in self.capabilities)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if self.max_connections and self.connections >= self.max_connections:
+            self.rejected += 1
+            writer.write(b'* BYE [UNAVAILABLE] Too many simultaneous connections\r\n')
+            await writer.drain()
+            writer.close()
+            return
+        self.connections += 1
+        self.peak_connections = max(self.peak_connections, self.connections)
+        session = {"folder": None, "enabled": set()}
+        try:
+            writer.write(b'* OK [CAPABILITY ' + " ".join(self.capabilities).encode() + b'] Fake IMAP ready\r\n')
+            await writer.drain()
+            while True:
+                command = await self._read_command(reader, writer)
+                if command is None:
+                    break
+                tag, name, args = command
+                self.commands[name] += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                try:
+                    keep_open = await self._dispatch(reader, writer, session, tag, name, args)
+                except Exception as e:
+                    writer.write(b'%s BAD %s\r\n' % (tag.encode(), str(e).encode(errors="replace")))
+                    keep_open = True
+                await writer.drain()
+                if not keep_open:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _read_command(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter
+    ) -> Optional[Tuple[str, str, list]]:
+        """读取一条完整命令（含字面量），返回(标签, 命令名, 参数)"""
+        tokens: List[str] = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                return None
+            match = _LITERAL_RE.search(line)
+            if not match:
+                tokens.extend(_tokenize(line.rstrip(b"\r\n").decode("utf-8", errors="replace")))
+                break
+            tokens.extend(_tokenize(line[:match.start()].decode("utf-8", errors="replace")))
+            if not line[match.start():].startswith(b"{%s+}" % match.group(1)):
+                writer.write(b'+ Ready for literal\r\n')
+                await writer.drain()
+            literal = await reader.readexactly(int(match.group(1)))
+            tokens.append(_Quoted(literal.decode("utf-8", errors="replace")))
+        if len(tokens) < 2:
+            return (tokens[0] if tokens else "*"), "", []
+        tag, name, args = tokens[0], tokens[1].upper(), tokens[2:]
+        if name == "UID" and args:
+            name, args = "UID " + args[0].upper(), args[1:]
+        return tag, name, _parse_args(args)
+
+    async def _dispatch(self, reader, writer, session, tag: str, name: str, args: list) -> bool:
+        ok = tag.encode() + b' OK %s completed\r\n' % name.encode()
+        if name in ("LOGIN", "NOOP", "CHECK"):
+            writer.write(ok)
+        elif name == "CAPABILITY":
+            writer.write(b'* CAPABILITY ' + " ".join(self.capabilities).encode() + b'\r\n' + ok)
+        elif name == "ENABLE":
+            enabled = [arg.upper() for arg in args if self.has_capability(arg)]
+            session["enabled"].update(enabled)
+            writer.write(b'* ENABLED ' + " ".join(enabled).encode() + b'\r\n' + ok)
+        elif name == "LIST":
+            for folder in self.mailbox.folders:
+                writer.write(b'* LIST (\\HasNoChildren) "/" "' + folder.encode() + b'"\r\n')
+            writer.write(ok)
+        elif name in ("SELECT", "EXAMINE"):
+            self._select(writer, session, tag, args)
+        elif name in ("SEARCH", "UID SEARCH"):
+            self._search(writer, session, args, by_uid=name == "UID SEARCH")
+            writer.write(ok)
+        elif name == "UID FETCH":
+            self._fetch(writer, session, args)
+            writer.write(ok)
+        elif name == "IDLE":
+            await self._idle(reader, writer, session)
+            writer.write(ok)
+        elif name == "LOGOUT":
+            writer.write(b'* BYE Fake IMAP logging out\r\n' + ok)
+            return False
+        else:
+            writer.write(b'%s BAD unknown command %s\r\n' % (tag.encode(), name.encode()))
+        return True
+
+    def _selected(self, session) -> FakeFolder:
+        if session["folder"] is None:
+            raise ValueError("no folder selected")
+        return session["folder"]
+
+    def _select(self, writer, session, tag: str, args: list) -> None:
+        name = args[0] if args else ""
+        if name not in self.mailbox.folders:
+            writer.write(b'%s NO folder not found\r\n' % tag.encode())
+            return
+        folder = self.mailbox.folders[name]
+        session["folder"] = folder
+        lines = [
+            b'* %d EXISTS' % len(folder.messages),
+            b'* 0 RECENT',
+            b'* FLAGS (\\Answered \\Flagged \\Deleted \\Seen \\Draft)',
+            b'* OK [UIDVALIDITY %d] UIDs valid' % folder.uidvalidity,
+            b'* OK [UIDNEXT %d] Predicted next UID' % folder.uidnext
+        ]
+        if self.has_capability("CONDSTORE"):
+            lines.append(b'* OK [HIGHESTMODSEQ %d] Highest' % folder.highestmodseq)
+        writer.write(b'\r\n'.join(lines) + b'\r\n%s OK [READ-WRITE] SELECT completed\r\n' % tag.encode())
+
+    def _search(self, writer, session, args: list, by_uid: bool) -> None:
+        folder = self._selected(session)
+        uids = list(folder.messages)
+        max_uid = uids[-1] if uids else 0
+        matched = []
+        for seq, uid in enumerate(uids, 1):
+            message = folder.messages[uid]
+            items = iter(args)
+            keep = True
+            for item in items:
+                key = item.upper() if isinstance(item, str) else item
+                if key == "ALL":
+                    continue
+                elif key == "UID":
+                    keep = _in_ranges(uid, _parse_set(next(items), max_uid))
+                elif key in ("SEEN", "UNSEEN"):
+                    keep = ("\\Seen" in message.flags) == (key == "SEEN")
+                elif key in ("FLAGGED", "UNFLAGGED"):
+                    keep = ("\\Flagged" in message.flags) == (key == "FLAGGED")
+                elif key in ("SINCE", "BEFORE"):
+                    day = datetime.strptime(next(items), "%d-%b-%Y").date()
+                    keep = message.date.date() >= day if key == "SINCE" else message.date.date() < day
+                elif isinstance(key, str) and key[:1].isdigit():
+                    keep = _in_ranges(seq, _parse_set(key, len(uids)))
+                else:
+                    raise ValueError(f"unsupported search key {item}")
+                if not keep:
+                    break
+            if keep:
+                matched.append(uid if by_uid else seq)
+        writer.write(b'* SEARCH' + b''.join(b' %d' % value for value in matched) + b'\r\n')
+
+    def _fetch(self, writer, session, args: list) -> None:
+        folder = self._selected(session)
+        uid_set = args[0]
+        items = args[1] if isinstance(args[1], list) else [args[1]]
+        items = {item.upper() for item in items if isinstance(item, str)}
+        modifiers = [item.upper() for item in args[2]] if len(args) > 2 else []
+        changed_since = int(modifiers[modifiers.index("CHANGEDSINCE") + 1]) if "CHANGEDSINCE" in modifiers else None
+        with_body = bool(items & {"BODY[]", "BODY.PEEK[]", "RFC822"})
+        with_modseq = changed_since is not None or "MODSEQ" in items
+
+        ranges = _parse_set(uid_set, folder.max_uid())
+        if "VANISHED" in modifiers:
+            if "QRESYNC" not in session["enabled"]:
+                raise ValueError("QRESYNC not enabled")
+            vanished = [
+                uid for uid, modseq in folder.expunged.items()
+                if modseq > changed_since and _in_ranges(uid, ranges)
+            ]
+            if vanished:
+                writer.write(b'* VANISHED (EARLIER) ' + _format_set(vanished) + b'\r\n')
+
+        for seq, (uid, message) in enumerate(folder.messages.items(), 1):
+            if not _in_ranges(uid, ranges):
+                continue
+            if changed_since is not None and message.modseq <= changed_since:
+                continue
+            if "BODY[]" in items or "RFC822" in items:
+                folder.set_flags(uid, add={"\\Seen"})
+            parts = [b'UID %d' % uid, b'FLAGS (' + " ".join(sorted(message.flags)).encode() + b')']
+            if with_modseq:
+                parts.append(b'MODSEQ (%d)' % message.modseq)
+            if with_body:
+                parts.append(b'BODY[] {%d}\r\n' % len(message.data) + message.data)
+            writer.write(b'* %d FETCH (' % seq + b' '.join(parts) + b')\r\n')
+
+    async def _idle(self, reader, writer, session) -> None:
+        folder = self._selected(session)
+        queue: asyncio.Queue = asyncio.Queue()
+        folder.watchers.add(queue)
+        done = asyncio.ensure_future(reader.readline())
+        try:
+            writer.write(b'+ idling\r\n')
+            await writer.drain()
+            while not done.done():
+                notification = asyncio.ensure_future(queue.get())
+                await asyncio.wait({done, notification}, return_when=asyncio.FIRST_COMPLETED)
+                if notification.done():
+                    writer.write(notification.result())
+                    await writer.drain()
+                else:
+                    notification.cancel()
+        finally:
+            folder.watchers.discard(queue)
+            if not done.done():
+                done.cancel()
+
+
+# ---- SMTP ----
+
+@dataclass
+class ReceivedMessage:
+    """SMTP收信端收到的邮件"""
+    mail_from: str
+    rcpt_tos: List[str]
+    data: bytes
+
+
+class FakeSMTPServer:
+    """模拟SMTP收信端
+
+    Args:
+        mailbox: 提供时将收到的邮件投递到该邮箱的 folder 文件夹
+        folder: 投递的文件夹
+        latency: 每条命令响应前的延迟（秒）
+    """
+
+    def __init__(self, mailbox: Optional[FakeMailbox] = None, folder: str = "INBOX", latency: float = 0.0):
+        self.mailbox = mailbox
+        self.folder = folder
+        self.latency = latency
+        self.port: Optional[int] = None
+        self.messages: List[ReceivedMessage] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> "FakeSMTPServer":
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        mail_from: Optional[str] = None
+        rcpt_tos: List[str] = []
+
+        async def reply(text: str) -> None:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            writer.write(text.encode() + b'\r\n')
+            await writer.drain()
+
+        try:
+            await reply("220 fake.smtp ESMTP ready")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode("utf-8", errors="replace").rstrip("\r\n")
+                verb = command.split(" ", 1)[0].upper()
+                argument = command[len(verb):].strip()
+                if verb == "EHLO":
+                    await reply("250-fake.smtp\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SIZE 52428800")
+                elif verb == "HELO":
+                    await reply("250 fake.smtp")
+                elif verb == "AUTH":
+                    mechanism, _, initial = argument.partition(" ")
+                    if mechanism.upper() == "LOGIN":
+                        for prompt in ("VXNlcm5hbWU6", "UGFzc3dvcmQ6"):
+                            await reply(f"334 {prompt}")
+                            await reader.readline()
+                    elif not initial:
+                        await reply("334 ")
+                        base64.b64decode(await reader.readline())
+                    await reply("235 2.7.0 Authentication successful")
+                elif verb == "MAIL":
+                    mail_from = argument.split(":", 1)[1].split()[0].strip("<>")
+                    rcpt_tos = []
+                    await reply("250 OK")
+                elif verb == "RCPT":
+                    rcpt_tos.append(argument.split(":", 1)[1].split()[0].strip("<>"))
+                    await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    lines = []
+                    while True:
+                        data_line = await reader.readline()
+                        if not data_line or data_line in (b".\r\n", b".\n"):
+                            break
+                        lines.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                    data = b"".join(lines)
+                    self.messages.append(ReceivedMessage(mail_from or "", rcpt_tos, data))
+                    if self.mailbox is not None:
+                        self.mailbox.folder(self.folder).append(data)
+                    mail_from, rcpt_tos = None, []
+                    await reply("250 OK queued")
+                elif verb == "RSET":
+                    mail_from, rcpt_tos = None, []
+                    await reply("250 OK")
+                elif verb == "NOOP":
+                    await reply("250 OK")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
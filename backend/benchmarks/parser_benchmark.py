@@ -0,0 +1,130 @@
+"""
+邮件解析性能基准
+
+对比逐项解析（get_email_body + 遍历附件，各字段分别解码）与单次遍历的 parse_message。
+语料为随机生成的合成邮件：纯文本、HTML/纯文本双正文、带附件、编码主题等。
+
+用法（在 backend 目录下，需可正常加载 .env 配置）：
+    python benchmarks/parser_benchmark.py --messages 2000 --rounds 3
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from email.header import Header
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formatdate, make_msgid
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import email  # noqa: E402
+
+from app.utils.email.parser import (  # noqa: E402
+    decode_mime_words,
+    extract_attachment,
+    get_email_body,
+    parse_email_address,
+    parse_email_addresses,
+    parse_email_date,
+    parse_message
+)
+
+WORDS = "邮件 同步 测试 report meeting invoice 项目 进度 please review the attached 文件".split()
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def build_corpus(count: int, seed: int = 42) -> List[bytes]:
+    """生成合成邮件语料"""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        kind = rng.random()
+        text = "\n".join(_sentence(rng, 12) for _ in range(rng.randint(5, 60)))
+        if kind < 0.3:
+            msg = MIMEText(text, "plain", "utf-8")
+        else:
+            msg = MIMEMultipart("mixed")
+            body = MIMEMultipart("alternative")
+            body.attach(MIMEText(text, "plain", "utf-8"))
+            body.attach(MIMEText(f"<html><body><p>{text.replace(chr(10), '</p><p>')}</p></body></html>", "html", "utf-8"))
+            msg.attach(body)
+            if kind > 0.6:
+                for n in range(rng.randint(1, 3)):
+                    payload = rng.randbytes(rng.choice([4, 32, 256]) * 1024)
+                    attachment = MIMEApplication(payload, Name=f"附件{n}.bin")
+                    attachment.add_header("Content-Disposition", "attachment", filename=("utf-8", "", f"附件{n}.bin"))
+                    msg.attach(attachment)
+        msg["Subject"] = Header(f"{_sentence(rng, 6)} #{i}", "utf-8").encode()
+        msg["From"] = Header("测试发件人", "utf-8").encode() + " <sender@example.com>"
+        msg["To"] = "a@example.com, b@example.com"
+        msg["Cc"] = "c@example.com"
+        msg["Date"] = formatdate(1700000000 + i * 60, localtime=False)
+        msg["Message-ID"] = make_msgid(domain="example.com")
+        corpus.append(msg.as_bytes())
+    return corpus
+
+
+def legacy_parse(data: bytes) -> dict:
+    """逐项解析：正文和附件分别遍历MIME树"""
+    msg = email.message_from_bytes(data)
+    from_name, from_address = parse_email_address(msg.get('From', ''))
+    content, content_type = get_email_body(msg)
+    attachments = []
+    if msg.is_multipart():
+        for part in msg.walk():
+            if part.get_content_maintype() == 'multipart':
+                continue
+            if part.get_content_maintype() != 'text':
+                attachment = extract_attachment(part)
+                if attachment:
+                    attachments.append(attachment)
+    return {
+        "message_id": msg.get('Message-ID', ''),
+        "subject": decode_mime_words(msg.get('Subject', '')),
+        "from_name": from_name,
+        "from_address": from_address,
+        "to_address": parse_email_addresses(msg.get_all('To', [])),
+        "cc_address": parse_email_addresses(msg.get_all('Cc', []) or []),
+        "date": parse_email_date(msg.get('Date')),
+        "content": content,
+        "content_type": content_type,
+        "attachments": attachments
+    }
+
+
+def run(name: str, func: Callable[[bytes], object], corpus: List[bytes], rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for data in corpus:
+            func(data)
+        best = min(best, time.perf_counter() - start)
+    per_message = best / len(corpus) * 1e6
+    print(f"{name:<16} {best:8.3f}s  {per_message:8.1f}us/封")
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="邮件解析性能基准")
+    arg_parser.add_argument("--messages", type=int, default=2000, help="语料邮件数")
+    arg_parser.add_argument("--rounds", type=int, default=3, help="重复轮数，取最快一轮")
+    args = arg_parser.parse_args()
+
+    corpus = build_corpus(args.messages)
+    total_size = sum(len(data) for data in corpus)
+    print(f"语料: {len(corpus)} 封, {total_size / 1024 / 1024:.1f} MB")
+
+    legacy = run("legacy", legacy_parse, corpus, args.rounds)
+    single_pass = run("parse_message", parse_message, corpus, args.rounds)
+    print(f"提升: {(1 - single_pass / legacy) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+-- 邮件账户：IMAP IDLE 实时推送开关
+ALTER TABLE email_accounts
+    ADD COLUMN use_idle BOOLEAN NOT NULL DEFAULT FALSE COMMENT '是否启用IMAP IDLE实时推送';
+
+-- 邮件账户：多文件夹并行同步
+ALTER TABLE email_accounts
+    ADD COLUMN sync_folders JSON NULL COMMENT '同步的文件夹列表，为空时仅同步INBOX',
+    ADD COLUMN sync_concurrency INT NOT NULL DEFAULT 3 COMMENT '文件夹并行同步的最大连接数';
+
+-- 邮件：记录所在文件夹的UID，文件夹名称放宽到255
+ALTER TABLE emails
+    MODIFY COLUMN folder VARCHAR(255) NOT NULL DEFAULT 'INBOX',
+    ADD COLUMN uid BIGINT NULL COMMENT '邮件在所在文件夹中的UID',
+    ADD INDEX idx_emails_account_folder_uid (account_id, folder, uid);
+
+-- 文件夹同步状态：每个文件夹独立的UID同步进度
+CREATE TABLE email_folder_states (
+    id INT NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+    account_id INT NOT NULL COMMENT '邮件账户ID',
+    folder VARCHAR(255) NOT NULL COMMENT '文件夹名称',
+    uidvalidity BIGINT NULL COMMENT '文件夹UIDVALIDITY',
+    last_uid BIGINT NOT NULL DEFAULT 0 COMMENT '已同步的最大UID',
+    last_sync_time DATETIME NULL COMMENT '最后同步时间',
+    created_at DATETIME NULL COMMENT '创建时间',
+    updated_at DATETIME NULL COMMENT '更新时间',
+    deleted_at DATETIME NULL COMMENT '删除时间',
+    PRIMARY KEY (id),
+    UNIQUE KEY uk_email_folder_states_account_folder (account_id, folder),
+    CONSTRAINT fk_email_folder_states_account FOREIGN KEY (account_id) REFERENCES email_accounts (id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='邮件文件夹同步状态';
+
+-- 文件夹同步状态：CONDSTORE/QRESYNC 的 HIGHESTMODSEQ
+ALTER TABLE email_folder_states
+    ADD COLUMN highestmodseq BIGINT NULL COMMENT '上次同步时文件夹的HIGHESTMODSEQ';
+
+-- 邮件附件：内容寻址存储（SHA-256），storage_path 保存存储键
+ALTER TABLE email_attachments
+    ADD COLUMN sha256 CHAR(64) NULL COMMENT '附件内容SHA-256，即存储键',
+    ADD INDEX idx_email_attachments_sha256 (sha256);
+
+-- 邮件原文：压缩后单独存放，列表查询不再读取原文
+CREATE TABLE email_raw_contents (
+    id INT NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+    email_id INT NOT NULL COMMENT '邮件ID',
+    codec VARCHAR(10) NOT NULL COMMENT '压缩算法：zstd / gzip / none',
+    size INT NOT NULL DEFAULT 0 COMMENT '原文大小（字节）',
+    data LONGBLOB NOT NULL COMMENT '压缩后的邮件原文',
+    created_at DATETIME NULL COMMENT '创建时间',
+    updated_at DATETIME NULL COMMENT '更新时间',
+    deleted_at DATETIME NULL COMMENT '删除时间',
+    PRIMARY KEY (id),
+    UNIQUE KEY uk_email_raw_contents_email_id (email_id),
+    CONSTRAINT fk_email_raw_contents_email FOREIGN KEY (email_id) REFERENCES emails (id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='邮件原文';
+
+-- 历史数据迁移：创建 migrate_email_raw_content 任务，由调度器分批迁移并清空 emails.raw_content
+INSERT INTO tasks (name, func_name, args, status, priority, scheduled_at, max_retries, timeout, created_at, updated_at)
+VALUES ('迁移邮件原文', 'migrate_email_raw_content', '{"batch_size": 200}', 'PENDING', 0, NOW(), 3, 86400, NOW(), NOW());
+
+-- 迁移完成（emails.raw_content 全部为NULL）后可回收空间：
+-- ALTER TABLE emails DROP COLUMN raw_content;
+-- OPTIMIZE TABLE emails;
+
+-- 文件夹计数：按 (账户, 文件夹) 维护可列出邮件（未被服务器删除，用户删除的只计入Trash）的总数和未读数，列表和同步完成时不再COUNT邮件表
+ALTER TABLE email_folder_states
+    ADD COLUMN total_count INT NOT NULL DEFAULT 0 COMMENT '可列出的邮件数',
+    ADD COLUMN unread_count INT NOT NULL DEFAULT 0 COMMENT '可列出的未读邮件数';
+
+-- 按现有邮件初始化计数（应在停止同步和写入时执行）
+INSERT INTO email_folder_states (account_id, folder, last_uid, total_count, unread_count, created_at, updated_at)
+SELECT account_id, folder, 0, COUNT(*), SUM(is_read = 0), NOW(), NOW()
+FROM emails
+WHERE COALESCE(is_deleted, 0) = 0 AND (deleted_at IS NULL OR folder = 'Trash')
+GROUP BY account_id, folder
+ON DUPLICATE KEY UPDATE
+    total_count = VALUES(total_count),
+    unread_count = VALUES(unread_count);
+
+-- 邮件会话：按 Message-ID / In-Reply-To / References 增量归并
+CREATE TABLE email_threads (
+    id INT NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+    account_id INT NOT NULL COMMENT '邮件账户ID',
+    root_message_id VARCHAR(255) NULL COMMENT '会话根邮件的Message-ID',
+    subject VARCHAR(500) NULL COMMENT '会话主题',
+    subject_key VARCHAR(191) NULL COMMENT '去掉回复/转发前缀后的主题，用于按主题归并',
+    participants JSON NULL COMMENT '参与者地址列表',
+    message_count INT NOT NULL DEFAULT 0 COMMENT '邮件数',
+    last_activity DATETIME NOT NULL COMMENT '最后一封邮件的时间',
+    last_email_id INT NULL COMMENT '最后一封邮件ID',
+    created_at DATETIME NULL COMMENT '创建时间',
+    updated_at DATETIME NULL COMMENT '更新时间',
+    deleted_at DATETIME NULL COMMENT '删除时间',
+    PRIMARY KEY (id),
+    KEY idx_email_threads_account_activity (account_id, last_activity, id),
+    KEY idx_email_threads_account_subject (account_id, subject_key),
+    CONSTRAINT fk_email_threads_account FOREIGN KEY (account_id) REFERENCES email_accounts (id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='邮件会话';
+
+-- Message-ID 到会话的映射，email_id 为空表示被引用但尚未收到的邮件
+CREATE TABLE email_thread_refs (
+    id INT NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+    account_id INT NOT NULL COMMENT '邮件账户ID',
+    message_id VARCHAR(255) NOT NULL COMMENT 'Message-ID',
+    thread_id INT NOT NULL COMMENT '会话ID',
+    email_id INT NULL COMMENT '邮件ID',
+    created_at DATETIME NULL COMMENT '创建时间',
+    updated_at DATETIME NULL COMMENT '更新时间',
+    deleted_at DATETIME NULL COMMENT '删除时间',
+    PRIMARY KEY (id),
+    UNIQUE KEY uk_email_thread_refs_account_message (account_id, message_id),
+    KEY idx_email_thread_refs_thread (thread_id),
+    CONSTRAINT fk_email_thread_refs_account FOREIGN KEY (account_id) REFERENCES email_accounts (id) ON DELETE CASCADE,
+    CONSTRAINT fk_email_thread_refs_thread FOREIGN KEY (thread_id) REFERENCES email_threads (id) ON DELETE CASCADE,
+    CONSTRAINT fk_email_thread_refs_email FOREIGN KEY (email_id) REFERENCES emails (id) ON DELETE SET NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='邮件会话Message-ID映射';
+
+ALTER TABLE emails
+    ADD COLUMN thread_id INT NULL COMMENT '所属会话ID',
+    ADD INDEX idx_emails_thread_date (thread_id, date),
+    ADD CONSTRAINT fk_emails_thread FOREIGN KEY (thread_id) REFERENCES email_threads (id) ON DELETE SET NULL;
+
+-- 历史邮件：创建 build_email_threads 任务，按时间顺序补建会话（缺少引用头的邮件从原文补充）
+INSERT INTO tasks (name, func_name, args, status, priority, scheduled_at, max_retries, timeout, created_at, updated_at)
+VALUES ('补建邮件会话', 'build_email_threads', '{"batch_size": 500}', 'PENDING', 0, NOW(), 3, 86400, NOW(), NOW());
+
+-- 提供商IMAP预算：所有worker共享的连接数和每分钟获取邮件数，为空不限制
+ALTER TABLE email_providers
+    ADD COLUMN imap_max_connections INT NULL COMMENT '所有worker到IMAP服务器的最大连接数，为空不限制',
+    ADD COLUMN imap_fetch_per_minute INT NULL COMMENT '所有worker每分钟从IMAP服务器获取的邮件数，为空不限制';
+
+-- 示例：按出口IP被限流的服务商可设置保守的预算，服务器返回限流响应时会在此基础上自动收缩
+-- UPDATE email_providers SET imap_max_connections = 10, imap_fetch_per_minute = 3000 WHERE imap_host = 'imap.qq.com';
+-- UPDATE email_providers SET imap_max_connections = 10, imap_fetch_per_minute = 3000 WHERE imap_host = 'imap.163.com';
+-- UPDATE email_providers SET imap_max_connections = 15 WHERE imap_host = 'imap.gmail.com';
+
+-- 邮件内容指纹：同步写入邮件时计算，打标签时复用同一发件人近似重复邮件的标签
+CREATE TABLE email_fingerprints (
+    id INT NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+    email_id INT NOT NULL COMMENT '邮件ID',
+    account_id INT NOT NULL COMMENT '邮件账户ID',
+    sender VARCHAR(255) NOT NULL COMMENT '发件地址（小写）',
+    simhash BIGINT NOT NULL COMMENT '主题和正文的64位SimHash',
+    created_at DATETIME NULL COMMENT '创建时间',
+    updated_at DATETIME NULL COMMENT '更新时间',
+    deleted_at DATETIME NULL COMMENT '删除时间',
+    PRIMARY KEY (id),
+    UNIQUE KEY uk_email_fingerprints_email (email_id),
+    KEY idx_email_fingerprints_account_sender (account_id, sender, email_id),
+    CONSTRAINT fk_email_fingerprints_email FOREIGN KEY (email_id) REFERENCES emails (id) ON DELETE CASCADE,
+    CONSTRAINT fk_email_fingerprints_account FOREIGN KEY (account_id) REFERENCES email_accounts (id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='邮件内容指纹';
+
+-- 发送给模型的正文（HTML转纯文本并去除引用、签名和模板页脚），同步时生成；历史邮件为NULL，使用时即时计算
+ALTER TABLE emails
+    ADD COLUMN llm_text MEDIUMTEXT NULL COMMENT 'LLM正文' AFTER content;
+
+-- 同一封邮件在每个同步的文件夹中各有一行，按 (account_id, folder, message_id) 唯一，
+-- 防止并发同步的文件夹重复插入。添加前先清理已有的重复行（保留ID最小的一行）
+DELETE e1 FROM emails e1
+JOIN emails e2
+    ON e1.account_id = e2.account_id
+    AND e1.folder = e2.folder
+    AND e1.message_id = e2.message_id
+    AND e1.id > e2.id;
+
+ALTER TABLE emails
+    ADD UNIQUE KEY uk_emails_account_folder_message (account_id, folder, message_id);
@@ -20,4 +20,8 @@ CREATE TABLE IF NOT EXISTS email_tag_relations (
     deleted_at TIMESTAMP NULL COMMENT '删除时间',
     FOREIGN KEY (email_id) REFERENCES emails(id) ON DELETE CASCADE,
     FOREIGN KEY (tag_id) REFERENCES email_tags(id) ON DELETE CASCADE
-) COMMENT '邮件标签关联'; 
\ No newline at end of file
+) COMMENT '邮件标签关联'; 
+-- 标签来源：manual 手动 / llm 模型分类 / simhash 复用近似重复邮件的标签
+ALTER TABLE email_tag_relations
+    ADD COLUMN source VARCHAR(20) NULL COMMENT '标签来源：manual / llm / simhash' AFTER tag_id,
+    ADD COLUMN source_email_id INT NULL COMMENT '复用标签时参考的邮件ID' AFTER source;
@@ -36,4 +36,66 @@ CREATE TABLE `llm_feature_mappings` (
     CONSTRAINT `fk_feature_mappings_user` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE,
     CONSTRAINT `fk_feature_mappings_channel` FOREIGN KEY (`channel_id`) REFERENCES `llm_channels` (`id`) ON DELETE CASCADE,
     CONSTRAINT `fk_feature_mappings_feature` FOREIGN KEY (`feature_type`) REFERENCES `llm_features` (`feature_type`) ON DELETE CASCADE
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='LLM功能映射表';
\ No newline at end of file
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='LLM功能映射表';
+-- LLM渠道超时配置
+ALTER TABLE `llm_channels`
+    ADD COLUMN `connect_timeout` FLOAT NULL COMMENT '连接超时(秒)，为空使用默认值',
+    ADD COLUMN `request_timeout` FLOAT NULL COMMENT '单次调用超时(秒)，为空使用默认值';
+
+-- 功能映射响应缓存开关
+ALTER TABLE `llm_feature_mappings`
+    ADD COLUMN `cache_enabled` TINYINT(1) NOT NULL DEFAULT 0 COMMENT '是否缓存LLM响应，相同输入直接返回缓存结果' AFTER `prompt_template`;
+
+-- 功能映射输入token预算
+ALTER TABLE `llm_feature_mappings`
+    ADD COLUMN `max_input_tokens` INT NULL COMMENT '单次调用的输入token上限（提示词+消息），为空使用默认值，超出时截断消息' AFTER `cache_enabled`;
+
+-- LLM调用用量表
+CREATE TABLE IF NOT EXISTS `llm_usage_logs` (
+    `id` INT NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+    `user_id` INT NOT NULL COMMENT '用户ID',
+    `channel_id` INT NULL COMMENT '渠道ID',
+    `feature_type` VARCHAR(50) NULL COMMENT '功能类型',
+    `provider` VARCHAR(50) NOT NULL COMMENT '提供者',
+    `model` VARCHAR(100) NULL COMMENT '模型',
+    `prompt_tokens` INT NOT NULL DEFAULT 0 COMMENT '输入token数',
+    `completion_tokens` INT NOT NULL DEFAULT 0 COMMENT '输出token数',
+    `estimated` TINYINT(1) NOT NULL DEFAULT 0 COMMENT 'token数是否为本地计算（提供者未返回用量）',
+    `cached` TINYINT(1) NOT NULL DEFAULT 0 COMMENT '是否命中响应缓存（未调用模型，token数记为0）',
+    `truncated` TINYINT(1) NOT NULL DEFAULT 0 COMMENT '输入是否因超出预算被截断',
+    `duration_ms` INT NULL COMMENT '调用耗时(毫秒)',
+    `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    `deleted_at` DATETIME NULL COMMENT '删除时间',
+    PRIMARY KEY (`id`),
+    KEY `idx_llm_usage_logs_user_created` (`user_id`, `created_at`),
+    CONSTRAINT `fk_llm_usage_logs_user` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE,
+    CONSTRAINT `fk_llm_usage_logs_channel` FOREIGN KEY (`channel_id`) REFERENCES `llm_channels` (`id`) ON DELETE SET NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='LLM调用用量表';
+
+-- LLM渠道限流配置（使用同一API密钥的渠道共享配额）
+ALTER TABLE `llm_channels`
+    ADD COLUMN `max_concurrency` INT NULL COMMENT '最大并发请求数，为空不限制',
+    ADD COLUMN `requests_per_minute` INT NULL COMMENT '每分钟请求数上限，为空不限制',
+    ADD COLUMN `tokens_per_minute` INT NULL COMMENT '每分钟token数上限，为空不限制';
+
+-- 功能映射渠道池的路由策略
+ALTER TABLE `llm_feature_mappings`
+    ADD COLUMN `routing_strategy` VARCHAR(20) NOT NULL DEFAULT 'latency' COMMENT '渠道池的路由策略：priority/weighted/latency' AFTER `max_input_tokens`;
+
+-- 功能映射渠道池（为空时只使用 llm_feature_mappings.channel_id）
+CREATE TABLE IF NOT EXISTS `llm_feature_mapping_channels` (
+    `id` INT NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+    `mapping_id` BIGINT UNSIGNED NOT NULL COMMENT '功能映射ID',
+    `channel_id` INT NOT NULL COMMENT '渠道ID',
+    `priority` INT NOT NULL DEFAULT 0 COMMENT '顺序，越小越优先',
+    `weight` INT NOT NULL DEFAULT 1 COMMENT '权重',
+    `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    `deleted_at` DATETIME NULL COMMENT '删除时间',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uk_mapping_channel` (`mapping_id`, `channel_id`),
+    KEY `idx_llm_feature_mapping_channels_channel_id` (`channel_id`),
+    CONSTRAINT `fk_mapping_channels_mapping` FOREIGN KEY (`mapping_id`) REFERENCES `llm_feature_mappings` (`id`) ON DELETE CASCADE,
+    CONSTRAINT `fk_mapping_channels_channel` FOREIGN KEY (`channel_id`) REFERENCES `llm_channels` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='LLM功能映射渠道池';
@@ -64,6 +64,17 @@ if __name__ == "__main__":
         # 启动调度器
         scheduler.start()
         
+        # 开启批量同步时确保存在批量同步邮件账户的任务
+        from app.core.tasks.email_sync import ensure_sync_dispatcher
+        ensure_sync_dispatcher()
+        
+        # 启动IMAP IDLE实时推送监听服务（可选）
+        from app.core.config import settings
+        idle_watcher = None
+        if settings.IMAP_IDLE_ENABLED:
+            from app.core.tasks.email_idle import idle_watcher
+            idle_watcher.start()
+        
         logger.info("任务调度器已启动，按 Ctrl+C 停止")
         
         # 保持程序运行
@@ -73,7 +84,12 @@ if __name__ == "__main__":
                 time.sleep(1)
         except KeyboardInterrupt:
             logger.info("正在停止任务调度器...")
+            if idle_watcher:
+                idle_watcher.stop()
             scheduler.stop()
+            # 关闭邮件解析进程池（未使用过时为空操作）
+            from app.utils.email.parse_pool import shutdown_parse_pool
+            shutdown_parse_pool()
             logger.info("任务调度器已停止")
     
     except Exception as e: